@@ -2,11 +2,28 @@ import streamlit as st
 from diffusers import DiffusionPipeline
 import torch
 from io import BytesIO
+import os
+import sys
 import time
+import uuid
+from datetime import datetime
 from streamlit_webrtc import webrtc_streamer, VideoTransformerBase, RTCConfiguration, WebRtcMode
-import cv2
 import numpy as np
-import av
+import pandas as pd
+from frame_metrics import FrameMetrics, FRAME_BUDGET_MS, stage_rows
+from face_detectors import available_detectors, create_detector
+from face_pipeline import FacePipeline
+from detection_service import DetectionService
+from adaptive_quality import AdaptiveQualityController
+from session_recorder import SessionReader, SessionRecorder, list_sessions
+from face_analytics import FrameHistory
+from game_launcher import GameLauncher
+from fishjump_component import fishjump_game, save_browser_score
+
+# FishJump 游戏相关模块在 Sound 目录下
+SOUND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Sound')
+sys.path.insert(0, SOUND_DIR)
+from scoreboard import SCOREBOARD_PATH, high_score, load_scoreboard
 
 # 语言文本字典
 LANGUAGES = {
@@ -210,12 +227,6 @@ if 'current_page' not in st.session_state:
 if 'game_running' not in st.session_state:
     st.session_state.game_running = False
 
-# 初始化摄像头相关状态
-if 'face_count' not in st.session_state:
-    st.session_state.face_count = 0
-if 'processing_fps' not in st.session_state:
-    st.session_state.processing_fps = 0
-
 # WebRTC配置
 RTC_CONFIGURATION = RTCConfiguration({
     "iceServers": [
@@ -223,259 +234,102 @@ RTC_CONFIGURATION = RTCConfiguration({
     ]
 })
 
-# 全局变量存储设置
-face_detection_settings = {
-    'enabled': True,
-    'color': (0, 255, 0),
-    'confidence': 0.3,
-    'falling_effect': True,
-    'falling_speed': 3.0
-}
+# 人脸检测后端（模型只加载一次，跨rerun和会话共享）
+@st.cache_resource
+def get_face_detector(name):
+    return create_detector(name)
 
-# 掉落人脸数据结构
-falling_faces = []
-last_face_capture_time = 0
+# 共享的人脸检测服务：所有摄像头会话把帧提交给同一组工作线程
+@st.cache_resource
+def get_detection_service():
+    return DetectionService()
 
-class FallingFace:
-    def __init__(self, face_img, x_start, frame_width, frame_height):
-        self.face_img = face_img
-        self.x = x_start + (face_img.shape[1] // 2)  # 从人脸中心开始
-        self.y = -face_img.shape[0]  # 从顶部开始
-        self.width = face_img.shape[1]
-        self.height = face_img.shape[0]
-        
-        # 物理属性
-        self.velocity_y = 0  # 垂直速度
-        self.gravity = 0.5  # 重力加速度
-        self.bounce_factor = 0.3  # 弹跳系数
-        self.friction = 0.95  # 摩擦力
-        self.is_on_ground = False
-        
-        # 随机水平速度
-        import random
-        self.velocity_x = random.uniform(-1, 1)
-        
-        self.frame_width = frame_width
-        self.frame_height = frame_height
-        self.rotation = 0
-        self.rotation_speed = random.uniform(-2, 2)
-        
-        # 生存时间（10秒）
-        import time
-        self.birth_time = time.time()
-        self.lifetime = 10.0  # 10秒后消失
-        
-    def update(self, other_faces=None):
-        import time
-        current_time = time.time()
-        
-        # 检查是否超时
-        if current_time - self.birth_time > self.lifetime:
-            return False
-        
-        # 如果other_faces是None，设为空列表
-        if other_faces is None:
-            other_faces = []
-        
-        # 物理更新
-        if not self.is_on_ground:
-            # 应用重力
-            self.velocity_y += self.gravity
-            
-            # 更新位置
-            self.y += self.velocity_y
-            self.x += self.velocity_x
-            
-            # 检查是否触地或撞到其他人脸
-            ground_level = self.frame_height - self.height
-            collision_level = ground_level
-            
-            # 简化的垂直堆叠检测
-            if other_faces and len(other_faces) > 0:
-                for other_face in other_faces:
-                    if (other_face != self and 
-                        hasattr(other_face, 'is_on_ground') and other_face.is_on_ground and
-                        hasattr(other_face, 'x') and hasattr(other_face, 'y') and
-                        hasattr(other_face, 'width') and hasattr(other_face, 'height')):
-                        
-                        # 检查水平重叠
-                        if (abs(self.x - other_face.x) < (self.width + other_face.width) / 2):
-                            # 计算可以停留的位置
-                            possible_landing = other_face.y - self.height
-                            if possible_landing >= 0 and possible_landing < collision_level:
-                                collision_level = possible_landing
-            
-            if self.y >= collision_level:
-                self.y = collision_level
-                
-                # 弹跳效果
-                if abs(self.velocity_y) > 2:  # 只有速度够大才弹跳
-                    self.velocity_y = -self.velocity_y * self.bounce_factor
-                    self.velocity_x *= self.friction
-                else:
-                    # 速度太小，停下来
-                    self.velocity_y = 0
-                    self.velocity_x *= 0.8  # 摩擦
-                    self.is_on_ground = True
-            
-            # 检查左右边界
-            if self.x - self.width//2 <= 0:
-                self.x = self.width//2
-                self.velocity_x = -self.velocity_x * 0.7
-            elif self.x + self.width//2 >= self.frame_width:
-                self.x = self.frame_width - self.width//2
-                self.velocity_x = -self.velocity_x * 0.7
-        else:
-            # 在停止状态时的物理处理
-            # 地面上的微小摆动
-            if abs(self.velocity_x) > 0.1:
-                self.x += self.velocity_x
-                self.velocity_x *= 0.95  # 逐渐减速
-        
-        # 旋转更新（在地面上时旋转变慢）
-        if self.is_on_ground:
-            self.rotation_speed *= 0.98
-        self.rotation += self.rotation_speed
-        
+# FishJump 排行榜：按文件修改时间缓存，游戏写入新成绩后才重新读取
+@st.cache_data(show_spinner=False)
+def _read_scoreboard(path, mtime):
+    return load_scoreboard(path)
+
+def read_scoreboard(path=SCOREBOARD_PATH):
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        mtime = None
+    return _read_scoreboard(path, mtime)
+
+# FishJump 游戏进程管理（整个服务共享，每个用户最多一个游戏进程）
+def _session_alive(session_id):
+    # 浏览器标签页关闭后 Streamlit 会移除对应会话；拿不到运行时信息时当作还在
+    try:
+        from streamlit.runtime import Runtime
+        return Runtime.instance().is_active_session(session_id)
+    except Exception:
         return True
-    
-    def get_position(self):
-        return int(self.x - self.width//2), int(self.y), int(self.width), int(self.height)
-    
-    def get_age(self):
-        import time
-        return time.time() - self.birth_time
-    
-    def check_horizontal_overlap(self, other_face, tolerance=5):
-        """检查两个人脸是否在水平方向上重叠"""
-        self_left = self.x - self.width // 2 - tolerance
-        self_right = self.x + self.width // 2 + tolerance
-        other_left = other_face.x - other_face.width // 2
-        other_right = other_face.x + other_face.width // 2
-        
-        return not (self_right <= other_left or self_left >= other_right)
+
+def _current_session_id():
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx()
+        return ctx.session_id if ctx is not None else None
+    except Exception:
+        return None
+
+@st.cache_resource
+def get_game_launcher():
+    return GameLauncher(session_alive=_session_alive)
+
+# 每个会话（一路视频流）自己的处理流水线和逐帧耗时统计，跨rerun保留掉落人脸状态
+def get_stream_state():
+    if 'face_pipeline' not in st.session_state:
+        st.session_state.face_pipeline = FacePipeline(
+            detector_provider=get_face_detector,
+            detection_service=get_detection_service(),
+            stream_id=uuid.uuid4().hex[:8],
+            quality=AdaptiveQualityController()
+        )
+        st.session_state.frame_metrics = FrameMetrics(
+            log_path=os.environ.get('FRAME_METRICS_LOG'),
+            history=FrameHistory()
+        )
+        st.session_state.session_recorder = SessionRecorder()
+    return st.session_state.face_pipeline, st.session_state.frame_metrics
+
+def render_face_history(history, window, minutes):
+    """人脸数量 / 帧率 / 检测耗时趋势图（按固定窗口聚合）"""
+    rows = history.aggregate(window, since=time.time() - minutes * 60)
+    if len(rows['time']) == 0:
+        st.info("暂无数据，启动摄像头后显示" if st.session_state.language == 'zh' else "No data yet, start the camera first")
+        return
+    index = pd.DatetimeIndex([datetime.fromtimestamp(t) for t in rows['time']])
+    st.line_chart(pd.DataFrame({
+        'faces (mean)': rows['faces_mean'],
+        'faces (max)': rows['faces_max'],
+    }, index=index), height=180)
+    st.line_chart(pd.DataFrame({
+        'fps': rows['fps'],
+        'detect ms': rows['detect_ms_mean'],
+        'frame ms': rows['frame_ms_mean'],
+    }, index=index), height=180)
+
+# 新版 Streamlit 中局部定时刷新趋势图，旧版本需要手动点“刷新”
+if hasattr(st, 'fragment'):
+    render_face_history_live = st.fragment(run_every=2)(render_face_history)
+else:
+    render_face_history_live = render_face_history
 
 # 增强的人脸检测回调函数（带掉落效果）
-def face_detection_callback(frame):
-    global falling_faces, last_face_capture_time
-    import time
-    
-    img = frame.to_ndarray(format="bgr24")
-    frame_height, frame_width = img.shape[:2]
-    current_time = time.time()
-    
-    if face_detection_settings['enabled']:
-        try:
-            # 初始化人脸检测器
-            face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            
-            # 检测人脸
-            faces = face_cascade.detectMultiScale(
-                gray,
-                scaleFactor=1.1,
-                minNeighbors=5,
-                minSize=(30, 30)
+def make_face_detection_callback(face_pipeline, frame_metrics, recorder=None):
+    def face_detection_callback(frame):
+        # 在WebRTC线程中运行，逐帧耗时记录到frame_metrics（不直接写st.session_state）
+        out_frame = face_pipeline.process_frame(frame, frame_metrics)
+        # 录制只是放进队列，编码在后台线程完成，不会阻塞视频
+        if recorder is not None and recorder.active:
+            recorder.submit(
+                frame if recorder.raw else out_frame,
+                face_pipeline.last_faces,
+                [track.id for track in face_pipeline.last_tracks]
             )
-            
-            # 更新人脸数量统计
-            try:
-                st.session_state.face_count = len(faces)
-            except:
-                pass
-            
-            # 绘制人脸框并捕获人脸（每1秒一次）
-            if faces is not None and len(faces) > 0:
-                # 记录是否在这一帧中创建了新的掉落人脸
-                faces_captured_this_frame = False
-                
-                for i, (x, y, w, h) in enumerate(faces):
-                    # 绘制检测框
-                    cv2.rectangle(img, (x, y), (x + w, y + h), face_detection_settings['color'], 2)
-                    cv2.putText(img, f'Face {i+1}', (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, face_detection_settings['color'], 1)
-                    
-                    # 每1秒捕获一次人脸用于掉落效果（支持多人脸）
-                    if (face_detection_settings['falling_effect'] and 
-                        current_time - last_face_capture_time > 1.0 and 
-                        not faces_captured_this_frame):
-                        
-                        # 提取人脸区域
-                        face_roi = img[y:y+h, x:x+w].copy()
-                        
-                        # 调整人脸大小（变小一点用于掉落）
-                        face_size = min(w, h, 60)  # 最大60像素
-                        if face_size > 20:  # 最小20像素
-                            face_roi_resized = cv2.resize(face_roi, (face_size, face_size))
-                            
-                            # 为每个检测到的人脸创建掉落对象
-                            new_falling_face = FallingFace(
-                                face_roi_resized, 
-                                x, 
-                                frame_width, 
-                                frame_height
-                            )
-                            falling_faces.append(new_falling_face)
-                
-                # 每1秒只处理一次，但会处理当前帧的所有人脸
-                if (face_detection_settings['falling_effect'] and 
-                    current_time - last_face_capture_time > 1.0 and 
-                    len(faces) > 0):
-                    
-                    faces_captured_this_frame = True
-                    last_face_capture_time = current_time
-                    
-                    # 限制同时掉落的人脸数量
-                    if len(falling_faces) > 15:
-                        falling_faces = falling_faces[-15:]
-        
-        except Exception as e:
-            # 如果检测失败，至少返回原图像
-            pass
-    
-    # 更新和绘制掉落的人脸
-    if face_detection_settings['falling_effect']:
-        try:
-            # 更新掉落人脸位置（传入其他人脸用于碰撞检测）
-            active_faces = []
-            for falling_face in falling_faces:
-                # 传入其他人脸进行堆叠检测
-                other_faces = [f for f in falling_faces if f != falling_face]
-                if falling_face.update(other_faces):  # 如果还活着
-                    active_faces.append(falling_face)
-                    
-                    # 在图像上绘制掉落的人脸
-                    fx, fy, fw, fh = falling_face.get_position()
-                    
-                    # 确保坐标在有效范围内
-                    if (fx >= 0 and fy >= 0 and 
-                        fx + fw <= frame_width and 
-                        fy + fh <= frame_height):
-                        
-                        # 简单地叠加人脸图像（不做旋转，保持性能）
-                        try:
-                            img[fy:fy+fh, fx:fx+fw] = falling_face.face_img
-                            
-                            # 添加一个半透明边框效果表示年龄
-                            age = falling_face.get_age()
-                            alpha = max(0.3, 1.0 - age / 10.0)  # 随时间变透明
-                            border_color = (int(255 * alpha), int(255 * alpha), int(255 * alpha))
-                            cv2.rectangle(img, (fx-1, fy-1), (fx+fw+1, fy+fh+1), border_color, 1)
-                            
-                            # 显示剩余时间
-                            remaining_time = int(10 - age)
-                            if remaining_time > 0:
-                                cv2.putText(img, f'{remaining_time}s', (fx, fy-5), 
-                                           cv2.FONT_HERSHEY_SIMPLEX, 0.3, border_color, 1)
-                        except:
-                            pass  # 如果绘制失败，跳过这个人脸
-            
-            falling_faces = active_faces
-            
-        except Exception as e:
-            # 如果掉落效果出错，清空掉落列表
-            falling_faces = []
-    
-    return av.VideoFrame.from_ndarray(img, format="bgr24")
+        return out_frame
+    return face_detection_callback
 
 # 页面配置
 st.set_page_config(
@@ -738,6 +592,10 @@ def image_generator_page():
             st.markdown(get_text('feature_ui', st.session_state.language))
 
 def camera_page():
+    # 当前会话的处理流水线、设置和耗时统计
+    face_pipeline, frame_metrics = get_stream_state()
+    face_detection_settings = face_pipeline.settings
+    
     # 左侧边栏 - 摄像头设置
     with st.sidebar:
         st.title(get_text('page_camera', st.session_state.language))
@@ -765,6 +623,27 @@ def camera_page():
         # 检测设置
         st.subheader("🔍 " + ("检测设置" if st.session_state.language == 'zh' else "Detection Settings"))
         
+        # 检测后端（只列出本地模型文件齐全的后端）
+        detector_labels = {
+            'haar': "Haar Cascade",
+            'dnn': "OpenCV DNN (res10 SSD)",
+            'yunet': "YuNet",
+            'ort': "ONNX Runtime (CPU)"
+        }
+        detector_options = available_detectors()
+        detector_name = st.selectbox(
+            "检测引擎" if st.session_state.language == 'zh' else "Detector Backend",
+            detector_options,
+            format_func=lambda name: detector_labels.get(name, name),
+            help="DNN/YuNet/ONNX Runtime需要把模型文件放在models/目录（ONNX Runtime还需要安装onnxruntime）" if st.session_state.language == 'zh'
+                 else "DNN/YuNet/ONNX Runtime need their model files in models/ (ONNX Runtime also needs onnxruntime installed)"
+        )
+        try:
+            get_face_detector(detector_name)
+        except Exception as e:
+            st.warning(("检测引擎加载失败，改用Haar：" if st.session_state.language == 'zh' else "Failed to load detector, using Haar: ") + str(e))
+            detector_name = 'haar'
+        
         # 置信度阈值
         confidence_threshold = st.slider(
             "检测置信度" if st.session_state.language == 'zh' else "Detection Confidence",
@@ -791,6 +670,14 @@ def camera_page():
         }
         detection_color = color_map[color_option]
         
+        # 跟踪：人脸暂时离开画面后用缓存的特征认回原来的ID
+        face_embedding_enabled = st.checkbox(
+            "🆔 人脸重识别" if st.session_state.language == 'zh' else "🆔 Face Re-identification",
+            value=face_detection_settings['face_embedding'],
+            help="每个ID只计算一次小型人脸特征，人脸短暂消失后仍沿用原来的ID" if st.session_state.language == 'zh'
+                 else "Computes a small face embedding once per ID so faces keep their ID after briefly leaving the frame"
+        )
+        
         # 掉落效果设置
         if falling_effect_enabled:
             st.subheader("🎭 " + ("掉落效果设置" if st.session_state.language == 'zh' else "Falling Effect Settings"))
@@ -809,6 +696,34 @@ def camera_page():
         
         st.markdown("---")
         
+        # 自适应画质：CPU忙不过来时自动降低检测分辨率/频率和摄像头分辨率
+        st.subheader("⚡ " + ("自适应画质" if st.session_state.language == 'zh' else "Adaptive Quality"))
+        quality = face_pipeline.quality
+        quality.enabled = st.checkbox(
+            "自动调整画质" if st.session_state.language == 'zh' else "Auto-adjust quality",
+            value=quality.enabled,
+            help=(f"处理耗时超过 {quality.target_ms:.0f} ms 时逐级降低画质，有余量时再恢复" if st.session_state.language == 'zh'
+                  else f"Steps quality down when frames take longer than {quality.target_ms:.0f} ms, and back up when there is headroom")
+        )
+        quality_status = quality.status()
+        col_level, col_p90 = st.columns(2)
+        with col_level:
+            st.metric(
+                "画质等级" if st.session_state.language == 'zh' else "Quality Level",
+                f"{quality_status['level'] + 1} / {quality_status['levels']}"
+            )
+        with col_p90:
+            st.metric("p90", f"{quality_status['p90_ms']} ms")
+        st.caption(
+            (f"检测缩放 {quality_status['detect_scale']:.2f} · 每 {quality_status['detect_every']} 帧检测一次 · "
+             f"请求分辨率 {quality_status['resolution'][0]}x{quality_status['resolution'][1]}（重新启动摄像头后生效）")
+            if st.session_state.language == 'zh' else
+            (f"Detect scale {quality_status['detect_scale']:.2f} · detect every {quality_status['detect_every']} frame(s) · "
+             f"requested {quality_status['resolution'][0]}x{quality_status['resolution'][1]} (applies on camera restart)")
+        )
+        
+        st.markdown("---")
+        
         # 摄像头状态
         st.subheader("📊 " + ("摄像头状态" if st.session_state.language == 'zh' else "Camera Status"))
         
@@ -825,17 +740,112 @@ def camera_page():
         # 检测统计
         st.subheader("📈 " + ("检测统计" if st.session_state.language == 'zh' else "Detection Stats"))
         
+        metrics_snapshot = frame_metrics.snapshot()
+        
         col_faces, col_fps = st.columns(2)
         with col_faces:
             st.metric(
                 "检测到的人脸" if st.session_state.language == 'zh' else "Faces Detected",
-                st.session_state.face_count
+                metrics_snapshot['face_count']
             )
         
         with col_fps:
             st.metric(
                 "处理帧率" if st.session_state.language == 'zh' else "Processing FPS",
-                f"{st.session_state.processing_fps}"
+                f"{metrics_snapshot['fps']}"
+            )
+        st.caption(
+            (f"跟踪中的ID: {len(face_pipeline.tracker.tracks)} · 已生成掉落人脸: {face_pipeline.total_faces_spawned}")
+            if st.session_state.language == 'zh' else
+            (f"Tracked IDs: {len(face_pipeline.tracker.tracks)} · Falling faces spawned: {face_pipeline.total_faces_spawned}")
+        )
+        
+        # 逐帧耗时（滚动窗口 p50/p95）
+        st.subheader("⏱️ " + ("帧耗时" if st.session_state.language == 'zh' else "Frame Timing"))
+        total_stats = metrics_snapshot['stages'].get('total')
+        if total_stats:
+            over_budget = total_stats['p95_ms'] > FRAME_BUDGET_MS
+            budget_text = (f"p95 {total_stats['p95_ms']:.1f} ms / "
+                           + ("预算" if st.session_state.language == 'zh' else "budget")
+                           + f" {FRAME_BUDGET_MS:.1f} ms")
+            if over_budget:
+                st.warning("⚠️ " + budget_text)
+            else:
+                st.success("✅ " + budget_text)
+            st.table(stage_rows(metrics_snapshot))
+        else:
+            st.info("暂无数据，启动摄像头后显示" if st.session_state.language == 'zh' else "No data yet, start the camera first")
+        
+        # 共享检测服务（所有摄像头会话）
+        service_stats = get_detection_service().stats()
+        st.subheader("🧵 " + ("检测服务" if st.session_state.language == 'zh' else "Detection Service"))
+        col_streams, col_total_fps = st.columns(2)
+        with col_streams:
+            st.metric(
+                "活动视频流" if st.session_state.language == 'zh' else "Active Streams",
+                f"{service_stats['aggregate']['active_streams']} / {service_stats['workers']}"
+            )
+        with col_total_fps:
+            st.metric(
+                "总检测帧率" if st.session_state.language == 'zh' else "Total Detect FPS",
+                f"{service_stats['aggregate']['fps']}"
+            )
+        if service_stats['mean_batch'] > 1:
+            st.caption(("平均批大小" if st.session_state.language == 'zh' else "Mean batch size") + f": {service_stats['mean_batch']}")
+        if service_stats['streams']:
+            st.table([
+                dict(stream=stream_id + (" *" if stream_id == str(face_pipeline.stream_id) else ""), **row)
+                for stream_id, row in service_stats['streams'].items()
+            ])
+        
+        st.markdown("---")
+        
+        # 会话录制：处理后的画面 + 人脸框元数据，保存在 recordings/ 目录
+        st.subheader("⏺️ " + ("会话录制" if st.session_state.language == 'zh' else "Session Recording"))
+        recorder = st.session_state.session_recorder
+        recorder.raw = st.checkbox(
+            "录制原始画面" if st.session_state.language == 'zh' else "Record raw frames",
+            value=recorder.raw,
+            disabled=recorder.active,
+            help="不含检测框和掉落人脸，录制结果可作为检测器的测试数据" if st.session_state.language == 'zh'
+                 else "Without boxes or falling faces, so the recording can be used to benchmark detectors"
+        )
+        if recorder.active:
+            if st.button("⏹️ " + ("停止录制" if st.session_state.language == 'zh' else "Stop Recording"), use_container_width=True):
+                recorder.stop()
+                st.rerun()
+        else:
+            # 只在摄像头运行时开始录制；视频流结束时录制会自动结束（见下方 webrtc_streamer 之后）
+            camera_playing = bool(st.session_state.get('webrtc_ctx')) and st.session_state.webrtc_ctx.state.playing
+            if st.button("⏺️ " + ("开始录制" if st.session_state.language == 'zh' else "Start Recording"),
+                         use_container_width=True, disabled=not camera_playing):
+                recorder.start(f"session_{time.strftime('%Y%m%d_%H%M%S')}_{face_pipeline.stream_id}")
+                st.rerun()
+        recorder_stats = recorder.stats()
+        if recorder_stats['path']:
+            st.caption(
+                (f"{'录制中' if recorder_stats['recording'] else '已保存'}: {os.path.basename(recorder_stats['path'])} · "
+                 f"{recorder_stats['frames']} 帧 · 丢弃 {recorder_stats['dropped']} · "
+                 f"队列 {recorder_stats['queue']}/{recorder_stats['queue_size']} · {recorder_stats['bytes'] / 1e6:.1f} MB")
+                if st.session_state.language == 'zh' else
+                (f"{'Recording' if recorder_stats['recording'] else 'Saved'}: {os.path.basename(recorder_stats['path'])} · "
+                 f"{recorder_stats['frames']} frames · {recorder_stats['dropped']} dropped · "
+                 f"queue {recorder_stats['queue']}/{recorder_stats['queue_size']} · {recorder_stats['bytes'] / 1e6:.1f} MB")
+            )
+        if recorder_stats['error']:
+            st.error(recorder_stats['error'])
+        
+        col_refresh, col_export = st.columns(2)
+        with col_refresh:
+            if st.button("🔄 " + ("刷新" if st.session_state.language == 'zh' else "Refresh"), use_container_width=True):
+                st.rerun()
+        with col_export:
+            st.download_button(
+                label="📥 JSON",
+                data=frame_metrics.to_json(indent=2),
+                file_name=f"frame_metrics_{int(time.time())}.json",
+                mime="application/json",
+                use_container_width=True
             )
     
     # 主内容区域
@@ -847,21 +857,106 @@ def camera_page():
     with col1:
         # 更新设置
         face_detection_settings['enabled'] = face_detection_enabled
+        face_detection_settings['detector'] = detector_name
         face_detection_settings['color'] = detection_color
         face_detection_settings['confidence'] = confidence_threshold
         face_detection_settings['falling_effect'] = falling_effect_enabled
         face_detection_settings['falling_speed'] = falling_speed
+        face_detection_settings['face_embedding'] = face_embedding_enabled
+        face_pipeline.tracker.use_embedding = face_embedding_enabled
         
         # WebRTC摄像头流
         webrtc_ctx = webrtc_streamer(
             key="face-detection",
-            video_frame_callback=face_detection_callback,
+            video_frame_callback=make_face_detection_callback(face_pipeline, frame_metrics,
+                                                              st.session_state.session_recorder),
             rtc_configuration=RTC_CONFIGURATION,
-            media_stream_constraints={"video": True, "audio": False},
+            media_stream_constraints={
+                "video": {
+                    "width": {"ideal": quality_status['resolution'][0]},
+                    "height": {"ideal": quality_status['resolution'][1]}
+                },
+                "audio": False
+            },
         )
         
         # 存储webrtc context到session state
         st.session_state.webrtc_ctx = webrtc_ctx
+        
+        # 视频流已结束（点了STOP、连接断开）但还在录制：在这里收尾，mp4和元数据才能正常保存
+        recorder = st.session_state.session_recorder
+        if recorder.active and not webrtc_ctx.state.playing:
+            recorder.stop()
+            st.rerun()
+        
+        # 人脸数量趋势（环形缓冲区，只保留最近一段时间的逐帧样本）
+        st.subheader("📈 " + ("人脸数量趋势" if st.session_state.language == 'zh' else "Face Count Trend"))
+        col_window, col_span, col_csv = st.columns(3)
+        with col_window:
+            history_window = st.selectbox(
+                "聚合窗口" if st.session_state.language == 'zh' else "Window",
+                [1, 5, 30],
+                format_func=lambda s: f"{s} s"
+            )
+        with col_span:
+            history_minutes = st.selectbox(
+                "时间范围" if st.session_state.language == 'zh' else "Time Range",
+                [1, 5, 10],
+                index=1,
+                format_func=lambda m: f"{m} min"
+            )
+        history = frame_metrics.history
+        with col_csv:
+            st.download_button(
+                label="📥 CSV",
+                data=history.to_csv(history_window),
+                file_name=f"face_history_{face_pipeline.stream_id}_{int(time.time())}.csv",
+                mime="text/csv",
+                use_container_width=True
+            )
+        render_face_history_live(history, history_window, history_minutes)
+        
+        # 回放录制的会话（不需要摄像头）
+        sessions = list_sessions()
+        if sessions:
+            with st.expander("🎞️ " + ("回放录制的会话" if st.session_state.language == 'zh' else "Replay Recorded Sessions")):
+                session_name = st.selectbox(
+                    "会话" if st.session_state.language == 'zh' else "Session",
+                    sessions
+                )
+                try:
+                    reader = SessionReader(session_name)
+                except Exception as e:
+                    st.error(str(e))
+                    reader = None
+                if reader is not None and reader.frame_count > 0:
+                    st.video(reader.video_path)
+                    face_counts = reader.face_counts()
+                    st.caption(
+                        (f"{reader.frame_count} 帧 · {reader.duration:.1f} 秒 · 平均 {face_counts.mean():.2f} 张人脸/帧"
+                         + (" · 原始画面" if reader.info.get('raw') else ""))
+                        if st.session_state.language == 'zh' else
+                        (f"{reader.frame_count} frames · {reader.duration:.1f} s · {face_counts.mean():.2f} faces/frame"
+                         + (" · raw frames" if reader.info.get('raw') else ""))
+                    )
+                    st.line_chart(face_counts)
+                    
+                    # 按帧查看：画面 + 元数据中的人脸框
+                    frame_index = st.slider(
+                        "帧" if st.session_state.language == 'zh' else "Frame",
+                        0, reader.frame_count - 1, 0
+                    )
+                    replay_img = reader.frame(frame_index, draw=bool(reader.info.get('raw')), color=detection_color)
+                    if replay_img is not None:
+                        st.image(replay_img, channels="BGR", use_container_width=True)
+                    
+                    with open(reader.meta_path, 'rb') as f:
+                        st.download_button(
+                            label="📥 " + ("下载元数据 (.npz)" if st.session_state.language == 'zh' else "Download metadata (.npz)"),
+                            data=f.read(),
+                            file_name=os.path.basename(reader.meta_path),
+                            mime="application/octet-stream"
+                        )
     
     with col2:
         # 使用说明
@@ -899,8 +994,12 @@ def camera_page():
 
 def fishjump_page():
     """FishJump游戏页面"""
-    import subprocess
-    import sys
+    launcher = get_game_launcher()
+    # 每个浏览器会话一个用户ID，用来对应自己的游戏进程
+    if 'fishjump_user' not in st.session_state:
+        st.session_state.fishjump_user = uuid.uuid4().hex
+    user_id = st.session_state.fishjump_user
+    zh = st.session_state.language == 'zh'
     
     # 主标题
     st.title(get_text('fishjump_title', st.session_state.language))
@@ -940,14 +1039,21 @@ def fishjump_page():
         {get_text('fishjump_tip_4', st.session_state.language)}
         """)
         
-        # 显示最高分
-        HS_PATH = 'highscore.txt'
-        try:
-            with open(HS_PATH, 'r', encoding='utf-8') as f:
-                high_score = int(f.read().strip() or '0')
-                st.metric("🏆 " + ("最高分" if st.session_state.language == 'zh' else "High Score"), high_score)
-        except Exception:
-            st.metric("🏆 " + ("最高分" if st.session_state.language == 'zh' else "High Score"), 0)
+        # 显示最高分和排行榜
+        board = read_scoreboard()
+        st.metric("🏆 " + ("最高分" if st.session_state.language == 'zh' else "High Score"), high_score(board))
+        if board['entries']:
+            st.caption("排行榜" if st.session_state.language == 'zh' else "Leaderboard")
+            st.dataframe(
+                pd.DataFrame([{
+                    'score': e.get('score', 0),
+                    'time': e.get('time') or '',
+                    'device': e.get('device') or '',
+                    'host': e.get('host') or '',
+                } for e in board['entries']]),
+                hide_index=True,
+                use_container_width=True,
+            )
     
     with col3:
         # 系统要求
@@ -962,26 +1068,68 @@ def fishjump_page():
         
         st.markdown("---")
         
-        # 启动游戏按钮
-        if st.button(get_text('fishjump_start', st.session_state.language), 
-                    type="primary", 
-                    use_container_width=True):
+        # 启动 / 停止游戏（同一用户重复点击会复用已在运行的游戏进程）
+        start_col, stop_col = st.columns(2)
+        with start_col:
+            start_clicked = st.button(get_text('fishjump_start', st.session_state.language),
+                                      type="primary",
+                                      use_container_width=True)
+        with stop_col:
+            stop_clicked = st.button("⏹️ " + ("停止游戏" if zh else "Stop Game"), use_container_width=True)
+        if start_clicked:
             try:
-                # 获取voice_parkour.py的路径
-                parkour_path = r'f:\PolyU\Sem1\5913Programming\Interactive_Website\Interactive_Ai_website-3\voice_parkour.py'
-                
-                # 在新进程中启动游戏
-                subprocess.Popen([sys.executable, parkour_path], 
-                               creationflags=subprocess.CREATE_NEW_CONSOLE if sys.platform == 'win32' else 0)
-                
-                st.success("🎮 " + ("游戏已启动！请查看新窗口。" if st.session_state.language == 'zh' else "Game started! Check the new window."))
+                _, reused = launcher.launch(user_id, session_id=_current_session_id())
+                if reused:
+                    st.info("🎮 " + ("游戏已经在运行，请查看游戏窗口。" if zh else "Game is already running. Check the game window."))
+                else:
+                    st.success("🎮 " + ("游戏已启动！请查看新窗口。" if zh else "Game started! Check the new window."))
             except Exception as e:
-                st.error(f"❌ " + ("启动失败：" if st.session_state.language == 'zh' else "Failed to start: ") + str(e))
+                st.error(f"❌ " + ("启动失败：" if zh else "Failed to start: ") + str(e))
+        if stop_clicked:
+            if launcher.stop(user_id):
+                st.success("⏹️ " + ("游戏已停止" if zh else "Game stopped"))
+
+        # 当前用户的游戏状态
+        game = launcher.status(user_id)
+        if game is not None:
+            state_text = {
+                'starting': "⏳ 启动中" if zh else "⏳ Starting",
+                'running': "🟢 运行中" if zh else "🟢 Running",
+                'exited': "⚪ 已退出" if zh else "⚪ Exited",
+            }[game['state']]
+            details = f"PID {game['pid']} · " + (f"{game['uptime']:.0f}s")
+            if game['startup_ms'] is not None:
+                details += " · " + ("启动耗时" if zh else "startup") + f" {game['startup_ms']:.0f} ms"
+            if game['state'] == 'exited' and game['returncode']:
+                details += " · " + ("退出码" if zh else "exit code") + f" {game['returncode']}"
+            st.caption(f"{state_text} · {details}")
+            if game['state'] == 'exited' and game['returncode'] and game['output']:
+                st.code("\n".join(game['output'][-8:]))
+            if game['state'] == 'starting':
+                if st.button("🔄 " + ("刷新状态" if zh else "Refresh status")):
+                    st.rerun()
+        launcher_stats = launcher.stats()
+        startup = launcher_stats['mean_startup_ms']
+        st.caption(
+            ("运行中的游戏" if zh else "Games running") + f": {launcher_stats['running']} · "
+            + ("孤儿进程" if zh else "Orphaned") + f": {launcher_stats['orphans']} · "
+            + ("平均启动耗时" if zh else "Mean startup") + (f": {startup:.0f} ms" if startup is not None else ": -")
+        )
         
         st.info(get_text('fishjump_note', st.session_state.language))
     
     st.markdown("---")
     
+    # 浏览器版：在用户自己的浏览器里运行，远程用户也能玩，每局分数写入同一个排行榜
+    st.subheader("🌐 " + ("在浏览器中玩" if zh else "Play in Your Browser"))
+    st.caption("使用你自己的麦克风，游戏完全在浏览器中运行。" if zh
+               else "Uses your own microphone; the game runs entirely in your browser.")
+    result = fishjump_game(high_score=high_score(read_scoreboard()), language=st.session_state.language)
+    if save_browser_score(result):
+        st.rerun()
+    
+    st.markdown("---")
+    
     # 游戏预览图片区域
     st.subheader("🖼️ " + ("游戏预览" if st.session_state.language == 'zh' else "Game Preview"))
     
@@ -0,0 +1,228 @@
+"""
+audio_features.py
+
+Real-time voice features for int16 audio blocks, computed in the capture thread
+next to the level meter (see MicrophoneReader in voice_parkour.py):
+
+- pitch: YIN (cumulative mean normalized difference) over a rolling analysis
+  window, with the difference function computed from an FFT autocorrelation;
+- onsets: half-wave rectified spectral flux of the log magnitude spectrum against
+  an adaptive (running mean + k * std) threshold, with a refractory period;
+- band energies (dBFS) for a few fixed bands from the same spectrum.
+
+All work buffers (history, Hann window, zero-padded FFT inputs, magnitude
+spectra, band bin masks) are allocated once. NumPy's FFT still returns fresh
+output arrays; everything else is updated in place. Every process() call is
+timed, and stats() reports the mean / max cost against the block's time budget.
+"""
+import math
+import time
+
+import numpy as np
+
+from level_meter import FULL_SCALE
+
+# (name, low Hz, high Hz)
+BANDS = (('low', 0.0, 300.0), ('voice', 300.0, 3400.0), ('high', 3400.0, 8000.0))
+FEATURE_FIELDS = ('pitch', 'pitch_conf', 'onset', 'flux') + tuple(name for name, _, _ in BANDS)
+
+
+class FeatureExtractor:
+    """One instance per capture thread; process() must see every block in order."""
+
+    def __init__(self, block_size=256, rate=16000, window=1024, pitch_range=(80.0, 1000.0),
+                 yin_threshold=0.15, onset_k=2.5, onset_min_flux=2.0, refractory=0.1):
+        self.block_size = int(block_size)
+        self.rate = rate
+        self.window = max(int(window), 2 * self.block_size)
+        self.yin_threshold = yin_threshold
+        self.onset_k = onset_k
+        self.onset_min_flux = onset_min_flux
+        self.refractory_blocks = max(1, int(round(refractory * rate / self.block_size)))
+
+        # rolling analysis window (newest samples at the end)
+        self._history = np.zeros(self.window, dtype=np.float64)
+        # YIN: compare the first half of the window with lags up to half the window
+        self._yin_w = self.window // 2
+        self._tau_min = max(2, int(rate / pitch_range[1]))
+        self._tau_max = min(self._yin_w - 1, int(rate / pitch_range[0]) + 1)
+        nfft = 1 << (self.window + self._yin_w - 1).bit_length()
+        self._pad_x = np.zeros(nfft, dtype=np.float64)
+        self._pad_head = np.zeros(nfft, dtype=np.float64)
+        self._energy = np.zeros(self.window + 1, dtype=np.float64)
+        self._diff = np.zeros(self._tau_max + 1, dtype=np.float64)
+        self._cmnd = np.ones(self._tau_max + 1, dtype=np.float64)
+        self._taus = np.arange(self._tau_max + 1, dtype=np.float64)
+
+        # spectral flux / bands: Hann-windowed spectrum of the newest spectrum_size samples
+        self._spec_n = max(self.block_size, 512)
+        self._hann = np.hanning(self._spec_n)
+        self._frame = np.zeros(self._spec_n, dtype=np.float64)
+        bins = self._spec_n // 2 + 1
+        self._mag = np.zeros(bins, dtype=np.float64)
+        self._prev_mag = np.zeros(bins, dtype=np.float64)
+        self._rise = np.zeros(bins, dtype=np.float64)
+        freqs = np.fft.rfftfreq(self._spec_n, 1.0 / rate)
+        self._band_masks = [(name, (freqs >= lo) & (freqs < hi)) for name, lo, hi in BANDS]
+        # power of a full-scale sine through the Hann window, for dBFS
+        self._ref_power = (FULL_SCALE * self._hann.sum() / 2.0) ** 2
+
+        # adaptive onset threshold (running mean / variance of the flux)
+        self._flux_mean = 0.0
+        self._flux_var = 0.0
+        self._since_onset = self.refractory_blocks
+        self._blocks = 0
+
+        self.last = dict.fromkeys(FEATURE_FIELDS, 0.0)
+        self._cost_total = 0.0
+        self._cost_max = 0.0
+        self._cost_last = 0.0
+
+    def process(self, samples):
+        """Update with one int16 block; returns the feature dict (also kept in .last)."""
+        start = time.perf_counter()
+        n = len(samples)
+        history = self._history
+        if n >= self.window:
+            history[:] = samples[-self.window:]
+        else:
+            history[:-n] = history[n:]
+            history[-n:] = samples
+        self._blocks += 1
+
+        pitch, conf = self._pitch()
+        flux, onset = self._spectrum()
+        out = self.last
+        out['pitch'] = pitch
+        out['pitch_conf'] = conf
+        out['onset'] = 1.0 if onset else 0.0
+        out['flux'] = flux
+
+        cost = time.perf_counter() - start
+        self._cost_last = cost
+        self._cost_total += cost
+        if cost > self._cost_max:
+            self._cost_max = cost
+        return out
+
+    def _pitch(self):
+        x = self._history
+        w = self._yin_w
+        tau_max = self._tau_max
+        # r(tau) = sum_{j<w} x[j] * x[j + tau] via one FFT cross-correlation
+        pad_x, pad_head = self._pad_x, self._pad_head
+        pad_x[:self.window] = x
+        pad_head[:w] = x[:w]
+        r = np.fft.irfft(np.fft.rfft(pad_x) * np.conj(np.fft.rfft(pad_head)), len(pad_x))[:tau_max + 1]
+        # d(tau) = e(0) + e(tau) - 2 r(tau), with e(tau) = sum_{j<w} x[j + tau]^2 from a cumulative sum
+        energy = self._energy
+        np.cumsum(x * x, out=energy[1:])
+        e0 = energy[w]
+        if e0 <= 1e-9:
+            return 0.0, 0.0
+        diff = self._diff
+        np.subtract(energy[w:w + tau_max + 1], energy[:tau_max + 1], out=diff)
+        diff += e0
+        diff -= 2.0 * r
+        diff[0] = 0.0
+        # cumulative mean normalized difference
+        cmnd = self._cmnd
+        running = np.cumsum(diff[1:])
+        running[running == 0.0] = 1e-12
+        np.multiply(diff[1:], self._taus[1:], out=cmnd[1:])
+        cmnd[1:] /= running
+
+        lo = self._tau_min
+        below = np.flatnonzero(cmnd[lo:tau_max] < self.yin_threshold)
+        if len(below) == 0:
+            return 0.0, 0.0
+        tau = lo + int(below[0])
+        # walk to the local minimum of this dip
+        while tau + 1 < tau_max and cmnd[tau + 1] < cmnd[tau]:
+            tau += 1
+        # parabolic interpolation around the minimum
+        a, b, c = cmnd[tau - 1], cmnd[tau], cmnd[tau + 1]
+        denom = a - 2.0 * b + c
+        shift = 0.5 * (a - c) / denom if denom != 0.0 else 0.0
+        return self.rate / (tau + shift), max(0.0, 1.0 - float(b))
+
+    def _spectrum(self):
+        frame = self._frame
+        np.multiply(self._history[-self._spec_n:], self._hann, out=frame)
+        spectrum = np.fft.rfft(frame)
+        power = spectrum.real * spectrum.real + spectrum.imag * spectrum.imag
+        out = self.last
+        for name, mask in self._band_masks:
+            p = float(power[mask].sum())
+            out[name] = 10.0 * math.log10(p / self._ref_power) if p > 0.0 else -120.0
+
+        # log-compressed magnitude, half-wave rectified difference to the previous block
+        mag, prev, rise = self._mag, self._prev_mag, self._rise
+        prev[:] = mag
+        np.sqrt(power, out=mag)
+        np.log1p(mag * (1.0 / 32.0), out=mag)
+        np.subtract(mag, prev, out=rise)
+        np.maximum(rise, 0.0, out=rise)
+        flux = float(rise.sum())
+
+        # adaptive threshold; onsets need to clear it and the refractory period
+        threshold = self._flux_mean + self.onset_k * math.sqrt(self._flux_var)
+        self._since_onset += 1
+        onset = (self._blocks > 4 and flux > threshold and flux > self.onset_min_flux
+                 and self._since_onset >= self.refractory_blocks)
+        if onset:
+            self._since_onset = 0
+        alpha = 0.05
+        delta = flux - self._flux_mean
+        self._flux_mean += alpha * delta
+        self._flux_var = (1.0 - alpha) * (self._flux_var + alpha * delta * delta)
+        return flux, onset
+
+    def stats(self):
+        """Processing cost per block (ms) and as a fraction of the block's duration."""
+        budget_ms = self.block_size * 1000.0 / self.rate
+        mean_ms = self._cost_total / self._blocks * 1000.0 if self._blocks else 0.0
+        return {
+            'blocks': self._blocks,
+            'last_ms': self._cost_last * 1000.0,
+            'mean_ms': mean_ms,
+            'max_ms': self._cost_max * 1000.0,
+            'budget_ms': budget_ms,
+            'load': mean_ms / budget_ms,
+        }
+
+
+def pitch_to_level(pitch, low=100.0, high=800.0):
+    """Map a pitch (Hz) to 0..1 on a log scale; 0 for unvoiced blocks."""
+    if pitch <= 0.0:
+        return 0.0
+    return max(0.0, min(1.0, math.log(pitch / low) / math.log(high / low)))
+
+
+if __name__ == '__main__':
+    # quick cost check: a gliding tone with claps, in 256-sample blocks
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Feature extractor cost check')
+    parser.add_argument('--block-size', type=int, default=256)
+    parser.add_argument('--rate', type=int, default=16000)
+    parser.add_argument('--seconds', type=float, default=10.0)
+    args = parser.parse_args()
+
+    t = np.arange(int(args.seconds * args.rate)) / args.rate
+    freq = 150.0 + 300.0 * (t / args.seconds)
+    signal = 8000.0 * np.sin(2 * np.pi * np.cumsum(freq) / args.rate)
+    for k in range(1, int(args.seconds)):
+        a = k * args.rate
+        signal[a:a + 400] += np.random.default_rng(k).normal(0, 12000, 400)
+    pcm = np.clip(signal, -32768, 32767).astype(np.int16)
+
+    fx = FeatureExtractor(args.block_size, args.rate)
+    onsets = 0
+    for b in range(len(pcm) // args.block_size):
+        f = fx.process(pcm[b * args.block_size:(b + 1) * args.block_size])
+        onsets += int(f['onset'])
+    s = fx.stats()
+    print(f"{s['blocks']} blocks: mean {s['mean_ms']:.3f} ms, max {s['max_ms']:.3f} ms, "
+          f"budget {s['budget_ms']:.1f} ms ({s['load'] * 100:.1f}% load); "
+          f"last pitch {f['pitch']:.1f} Hz (expected ~450), onsets {onsets} (expected {int(args.seconds) - 1})")
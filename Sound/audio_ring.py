@@ -0,0 +1,104 @@
+"""
+audio_ring.py
+
+Fixed-size single-producer / single-consumer ring buffers for audio capture.
+
+The capture thread (producer) writes into preallocated NumPy storage and then
+publishes by bumping an integer write counter; the game loop (consumer) reads
+the counter and copies out a snapshot. No locks and no per-item queue traffic:
+a read costs the same no matter how far behind the consumer is, and memory
+stays bounded if the game stalls (old samples are simply overwritten).
+
+This relies on the GIL making the counter assignment atomic, and on there
+being exactly one producer and one consumer per ring.
+"""
+import numpy as np
+
+
+class LevelRing:
+    """Ring of per-block level samples, e.g. (timestamp, rms, norm)."""
+
+    def __init__(self, capacity=256, fields=('timestamp', 'rms', 'norm')):
+        self.capacity = int(capacity)
+        self.fields = tuple(fields)
+        self._data = np.zeros((self.capacity, len(self.fields)), dtype=np.float64)
+        # total number of samples ever written (producer-owned)
+        self.written = 0
+        # consumer cursor for read_new(); samples overwritten before being read count as overruns
+        self._read = 0
+        self.overruns = 0
+
+    def push(self, *values):
+        """Producer: store one sample (one value per field)."""
+        n = self.written
+        self._data[n % self.capacity] = values
+        # publish only after the slot is fully written
+        self.written = n + 1
+
+    def latest(self, default=None):
+        """Most recent sample as a tuple, or default if nothing was written yet."""
+        n = self.written
+        if n == 0:
+            return default
+        return tuple(self._data[(n - 1) % self.capacity])
+
+    def snapshot(self, count=None):
+        """Copy of the newest `count` samples (oldest first) as a (k, fields) array."""
+        n = self.written
+        k = min(n, self.capacity if count is None else min(count, self.capacity))
+        if k == 0:
+            return np.zeros((0, len(self.fields)), dtype=np.float64)
+        idx = np.arange(n - k, n) % self.capacity
+        out = self._data[idx]
+        # drop rows the producer may have overwritten while we were copying
+        overwritten = (self.written - n) - (self.capacity - k)
+        return out[overwritten:] if overwritten > 0 else out
+
+    def read_new(self):
+        """Consumer: samples written since the previous read_new() call (oldest first)."""
+        n = self.written
+        pending = n - self._read
+        if pending > self.capacity:
+            self.overruns += pending - self.capacity
+            pending = self.capacity
+        self._read = n
+        if pending <= 0:
+            return np.zeros((0, len(self.fields)), dtype=np.float64)
+        return self.snapshot(pending)
+
+    def reset_reader(self):
+        """Consumer: skip everything written so far (e.g. after a pause or restart)."""
+        self._read = self.written
+
+
+class PcmRing:
+    """Ring of raw int16 samples; the consumer reads the newest N samples."""
+
+    def __init__(self, capacity):
+        self.capacity = int(capacity)
+        self._data = np.zeros(self.capacity, dtype=np.int16)
+        self.written = 0
+
+    def write(self, samples):
+        """Producer: append a block of int16 samples (keeps only the newest capacity samples)."""
+        samples = samples[-self.capacity:]
+        k = len(samples)
+        if k == 0:
+            return
+        start = self.written % self.capacity
+        first = min(k, self.capacity - start)
+        self._data[start:start + first] = samples[:first]
+        if first < k:
+            self._data[:k - first] = samples[first:]
+        self.written += k
+
+    def latest(self, count):
+        """Copy of the newest `count` samples (fewer if not that many were written)."""
+        n = self.written
+        k = min(count, n, self.capacity)
+        if k == 0:
+            return np.zeros(0, dtype=np.int16)
+        start = (n - k) % self.capacity
+        if start + k <= self.capacity:
+            return self._data[start:start + k].copy()
+        return np.concatenate((self._data[start:], self._data[:start + k - self.capacity]))
@@ -0,0 +1,108 @@
+"""
+level_meter.py
+
+Allocation-free RMS / peak metering for int16 audio blocks.
+
+Shared by voice_parkour.py, voice_visualize.py and week06/audio_visualizer.py.
+
+- The int16 samples are converted into a preallocated float32 work buffer
+  (np.copyto, no new array per block).
+- The sum of squares is a single dot product (no squared temporary).
+- Peak comes straight from the int16 view.
+- Optional frequency weighting: 'voice' (300-3400 Hz band) or 'a' (IEC 61672
+  A-weighting). It is applied in the frequency domain with per-block-size weight
+  tables computed once, so weighted RMS follows from Parseval's theorem.
+
+Levels are in int16 units (full scale 32768); use to_db() for dBFS.
+"""
+import math
+
+import numpy as np
+
+FULL_SCALE = 32768.0
+
+WEIGHTINGS = ('voice', 'a')
+
+# voice band edges (Hz), roughly telephone bandwidth
+VOICE_BAND = (300.0, 3400.0)
+
+
+def a_weighting(freqs):
+    """Linear A-weighting gain for an array of frequencies (0 dB at 1 kHz)."""
+    f2 = np.asarray(freqs, dtype=np.float64) ** 2
+    ra = (12194.0 ** 2 * f2 ** 2) / (
+        (f2 + 20.6 ** 2) * np.sqrt((f2 + 107.7 ** 2) * (f2 + 737.9 ** 2)) * (f2 + 12194.0 ** 2)
+    )
+    ra_1k = (12194.0 ** 2 * 1e12) / (
+        (1e6 + 20.6 ** 2) * math.sqrt((1e6 + 107.7 ** 2) * (1e6 + 737.9 ** 2)) * (1e6 + 12194.0 ** 2)
+    )
+    return ra / ra_1k
+
+
+def to_db(level, full_scale=FULL_SCALE, floor_db=-120.0):
+    """Convert an RMS or peak level to dBFS, clamped at floor_db."""
+    if level <= 0.0:
+        return floor_db
+    return max(floor_db, 20.0 * math.log10(level / full_scale))
+
+
+class LevelMeter:
+    """Reusable meter; one instance per capture thread (the work buffers are not shared)."""
+
+    def __init__(self, max_block=4096, rate=16000, weighting=None):
+        if weighting is not None and weighting not in WEIGHTINGS:
+            raise ValueError(f"Unknown weighting '{weighting}', choose from: {', '.join(WEIGHTINGS)}")
+        self.rate = rate
+        self.weighting = weighting
+        self._work = np.empty(max_block, dtype=np.float32)
+        # block size -> (weights folded with the rfft bin multiplicity, magnitude buffer)
+        self._weights = {}
+
+    def measure(self, data):
+        """Return (rms, peak) of a block of int16 samples (bytes or int16 array)."""
+        samples = np.frombuffer(data, dtype=np.int16) if isinstance(data, (bytes, bytearray, memoryview)) else data
+        n = samples.size
+        if n == 0:
+            return 0.0, 0.0
+        if n > self._work.size:
+            self._work = np.empty(n, dtype=np.float32)
+        work = self._work[:n]
+        np.copyto(work, samples, casting='unsafe')
+
+        peak = float(max(int(samples.max()), -int(samples.min())))
+        if self.weighting is None:
+            rms = math.sqrt(float(np.dot(work, work)) / n)
+        else:
+            rms = self._weighted_rms(work)
+        return rms, peak
+
+    def rms(self, data):
+        return self.measure(data)[0]
+
+    def _weighted_rms(self, work):
+        n = work.size
+        weights, mag = self._weight_table(n)
+        spectrum = np.fft.rfft(work)
+        np.abs(spectrum, out=mag)
+        np.multiply(mag, weights, out=mag)
+        # Parseval: sum(x^2) = (1/n) * sum(c_k |X_k|^2), c_k folded into the weights
+        return math.sqrt(float(np.dot(mag, mag))) / n
+
+    def _weight_table(self, n):
+        table = self._weights.get(n)
+        if table is not None:
+            return table
+        freqs = np.fft.rfftfreq(n, 1.0 / self.rate)
+        if self.weighting == 'voice':
+            gain = ((freqs >= VOICE_BAND[0]) & (freqs <= VOICE_BAND[1])).astype(np.float64)
+        else:
+            gain = a_weighting(freqs)
+        # every bin except DC (and Nyquist for even n) stands for two mirrored bins
+        multiplicity = np.full(freqs.size, 2.0)
+        multiplicity[0] = 1.0
+        if n % 2 == 0:
+            multiplicity[-1] = 1.0
+        weights = gain * np.sqrt(multiplicity)
+        table = (weights, np.empty(freqs.size, dtype=np.float64))
+        self._weights[n] = table
+        return table
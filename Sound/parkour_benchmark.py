@@ -0,0 +1,132 @@
+"""
+parkour_benchmark.py
+
+Headless FishJump: run the game simulation at a fixed dt, faster than real time,
+from a recorded or synthetic level trace, and (optionally) time the rendering
+separately. No microphone needed; rendering uses SDL's dummy video driver.
+
+  python parkour_benchmark.py --trace speech --seconds 600
+  python parkour_benchmark.py --trace me.npy                  # from voice_parkour.py --record-levels
+  python parkour_benchmark.py --trace clip.wav --render
+  python parkour_benchmark.py --trace me.npy --tier-scale 0.6 0.8 1.0 1.2   # tune the jump tiers
+  python parkour_benchmark.py --trace claps --render --dirty-rects --json report.json
+  python parkour_benchmark.py --trace me.npy --run-seed 123456789   # replay the obstacles of one run
+
+Obstacles come from a seeded RNG per run (see ParkourSim), so the same --seed gives
+the same runs; --run-seed starts from one specific run, e.g. a seed stored with a
+scoreboard entry.
+
+Sim steps/sec covers only ParkourSim.step(); render frames/sec covers draw_world,
+draw_hud and the display update for the same frames. The render pass replays the
+simulation with the same seed and the first --tier-scale, so it sees exactly the
+states of that sim pass.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from parkour_sim import COUNTDOWN_SECONDS, GAME_OVER_SECONDS, GROUND_Y, HEIGHT, TIERS, TRACE_KINDS, WIDTH, ParkourSim, load_trace, run_trace, synthetic_trace
+
+
+def get_trace(args):
+    if args.trace in TRACE_KINDS:
+        return synthetic_trace(args.trace, args.seconds, args.fps, args.seed)
+    return load_trace(args.trace, args.fps)
+
+
+def make_sim(args, tier_scale=1.0):
+    sim = ParkourSim(args.seed, tiers=[t * tier_scale for t in TIERS])
+    if args.run_seed is not None:
+        sim.restart(run_seed=args.run_seed)
+    return sim
+
+
+def benchmark_render(levels, args):
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    import pygame
+    from parkour_render import DirtyRects, WaveBackground, draw_hud, draw_world, hud_font, text_cache
+
+    pygame.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    font = hud_font(24)
+    background = WaveBackground(WIDTH, HEIGHT, GROUND_Y)
+    dirty = DirtyRects(enabled=args.dirty_rects)
+    times = []
+
+    def render(sim):
+        start = time.perf_counter()
+        draw_world(screen, background, sim, dirty)
+        draw_hud(screen, font, sim, sim.score, -60.0, dirty)
+        dirty.flush()
+        times.append(time.perf_counter() - start)
+
+    sim = make_sim(args, args.tier_scale[0])
+    run_trace(levels, dt=1.0 / args.fps, hit_pause=args.hit_pause, sim=sim, on_step=render)
+    pygame.quit()
+    total = sum(times)
+    times.sort()
+    return {
+        'frames': len(times),
+        'render_fps': round(len(times) / total, 1) if total > 0 else None,
+        'render_ms_mean': round(total / len(times) * 1000.0, 3) if times else None,
+        'render_ms_p95': round(times[int(len(times) * 0.95)] * 1000.0, 3) if times else None,
+        'dirty_rects': args.dirty_rects,
+        'tier_scale': args.tier_scale[0],
+        'text_cache_hits': text_cache.hits,
+        'text_cache_misses': text_cache.misses,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Headless FishJump simulation and render benchmark')
+    parser.add_argument('--trace', default='speech',
+                        help=f"Synthetic trace ({', '.join(TRACE_KINDS)}) or a .npy / .wav file")
+    parser.add_argument('--seconds', type=float, default=300.0, help='Length of a synthetic trace')
+    parser.add_argument('--fps', type=float, default=60.0, help='Fixed simulation rate (dt = 1/fps)')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the trace and for the obstacle runs')
+    parser.add_argument('--run-seed', type=int, default=None, help='Start with the run that has this run seed')
+    parser.add_argument('--hit-pause', type=float, default=GAME_OVER_SECONDS + COUNTDOWN_SECONDS,
+                        help='Trace seconds skipped after a hit (game-over message + countdown)')
+    parser.add_argument('--tier-scale', type=float, nargs='+', default=[1.0],
+                        help='Scale the jump tier thresholds; several values compare them on the same trace')
+    parser.add_argument('--render', action='store_true', help='Also time rendering of every simulated frame')
+    parser.add_argument('--dirty-rects', action='store_true', help='Render with dirty-rect display updates')
+    parser.add_argument('--json', help='Write the report to this JSON file')
+    args = parser.parse_args(argv)
+
+    levels = get_trace(args)
+    if len(levels) == 0:
+        print('Empty trace')
+        return 1
+    print(f'Trace: {args.trace}, {len(levels)} frames ({len(levels) / args.fps:.1f} s at {args.fps:.0f} fps)')
+
+    report = {'trace': args.trace, 'fps': args.fps, 'seed': args.seed, 'sim': []}
+    print(f"{'tier scale':>10} {'steps/s':>10} {'x realtime':>10} {'runs':>5} {'best':>5} {'mean':>6}  jumps per tier")
+    for scale in args.tier_scale:
+        sim = make_sim(args, scale)
+        result = run_trace(levels, dt=1.0 / args.fps, hit_pause=args.hit_pause, sim=sim)
+        result['tier_scale'] = scale
+        report['sim'].append(result)
+        print(f"{scale:>10.2f} {result['steps_per_sec']:>10.0f} {result['realtime_factor']:>10.0f} "
+              f"{result['runs']:>5} {result['best_score']:>5} {result['mean_score']:>6.2f}  {result['jumps_per_tier']}")
+    best = max(report['sim'], key=lambda r: r['best_score'])
+    print(f"Best run seed: {best['best_run_seed']} (speed at that score {best['speed_at_best']:.0f} px/s)")
+
+    if args.render:
+        report['render'] = benchmark_render(levels, args)
+        r = report['render']
+        print(f"Render (tier scale {r['tier_scale']:.2f}): {r['frames']} frames, {r['render_fps']:.0f} fps "
+              f"(mean {r['render_ms_mean']:.2f} ms, p95 {r['render_ms_p95']:.2f} ms, "
+              f"dirty rects {'on' if r['dirty_rects'] else 'off'}, "
+              f"text cache {r['text_cache_hits']} hits / {r['text_cache_misses']} renders)")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,256 @@
+"""
+parkour_render.py
+
+Pre-rendered drawing helpers for voice_parkour.py.
+
+- WaveBackground: sky, ground and the three wave bands are drawn once into a strip
+  one wave period wider than the screen; each frame is a single blit of a window
+  into that strip (the bands repeat every period, so scrolling is just an offset).
+- piranha_sprite / fish_sprite: the vector piranhas and the fallback fish are drawn
+  once per size into alpha surfaces and cached, so a frame blits instead of
+  re-drawing ellipses, circles and triangles.
+- DirtyRects: optional partial display updates. Only the moving parts of the screen
+  (wave bands and ground, the player, the HUD) are pushed to the display; the sky
+  above the waves is static.
+- hud_font / TextCache: fonts are looked up once per size (SysFont goes through
+  fontconfig on Linux), and rendered text surfaces are memoized on (text, font,
+  color) with a small LRU, so static lines like the instructions are rendered
+  once and only text that actually changed (score, level readout) is re-rendered.
+- draw_world / draw_hud: one frame of a ParkourSim, shared by the game and
+  parkour_benchmark.py.
+"""
+import math
+from collections import OrderedDict
+
+import pygame
+
+from parkour_sim import PLAYER_X
+
+SKY_COLOR = (135, 206, 235)
+GROUND_COLOR = (80, 160, 60)
+# (band height above ground, color, phase offset), back to front
+WAVE_LAYERS = [(120, (100, 160, 220), 0), (80, (90, 150, 210), 30), (40, (70, 130, 200), 60)]
+# waves: y = ground - h + sin((x + scroll * WAVE_SCROLL + offset) * WAVE_FREQ) * WAVE_AMPLITUDE
+WAVE_FREQ = 0.02
+WAVE_AMPLITUDE = 12
+WAVE_SCROLL = 0.2
+
+PIRANHA_COLOR = (180, 40, 40)
+FISH_SIZE = (56, 28)
+
+
+class WaveBackground:
+    """The whole static/periodic background as one pre-rendered scrolling strip."""
+
+    def __init__(self, width, height, ground_y, step=4):
+        self.width = width
+        self.height = height
+        self.ground_y = ground_y
+        self.period = 2.0 * math.pi / WAVE_FREQ
+        strip_w = width + int(math.ceil(self.period)) + 1
+
+        strip = pygame.Surface((strip_w, height)).convert()
+        strip.fill(SKY_COLOR)
+        pygame.draw.rect(strip, GROUND_COLOR, (0, ground_y + 40, strip_w, height - ground_y))
+        for wave_h, color, offset in WAVE_LAYERS:
+            points = [
+                (x, int(ground_y - wave_h + math.sin((x + offset) * WAVE_FREQ) * WAVE_AMPLITUDE))
+                for x in range(0, strip_w + step, step)
+            ]
+            points.append((strip_w, height))
+            points.append((0, height))
+            pygame.draw.polygon(strip, color, points)
+        self.strip = strip
+        # rows from here down change while scrolling; everything above is plain sky
+        self.moving_top = ground_y - max(h for h, _, _ in WAVE_LAYERS) - WAVE_AMPLITUDE - 1
+
+    def draw(self, screen, scroll_x):
+        src_x = int((scroll_x * WAVE_SCROLL) % self.period)
+        screen.blit(self.strip, (0, 0), (src_x, 0, self.width, self.height))
+
+    @property
+    def moving_rect(self):
+        return pygame.Rect(0, self.moving_top, self.width, self.height - self.moving_top)
+
+
+_piranhas = {}
+
+
+def piranha_sprite(w, h):
+    """Angry piranha of size (w, h), drawn once and cached."""
+    sprite = _piranhas.get((w, h))
+    if sprite is not None:
+        return sprite
+    sprite = pygame.Surface((w, h), pygame.SRCALPHA).convert_alpha()
+    # body
+    pygame.draw.ellipse(sprite, PIRANHA_COLOR, (0, 0, w, h))
+    # eye
+    ex = int(w * 0.65)
+    ey = int(h * 0.3)
+    pygame.draw.circle(sprite, (255, 255, 255), (ex, ey), max(2, w // 8))
+    pygame.draw.circle(sprite, (0, 0, 0), (ex, ey), max(1, w // 16))
+    # teeth (triangles)
+    tx = int(w * 0.15)
+    ty = int(h * 0.35)
+    for t in range(3):
+        p1 = (tx + t * (w // 6), ty + 2)
+        p2 = (tx + t * (w // 6) + (w // 12), ty - 6)
+        p3 = (tx + t * (w // 6) + (w // 6), ty + 2)
+        pygame.draw.polygon(sprite, (255, 255, 255), [p1, p2, p3])
+    _piranhas[(w, h)] = sprite
+    return sprite
+
+
+# the vector fish extends past its 56x28 body: tail 20 px to the left, fin 10 px above
+FISH_ORIGIN = (20, 10)
+_fish = []
+
+
+def fish_sprite():
+    """Vector fallback fish; blit at (fx - FISH_ORIGIN[0], body_top - FISH_ORIGIN[1])."""
+    if _fish:
+        return _fish[0]
+    ox, oy = FISH_ORIGIN
+    bw, bh = FISH_SIZE
+    sprite = pygame.Surface((bw + ox, bh + oy), pygame.SRCALPHA).convert_alpha()
+    # body (top-left of the body at (ox, oy); the original fy is body top + 8)
+    fx, fy = ox, oy + 8
+    pygame.draw.ellipse(sprite, (80, 200, 200), (fx, fy - 8, bw, bh))
+    # tail
+    pygame.draw.polygon(sprite, (60, 170, 170), [(fx - 8, fy + 6), (fx - 8, fy - 6), (fx - 20, fy)])
+    # eye
+    pygame.draw.circle(sprite, (255, 255, 255), (fx + 40, fy - 4), 5)
+    pygame.draw.circle(sprite, (0, 0, 0), (fx + 40, fy - 4), 2)
+    # fin
+    pygame.draw.polygon(sprite, (70, 180, 180), [(fx + 12, fy - 8), (fx + 24, fy - 18), (fx + 36, fy - 8)])
+    _fish.append(sprite)
+    return sprite
+
+
+class DirtyRects:
+    """Collects the screen areas changed this frame and updates only those (plus last frame's)."""
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._rects = []
+        self._previous = []
+
+    def add(self, rect):
+        if self.enabled and rect is not None:
+            self._rects.append(pygame.Rect(rect))
+
+    def full(self):
+        # force a full update next flush (e.g. after a full-screen message)
+        self._rects.append(None)
+
+    def flush(self):
+        if not self.enabled or None in self._rects:
+            pygame.display.flip()
+            self._previous = [r for r in self._rects if r is not None]
+        else:
+            # last frame's rects too, so things that moved away get erased
+            pygame.display.update(self._previous + self._rects)
+            self._previous = self._rects
+        self._rects = []
+
+
+_fonts = {}
+
+
+def hud_font(size):
+    """Default system font at this size, created once."""
+    font = _fonts.get(size)
+    if font is None:
+        font = _fonts[size] = pygame.font.SysFont(None, size)
+    return font
+
+
+class TextCache:
+    """Rendered text surfaces keyed on (text, font, color), least recently used evicted first."""
+
+    def __init__(self, max_items=128):
+        self.max_items = max_items
+        self._surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, text, font, color=(0, 0, 0)):
+        key = (text, font, color)
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            self._surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+        self.misses += 1
+        surface = self._surfaces[key] = font.render(text, True, color)
+        if len(self._surfaces) > self.max_items:
+            self._surfaces.popitem(last=False)
+        return surface
+
+
+text_cache = TextCache()
+
+
+def draw_world(screen, background, sim, dirty, fish_image=None):
+    """Background, piranhas and the fish for the current sim state."""
+    # sky, ground and waves in one blit of the pre-rendered strip
+    background.draw(screen, sim.scroll_x)
+    # the wave bands, ground and piranhas all live in the moving part
+    dirty.add(background.moving_rect)
+
+    # obstacles as angry piranhas (cached sprite per size)
+    ground_y = background.ground_y
+    for ox, w, h in sim.obstacles.items():
+        screen.blit(piranha_sprite(w, h), (int(ox), ground_y - h))
+
+    # fish player: external image if available, otherwise the cached vector fish
+    fx = PLAYER_X
+    fy = sim.player_y - 20
+    if fish_image is not None:
+        dirty.add(screen.blit(fish_image, (fx, fy - 8)))
+    else:
+        dirty.add(screen.blit(fish_sprite(), (fx - FISH_ORIGIN[0], fy - 8 - FISH_ORIGIN[1])))
+
+
+def draw_hud(screen, font, sim, high_score, smooth_db, dirty, status=()):
+    """Score line, instructions, optional status lines and the top-right level meter."""
+    width = screen.get_width()
+    smooth_level = sim.smooth_level
+
+    # show score and high score (text surfaces come from the cache; only changed text is rendered)
+    txt = text_cache.render(f'Score: {sim.score}  High: {high_score}', font)
+    dirty.add(screen.blit(txt, (8, 8)))
+    instr = text_cache.render('Chick auto-runs. Make sound to jump higher and clear obstacles.', font)
+    dirty.add(screen.blit(instr, (8, 32)))
+    for i, line in enumerate(status):
+        dirty.add(screen.blit(text_cache.render(line, font), (8, 56 + 24 * i)))
+
+    # top-right: amplified numeric level + dB and a vertical meter
+    meter_x = width - 120
+    meter_y = 8
+    meter_w = 16
+    meter_h = 64
+
+    # amplify small values for visibility (sqrt scaling)
+    vis_level = math.sqrt(smooth_level)
+    vis_level = max(0.0, min(1.0, vis_level * 1.05))
+
+    # color by level
+    if vis_level < 0.33:
+        color = (30, 160, 30)
+    elif vis_level < 0.66:
+        color = (220, 180, 20)
+    else:
+        color = (200, 30, 30)
+
+    # draw meter background
+    pygame.draw.rect(screen, (200, 200, 200), (meter_x, meter_y, meter_w, meter_h))
+    fill_h = int(meter_h * vis_level)
+    pygame.draw.rect(screen, color, (meter_x, meter_y + (meter_h - fill_h), meter_w, fill_h))
+
+    # bigger text for numeric readout
+    right_txt = text_cache.render(f'{smooth_level:.2f}', hud_font(28), color)
+    db_txt = text_cache.render(f'{smooth_db:.1f} dB', font)
+    screen.blit(right_txt, (meter_x + meter_w + 8, meter_y))
+    screen.blit(db_txt, (meter_x + meter_w + 8, meter_y + 26))
+    dirty.add((meter_x, meter_y, width - meter_x, meter_h + 4))
@@ -0,0 +1,489 @@
+"""
+parkour_sim.py
+
+FishJump game logic without pygame or a microphone.
+
+ParkourSim.step(level, dt) advances the game by one frame: level smoothing,
+tiered jumps, physics, obstacle spawning / movement, scoring and collision.
+
+Difficulty ramps with the score (DifficultyCurve: swim speed up, obstacle gaps
+down). Each run has its own seeded RNG (run_seed), so any run can be replayed
+exactly, and obstacles are generated a chunk of track at a time ahead of the
+camera; a frame only moves pending obstacles into the pool when they reach the
+right edge of the screen.
+voice_parkour.py drives it with live microphone levels at the display frame
+rate; run_trace() drives it headless at a fixed dt from a level trace, as fast
+as the CPU allows (see parkour_benchmark.py).
+
+Level traces are per-frame normalized levels (0..1, the same `norm` the
+MicrophoneReader computes):
+- synthetic_trace(kind, seconds): 'silence', 'noise', 'claps' or 'speech';
+- load_trace(path): a .npy written by `voice_parkour.py --record-levels`
+  (per-block rows of timestamp, rms, norm, peak), a 1-D .npy of per-frame
+  levels, or a 16-bit mono .wav file.
+"""
+import random
+import time
+import wave
+from collections import deque
+
+import numpy as np
+
+WIDTH, HEIGHT = 800, 400
+GROUND_Y = HEIGHT - 80
+PLAYER_X = 120
+FISH_W, FISH_H = 56, 28
+
+BASE_SPEED = 180.0  # fish always swims forward
+GRAVITY = 1800.0
+# randomized time between obstacles (seconds) at the start of a run. The old spawner
+# nominally used 0.7-1.8 s, but placed obstacles at scroll distance + screen width, so
+# the gaps that actually reached the fish were twice that; these are the gaps players knew.
+SPAWN_MIN = 1.4
+SPAWN_MAX = 3.6
+# hardest settings: speed at RAMP_SCORE points, obstacle spacing at RAMP_DISTANCE px of track
+MAX_SPEED = 300.0
+SPAWN_MIN_HARD = 0.8
+SPAWN_MAX_HARD = 1.8
+RAMP_SCORE = 40
+# roughly the track a run covers by RAMP_SCORE points, so both ramps line up in play
+RAMP_DISTANCE = 18000.0
+# after a hit: the game-over message, then a countdown before the next run
+GAME_OVER_SECONDS = 1.2
+COUNTDOWN_SECONDS = 3.0
+# track length (px) generated at once, and where obstacles enter the screen
+CHUNK_LENGTH = 2400
+SPAWN_X = WIDTH + 50
+# smoothing of the level that drives jumps
+EMA_ALPHA = 0.15
+# overall sensitivity (keeps jumps sensible)
+SENSITIVITY = 1.2
+# jumping: discretize level into tiers so louder sounds give higher jumps
+# thresholds define the lower bound for each tier; includes a tiny jump at 0.03
+TIERS = (0.03, 0.18, 0.35, 0.55, 0.75)
+# multipliers per tier (0: no jump, 1..n increasing heights)
+TIER_SCALES = (0.0, 0.35, 0.9, 1.6, 2.2, 2.8)
+
+# same normalization as MicrophoneReader (conservative divider so typical mics reach 1.0)
+NORM_DIVIDER = 2000.0
+TRACE_KINDS = ('silence', 'noise', 'claps', 'speech')
+# obstacles further left than this (right edge, screen x) are culled
+CULL_X = -100
+
+
+class ObstaclePool:
+    """
+    Obstacles as preallocated parallel arrays (x, w, h, passed) plus an active mask.
+
+    Move, score, cull and collision are each one vectorized pass over the pool;
+    freed slots go on a free list and are reused by spawn(). The pool doubles in
+    size if it ever runs out of slots.
+    """
+
+    def __init__(self, capacity=64):
+        self.x = np.zeros(capacity, dtype=np.float64)
+        self.w = np.zeros(capacity, dtype=np.int64)
+        self.h = np.zeros(capacity, dtype=np.int64)
+        self.passed = np.zeros(capacity, dtype=bool)
+        self.active = np.zeros(capacity, dtype=bool)
+        self._free = list(range(capacity - 1, -1, -1))
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        self.active[:] = False
+        self._free = list(range(len(self.active) - 1, -1, -1))
+        self.count = 0
+
+    def _grow(self):
+        old = len(self.active)
+        for name in ('x', 'w', 'h', 'passed', 'active'):
+            arr = getattr(self, name)
+            setattr(self, name, np.concatenate((arr, np.zeros_like(arr))))
+        self._free.extend(range(2 * old - 1, old - 1, -1))
+
+    def spawn(self, x, w, h):
+        if not self._free:
+            self._grow()
+        i = self._free.pop()
+        self.x[i] = x
+        self.w[i] = w
+        self.h[i] = h
+        self.passed[i] = False
+        self.active[i] = True
+        self.count += 1
+        return i
+
+    def move(self, dx):
+        # inactive slots move too; cheaper than masking and they are never read
+        self.x -= dx
+
+    def score(self, player_x):
+        """Mark obstacles whose right edge passed player_x; returns how many were newly passed."""
+        if self.count == 0:
+            return 0
+        newly = self.active & ~self.passed & (self.x + self.w < player_x)
+        self.passed |= newly
+        return int(np.count_nonzero(newly))
+
+    def cull(self, min_x=CULL_X):
+        if self.count == 0:
+            return
+        dead = np.flatnonzero(self.active & (self.x + self.w <= min_x))
+        if len(dead):
+            self.active[dead] = False
+            self._free.extend(dead.tolist())
+            self.count -= len(dead)
+
+    def collides(self, rect, ground_y):
+        """AABB test of rect (x, y, w, h) against every active obstacle (same test as pygame.Rect.colliderect)."""
+        if self.count == 0:
+            return False
+        px, py, pw, ph = rect
+        # obstacles sit on the ground; x truncated like the pygame.Rect the game used to build
+        ox = self.x.astype(np.int64)
+        oy = ground_y - self.h
+        hit = self.active & (px < ox + self.w) & (ox < px + pw) & (py < oy + self.h) & (oy < py + ph)
+        return bool(hit.any())
+
+    def items(self):
+        """Active obstacles as a list of (x, w, h) Python numbers, e.g. for drawing."""
+        idx = np.flatnonzero(self.active)
+        return list(zip(self.x[idx].tolist(), self.w[idx].tolist(), self.h[idx].tolist()))
+
+
+class DifficultyCurve:
+    """
+    Linear ramps, then flat: swim speed by score, obstacle spacing by track distance.
+
+    The track only depends on the run seed and the distance, never on how the player
+    is doing, so the same run_seed always lays out the same obstacles.
+    """
+
+    def __init__(self, ramp_score=RAMP_SCORE, ramp_distance=RAMP_DISTANCE, speed=(BASE_SPEED, MAX_SPEED),
+                 spawn_min=(SPAWN_MIN, SPAWN_MIN_HARD), spawn_max=(SPAWN_MAX, SPAWN_MAX_HARD)):
+        self.ramp_score = ramp_score
+        self.ramp_distance = ramp_distance
+        self.speed_range = speed
+        self.spawn_min_range = spawn_min
+        self.spawn_max_range = spawn_max
+
+    def level(self, score):
+        """0 at the start of a run, 1 at ramp_score points and beyond."""
+        if self.ramp_score <= 0:
+            return 1.0
+        return min(1.0, score / float(self.ramp_score))
+
+    @staticmethod
+    def _lerp(pair, t):
+        return pair[0] + (pair[1] - pair[0]) * t
+
+    def speed(self, score):
+        return self._lerp(self.speed_range, self.level(score))
+
+    def track_level(self, distance):
+        """0 at the start of the track, 1 at ramp_distance px and beyond."""
+        if self.ramp_distance <= 0:
+            return 1.0
+        return min(1.0, distance / float(self.ramp_distance))
+
+    def gap_range(self, distance):
+        """(min, max) px between obstacles at this track distance (spawn seconds x speed)."""
+        t = self.track_level(distance)
+        speed = self._lerp(self.speed_range, t)
+        return self._lerp(self.spawn_min_range, t) * speed, self._lerp(self.spawn_max_range, t) * speed
+
+
+PLAYING, GAME_OVER, COUNTDOWN = 'playing', 'game_over', 'countdown'
+
+
+class GameFlow:
+    """
+    Game state machine: playing -> game_over -> countdown -> playing.
+
+    Time-based and non-blocking: the game loop keeps running (events, audio,
+    drawing) in every state and calls update(now) once per frame, which returns
+    the state just entered ('countdown' or 'playing') or None.
+    """
+
+    def __init__(self, game_over_seconds=GAME_OVER_SECONDS, countdown_seconds=COUNTDOWN_SECONDS):
+        self.game_over_seconds = game_over_seconds
+        self.countdown_seconds = countdown_seconds
+        self.state = PLAYING
+        self.until = 0.0
+
+    @property
+    def playing(self):
+        return self.state == PLAYING
+
+    def hit(self, now):
+        self.state = GAME_OVER
+        self.until = now + self.game_over_seconds
+
+    def update(self, now):
+        if self.state == PLAYING or now < self.until:
+            return None
+        if self.state == GAME_OVER:
+            self.state = COUNTDOWN
+            self.until = now + self.countdown_seconds
+        else:
+            self.state = PLAYING
+        return self.state
+
+    def remaining(self, now):
+        return max(0.0, self.until - now)
+
+
+class ParkourSim:
+    """
+    One FishJump world. After step(): jump_tier, scored and hit describe what happened.
+
+    With seed=None every run gets a fresh random run_seed; with a seed, run n's
+    seed is derived from (seed, n), so a sequence of runs replays identically.
+    """
+
+    def __init__(self, seed=None, tiers=TIERS, tier_scales=TIER_SCALES, curve=None):
+        self.seed = seed
+        self.tiers = tuple(tiers)
+        self.tier_scales = tuple(tier_scales)
+        self.curve = curve if curve is not None else DifficultyCurve()
+        self.smooth_level = 0.0
+        # player state
+        self.player_y = float(GROUND_Y)
+        self.vel_y = 0.0
+        self.on_ground = True
+        # totals over all runs
+        self.steps = 0
+        self.runs = 0
+        self.chunks = 0
+        self.jumps = [0] * len(self.tier_scales)
+        self.obstacles = ObstaclePool()
+        self._pending = deque()
+        self.restart()
+
+    def restart(self, run_seed=None):
+        """New run after a hit; the player and level smoothing carry over, as in the game."""
+        if run_seed is None:
+            if self.seed is None:
+                run_seed = random.getrandbits(32)
+            else:
+                run_seed = (self.seed * 1000003 + self.runs) & 0xffffffff
+        self.run_seed = run_seed
+        self.rng = random.Random(run_seed)
+        self.runs += 1
+        self.obstacles.clear()
+        self._pending.clear()
+        # world x (px of track from the start of the run) where the next chunk begins
+        self._generated_to = float(SPAWN_X)
+        self.scroll_x = 0.0
+        self.score = 0
+        self.speed = self.curve.speed(0)
+        self.jump_tier = 0
+        self.scored = 0
+        self.hit = False
+        self._generate_chunk()
+
+    def _generate_chunk(self):
+        # obstacle gaps follow the track distance only, so a run seed always gives the same track
+        rng = self.rng
+        x = self._generated_to
+        end = x + CHUNK_LENGTH
+        while x < end:
+            lo, hi = self.curve.gap_range(x - SPAWN_X)
+            x += rng.uniform(lo, hi)
+            self._pending.append((x, rng.randint(28, 48), rng.randint(28, 56)))
+        self._generated_to = x
+        self.chunks += 1
+
+    def player_rect(self):
+        """Fish body (x, y, w, h) in screen coordinates."""
+        return (PLAYER_X, int(self.player_y) - 28, FISH_W, FISH_H)
+
+    def observe(self, level):
+        """Smooth (EMA) the normalized level; also used while paused so the meter stays live."""
+        self.smooth_level = (1.0 - EMA_ALPHA) * self.smooth_level + EMA_ALPHA * level
+
+    def tier_for(self, level):
+        tier = 0
+        for i, t in enumerate(self.tiers, start=1):
+            if level >= t:
+                tier = i
+        return tier
+
+    def step(self, level, dt, force_tier=None):
+        """
+        Advance one frame.
+
+        By default the smoothed level picks the jump tier. With force_tier set, the
+        caller picks it instead (0: no jump), e.g. from pitch or an onset; the level
+        is then only smoothed for display.
+        """
+        self.steps += 1
+        self.jump_tier = 0
+        self.scored = 0
+        self.observe(level)
+
+        # map smoothed level to a jump tier; the fish always swims at base speed
+        if self.on_ground:
+            tier = self.tier_for(self.smooth_level) if force_tier is None else force_tier
+            if tier > 0:
+                scale = self.tier_scales[tier]
+                # slightly increase sensitivity so small sounds register
+                base = 650.0 * (SENSITIVITY * 1.1)
+                # smaller offset for the tiny jump
+                self.vel_y = -(0.5 + scale) * base
+                self.on_ground = False
+                self.jump_tier = tier
+                self.jumps[tier] += 1
+
+        # physics
+        self.vel_y += GRAVITY * dt
+        self.player_y += self.vel_y * dt
+        if self.player_y >= GROUND_Y:
+            self.player_y = float(GROUND_Y)
+            self.vel_y = 0.0
+            self.on_ground = True
+
+        # horizontal movement: scroll world at the current difficulty's speed
+        self.speed = self.curve.speed(self.score)
+        self.scroll_x += self.speed * dt
+
+        # pre-generated obstacles enter the pool when they reach the right edge
+        pending = self._pending
+        while pending and pending[0][0] - self.scroll_x <= SPAWN_X:
+            wx, w, h = pending.popleft()
+            self.obstacles.spawn(wx - self.scroll_x, w, h)
+        if self._generated_to - self.scroll_x < SPAWN_X + CHUNK_LENGTH / 2:
+            self._generate_chunk()
+
+        # move obstacles left, award score when the player passes one
+        obstacles = self.obstacles
+        obstacles.move(self.speed * dt)
+        passed = obstacles.score(PLAYER_X)
+        self.score += passed
+        self.scored = passed
+
+        # free the slots of obstacles that went off screen far
+        obstacles.cull()
+
+        # collision
+        self.hit = obstacles.collides(self.player_rect(), GROUND_Y)
+
+
+def run_trace(levels, dt=1.0 / 60, seed=0, hit_pause=GAME_OVER_SECONDS + COUNTDOWN_SECONDS,
+              sim=None, on_step=None):
+    """
+    Run the simulation headless over a per-frame level trace at fixed dt.
+
+    After a hit, hit_pause seconds of the trace are skipped (the game-over message
+    and countdown) and a new run starts. on_step(sim) is called after
+    every step, e.g. to render. Returns a report dict.
+    """
+    sim = sim if sim is not None else ParkourSim(seed)
+    levels = np.asarray(levels, dtype=np.float64)
+    pause_frames = int(round(hit_pause / dt))
+    # (score, run_seed) of every finished run
+    scores = []
+    i = 0
+    n = len(levels)
+    start = time.perf_counter()
+    while i < n:
+        sim.step(float(levels[i]), dt)
+        i += 1
+        if on_step is not None:
+            on_step(sim)
+        if sim.hit:
+            scores.append((sim.score, sim.run_seed))
+            sim.restart()
+            i += pause_frames
+    wall = time.perf_counter() - start
+    if sim.score > 0 or not scores:
+        # unfinished last run
+        scores.append((sim.score, sim.run_seed))
+    best, best_seed = max(scores, key=lambda s: s[0])
+    return {
+        'steps': sim.steps,
+        'sim_seconds': round(sim.steps * dt, 2),
+        'wall_seconds': round(wall, 4),
+        'steps_per_sec': round(sim.steps / wall, 1) if wall > 0 else None,
+        'realtime_factor': round(sim.steps * dt / wall, 1) if wall > 0 else None,
+        'runs': len(scores),
+        'best_score': best,
+        'best_run_seed': best_seed,
+        'mean_score': round(sum(s for s, _ in scores) / len(scores), 2),
+        'speed_at_best': round(sim.curve.speed(best), 1),
+        'chunks': sim.chunks,
+        'jumps_per_tier': sim.jumps[1:],
+    }
+
+
+def synthetic_trace(kind='claps', seconds=60.0, fps=60.0, seed=0):
+    """Per-frame levels for a made-up input."""
+    if kind not in TRACE_KINDS:
+        raise ValueError(f"Unknown trace '{kind}', choose from: {', '.join(TRACE_KINDS)}")
+    rng = np.random.default_rng(seed)
+    n = int(seconds * fps)
+    # background noise floor, below the first tier
+    levels = rng.uniform(0.0, 0.02, n)
+    if kind == 'silence':
+        levels[:] = 0.0
+    elif kind == 'claps':
+        # short loud bursts every 0.6-1.6 s
+        t = rng.uniform(0.2, 1.0)
+        while t < seconds:
+            a = int(t * fps)
+            levels[a:a + max(1, int(0.08 * fps))] = rng.uniform(0.4, 1.0)
+            t += rng.uniform(0.6, 1.6)
+    elif kind == 'speech':
+        # syllables of 0.1-0.3 s with varying loudness, pauses between phrases
+        t = 0.0
+        while t < seconds:
+            for _ in range(rng.integers(2, 7)):
+                a = int(t * fps)
+                d = rng.uniform(0.1, 0.3)
+                levels[a:a + int(d * fps)] = rng.uniform(0.1, 0.8)
+                t += d + rng.uniform(0.03, 0.12)
+            t += rng.uniform(0.4, 1.5)
+    return levels
+
+
+def _blocks_to_frames(timestamps, norms, fps):
+    # the loudest block within each frame drives that frame, like the game loop
+    t0 = timestamps[0]
+    frame = np.floor((timestamps - t0) * fps).astype(np.int64)
+    levels = np.zeros(int(frame[-1]) + 1, dtype=np.float64)
+    np.maximum.at(levels, frame, norms)
+    return levels
+
+
+def load_trace(path, fps=60.0, block_size=256):
+    """Per-frame levels from a recorded level trace (.npy) or audio file (.wav)."""
+    if path.lower().endswith('.wav'):
+        from level_meter import LevelMeter
+        with wave.open(path, 'rb') as wf:
+            if wf.getsampwidth() != 2:
+                raise ValueError('Only 16-bit .wav files are supported')
+            rate = wf.getframerate()
+            channels = wf.getnchannels()
+            samples = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+        if channels > 1:
+            samples = samples[::channels]
+        meter = LevelMeter(max_block=block_size, rate=rate)
+        count = len(samples) // block_size
+        norms = np.empty(count, dtype=np.float64)
+        for b in range(count):
+            rms, _ = meter.measure(samples[b * block_size:(b + 1) * block_size])
+            norms[b] = min(1.0, rms / NORM_DIVIDER)
+        timestamps = (np.arange(count) + 1) * block_size / float(rate)
+        return _blocks_to_frames(timestamps, norms, fps) if count else np.zeros(0)
+
+    data = np.load(path)
+    if data.ndim == 1:
+        return data.astype(np.float64)
+    # rows of (timestamp, rms, norm, peak) from --record-levels
+    if len(data) == 0:
+        return np.zeros(0)
+    return _blocks_to_frames(data[:, 0], data[:, 2], fps)
+
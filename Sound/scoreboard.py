@@ -0,0 +1,265 @@
+"""
+scoreboard.py
+
+FishJump scoreboard persistence.
+
+The game used to rewrite highscore.txt synchronously every time the score beat
+the high score, i.e. a file write per obstacle during a streak, on the frame
+thread. ScoreboardWriter moves that off the game loop:
+
+- record(score) only updates memory and wakes a background thread;
+- the thread waits `debounce` seconds so a streak collapses into one write;
+- writes are atomic (temp file in the same directory, fsync, os.replace), so a
+  reader never sees a half-written file;
+- the file is a JSON scoreboard of the top-N runs with timestamps and device
+  info instead of a single int. Every write is a read-merge-replace of the file
+  on disk (merged by entry id) under an exclusive lock: a lock in this process
+  plus an OS lock (fcntl / msvcrt) on `<scoreboard>.lock`, so several writers
+  (game processes, the website's sessions) don't drop each other's scores.
+
+load_scoreboard() is the read side (used by FunnyWebsite's fishjump_page); it
+falls back to the old highscore.txt if no scoreboard exists yet.
+"""
+import json
+import os
+import platform
+import socket
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCOREBOARD_PATH = os.environ.get('FISHJUMP_SCOREBOARD', os.path.join(ROOT_DIR, 'fishjump_scores.json'))
+# single-int files written by older versions (repo root, and next to voice_parkour.py)
+LEGACY_PATHS = (os.path.join(ROOT_DIR, 'highscore.txt'),
+                os.path.join(os.path.dirname(os.path.abspath(__file__)), 'highscore.txt'))
+TOP_N = 10
+VERSION = 1
+
+# serializes writers in this process; the lock file covers other processes
+_write_lock = threading.Lock()
+
+
+def _legacy_entries():
+    best = 0
+    for path in LEGACY_PATHS:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                best = max(best, int(f.read().strip() or '0'))
+        except Exception:
+            continue
+    if best <= 0:
+        return []
+    return [{'id': 'legacy', 'score': best, 'time': None, 'source': 'highscore.txt'}]
+
+
+def load_scoreboard(path=SCOREBOARD_PATH):
+    """Scoreboard dict {'version', 'updated', 'entries'}; entries are sorted best first."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            board = json.load(f)
+        entries = [e for e in board.get('entries', []) if isinstance(e, dict) and 'score' in e]
+        updated = board.get('updated')
+    except FileNotFoundError:
+        entries, updated = _legacy_entries(), None
+    except Exception:
+        # unreadable file: show nothing rather than crash the page or the game
+        entries, updated = [], None
+    entries.sort(key=_sort_key)
+    return {'version': VERSION, 'updated': updated, 'entries': entries}
+
+
+def high_score(board):
+    entries = board.get('entries', [])
+    return int(entries[0]['score']) if entries else 0
+
+
+def _sort_key(entry):
+    # best score first; ties go to the earlier run
+    return (-int(entry.get('score', 0)), entry.get('time') or '')
+
+
+def _now_iso():
+    return time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime())
+
+
+def write_atomic(path, data):
+    """Write JSON to path via a temp file in the same directory and os.replace."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix='.scoreboard-', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def merge_entries(*lists, top_n=TOP_N):
+    """Union of entry lists by id (higher score wins), best top_n first."""
+    merged = {}
+    for entries in lists:
+        for entry in entries:
+            key = entry.get('id')
+            old = merged.get(key)
+            if old is None or int(entry.get('score', 0)) >= int(old.get('score', 0)):
+                merged[key] = entry
+    return sorted(merged.values(), key=_sort_key)[:top_n]
+
+
+@contextmanager
+def locked(path):
+    """Exclusive lock on the scoreboard at path, across threads and processes."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with _write_lock, open(path + '.lock', 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            # locks the first byte; LK_LOCK retries for ~10 s before raising OSError
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def update_scoreboard(path, entries, top_n=TOP_N):
+    """Merge entries into the file on disk (read, merge, replace under the lock); returns the new top_n."""
+    with locked(path):
+        board = load_scoreboard(path)
+        merged = merge_entries(board['entries'], entries, top_n=top_n)
+        write_atomic(path, {'version': VERSION, 'updated': _now_iso(), 'entries': merged})
+    return merged
+
+
+def submit_score(score, path=SCOREBOARD_PATH, top_n=TOP_N, **info):
+    """One-shot synchronous submit (for callers without a game loop, e.g. the website)."""
+    entry = dict(info, id=uuid.uuid4().hex, score=int(score), time=_now_iso())
+    update_scoreboard(path, [entry], top_n)
+    return entry
+
+
+class ScoreboardWriter(threading.Thread):
+    """
+    Background, debounced scoreboard writer for one game process.
+
+    start_run(**info) opens a run (info such as device name is stored with it),
+    record(score) is cheap enough to call every frame, close() flushes.
+    """
+
+    def __init__(self, path=SCOREBOARD_PATH, top_n=TOP_N, debounce=2.0):
+        super().__init__(daemon=True)
+        self.path = path
+        self.top_n = top_n
+        self.debounce = debounce
+        self._cond = threading.Condition()
+        # this process's runs by id; only those with a score > 0 are written
+        self._runs = {}
+        self._current = None
+        self._dirty = False
+        self._stopping = False
+        self._host = {'host': socket.gethostname(), 'platform': platform.platform(terse=True)}
+        board = load_scoreboard(path)
+        self._best = high_score(board)
+        self.writes = 0
+        self.errors = 0
+        self.last_write_ms = 0.0
+        self.start()
+
+    @property
+    def high_score(self):
+        return self._best
+
+    def start_run(self, **info):
+        with self._cond:
+            run_id = uuid.uuid4().hex
+            self._runs[run_id] = dict(info, id=run_id, score=0, time=_now_iso(), **self._host)
+            self._current = run_id
+            return run_id
+
+    def record(self, score):
+        """Update the current run's score; persisted later by the writer thread."""
+        if score > self._best:
+            self._best = score
+        with self._cond:
+            run = self._runs.get(self._current)
+            if run is None or score <= run['score']:
+                return
+            run['score'] = int(score)
+            if not self._dirty:
+                self._dirty = True
+                self._cond.notify()
+
+    def end_run(self, **info):
+        with self._cond:
+            run = self._runs.get(self._current)
+            if run is not None:
+                run.update(info)
+                run['ended'] = _now_iso()
+                if run['score'] > 0:
+                    self._dirty = True
+                    self._cond.notify()
+            self._current = None
+
+    def run(self):
+        while True:
+            with self._cond:
+                while not self._dirty and not self._stopping:
+                    self._cond.wait()
+                if self._stopping and not self._dirty:
+                    return
+                # debounce: let a scoring streak settle before touching the disk
+                if not self._stopping:
+                    self._cond.wait(self.debounce)
+                stopping = self._stopping
+            self._write()
+            if stopping:
+                return
+
+    def _write(self):
+        with self._cond:
+            self._dirty = False
+            mine = [dict(r) for r in self._runs.values() if r['score'] > 0]
+        start = time.perf_counter()
+        try:
+            entries = update_scoreboard(self.path, mine, self.top_n)
+            self.writes += 1
+        except Exception as e:
+            self.errors += 1
+            print(f'Scoreboard write failed: {e}')
+            return
+        finally:
+            self.last_write_ms = (time.perf_counter() - start) * 1000.0
+        # forget finished runs that fell off the board
+        kept = {e['id'] for e in entries}
+        with self._cond:
+            for run_id in [r for r in self._runs if r not in kept and r != self._current]:
+                del self._runs[run_id]
+
+    def close(self, timeout=5.0):
+        """Flush pending scores and stop the writer thread."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        self.join(timeout)
@@ -1,11 +1,16 @@
 import sys
 import os
 import time
-import math
-import queue
+import argparse
 import threading
 import numpy as np
-import random
+
+from audio_features import FEATURE_FIELDS, FeatureExtractor, pitch_to_level
+from audio_ring import LevelRing, PcmRing
+from level_meter import WEIGHTINGS, LevelMeter, to_db
+from scoreboard import ScoreboardWriter
+from parkour_render import DirtyRects, WaveBackground, draw_hud, draw_world, hud_font, text_cache
+from parkour_sim import COUNTDOWN, EMA_ALPHA, GAME_OVER, GROUND_Y, HEIGHT, PLAYING, WIDTH, GameFlow, ParkourSim
 
 try:
     import pyaudio
@@ -30,32 +35,67 @@ Controls (microphone):
 - Louder sounds produce higher jumps.
 
 This is intentionally minimal and uses RMS over short frames to determine "loudness".
-"""
 
-WIDTH, HEIGHT = 800, 400
-GROUND_Y = HEIGHT - 80
+Audio is captured in PyAudio callback mode by default with small blocks (256 samples
+= 16 ms at 16 kHz), so a sound reaches the game within one block instead of one
+1024-sample blocking read. The HUD shows the measured sound -> jump latency: the time
+from the first loud block's capture to the frame that starts the jump being shown.
+
+  python voice_parkour.py                      # callback mode, 256-sample blocks
+  python voice_parkour.py --block-size 128
+  python voice_parkour.py --mode blocking      # old blocking reads of CHUNK samples
+  python voice_parkour.py --weighting voice    # only the 300-3400 Hz voice band makes you jump
+  python voice_parkour.py --dirty-rects        # update only the changing parts of the window
+  python voice_parkour.py --record-levels me.npy   # save the level trace for parkour_benchmark.py
+  python voice_parkour.py --control pitch      # higher voice = higher jump (loudness only gates it)
+  python voice_parkour.py --control onset      # jump instantly on claps / plosives
+
+With --control pitch or onset, a feature extractor (audio_features.py: YIN pitch,
+spectral-flux onsets, band energies) runs in the capture thread after the level
+meter; the HUD shows its cost per block against the block's duration.
+
+After a hit the game shows the score, then counts down to the next run. The loop
+never blocks in between (GameFlow in parkour_sim.py): the window stays responsive,
+audio keeps being drained, and the level stream is flushed when the run starts so
+old sound cannot trigger the first jump.
+
+The game logic itself is in parkour_sim.py and the drawing in parkour_render.py.
+"""
 
 CHUNK = 1024
+# default block size in callback mode (16 ms at 16 kHz)
+BLOCK_SIZE = 256
 RATE = 16000
 FORMAT = pyaudio.paInt16
 CHANNELS = 1
 
 
-def rms_from_bytes(data, width=2):
-    # data is bytes from stream with int16 samples
-    arr = np.frombuffer(data, dtype=np.int16).astype(np.float32)
-    if arr.size == 0:
-        return 0.0
-    return math.sqrt(float((arr ** 2).mean()))
+class MicrophoneReader(threading.Thread):
+    """
+    Microphone capture into a level ring buffer.
 
+    mode='callback': PyAudio calls _callback on its own thread for every block of
+    block_size samples; levels are computed there and the game reads the ring.
+    mode='blocking': this thread loops on stream.read(CHUNK) (the original behaviour).
+    Level timestamps are time.perf_counter() at (approximately) capture time.
+    """
 
-class MicrophoneReader(threading.Thread):
-    def __init__(self, device_index=None):
+    def __init__(self, device_index=None, keep_pcm_seconds=0.0, mode='callback', block_size=BLOCK_SIZE,
+                 weighting=None, features=False):
         super().__init__(daemon=True)
         self.pa = pyaudio.PyAudio()
         self.device_index = device_index
+        self.mode = mode
+        self.block_size = int(block_size) if mode == 'callback' else CHUNK
+        # preallocated RMS/peak meter, only used from the capture thread
+        self.meter = LevelMeter(max_block=max(self.block_size, CHUNK), rate=RATE, weighting=weighting)
         self.stream = None
-        self.queue = queue.Queue()
+        # bounded SPSC rings: the capture thread writes, the game loop reads snapshots
+        self.levels = LevelRing(capacity=512, fields=('timestamp', 'rms', 'norm', 'peak'))
+        self.pcm = PcmRing(int(RATE * keep_pcm_seconds)) if keep_pcm_seconds > 0 else None
+        # optional pitch / onset / band features, also computed on the capture thread
+        self.features = FeatureExtractor(self.block_size, RATE) if features else None
+        self.feature_levels = LevelRing(capacity=512, fields=('timestamp',) + FEATURE_FIELDS) if features else None
         self.running = False
 
     def list_devices(self):
@@ -67,14 +107,27 @@ class MicrophoneReader(threading.Thread):
             devices.append((i, dev.get('name'), dev.get('maxInputChannels')))
         return devices
 
+    def device_name(self):
+        try:
+            if self.device_index is not None:
+                return self.pa.get_device_info_by_index(self.device_index).get('name')
+            return self.pa.get_default_input_device_info().get('name')
+        except Exception:
+            return None
+
     def start_stream(self):
         kwargs = dict(format=FORMAT, channels=CHANNELS, rate=RATE, input=True,
-                      frames_per_buffer=CHUNK)
+                      frames_per_buffer=self.block_size)
         if self.device_index is not None:
             kwargs['input_device_index'] = self.device_index
+        if self.mode == 'callback':
+            kwargs['stream_callback'] = self._callback
         self.stream = self.pa.open(**kwargs)
         self.running = True
-        self.start()
+        if self.mode == 'callback':
+            self.stream.start_stream()
+        else:
+            self.start()
 
     def run(self):
         while self.running:
@@ -82,21 +135,58 @@ class MicrophoneReader(threading.Thread):
                 data = self.stream.read(CHUNK, exception_on_overflow=False)
             except Exception:
                 continue
-            rms = rms_from_bytes(data)
-            # normalize RMS to 0..1 roughly (int16 full-scale ~32768)
-            # use a more conservative divider so values are larger for typical mics
-            norm = min(1.0, rms / 2000.0)
-            self.queue.put((rms, norm))
+            self._process_block(data, time.perf_counter())
+
+    def _callback(self, in_data, frame_count, time_info, status):
+        now = time.perf_counter()
+        # the block finished being captured input latency ago (when the host API reports it)
+        try:
+            input_latency = time_info['current_time'] - time_info['input_buffer_adc_time']
+        except Exception:
+            input_latency = 0.0
+        if not 0.0 < input_latency < 0.5:
+            input_latency = 0.0
+        self._process_block(in_data, now - input_latency)
+        return (None, pyaudio.paContinue if self.running else pyaudio.paComplete)
+
+    def _process_block(self, data, timestamp):
+        samples = np.frombuffer(data, dtype=np.int16)
+        rms, peak = self.meter.measure(samples)
+        # normalize RMS to 0..1 roughly (int16 full-scale ~32768)
+        # use a more conservative divider so values are larger for typical mics
+        norm = min(1.0, rms / 2000.0)
+        if self.pcm is not None:
+            self.pcm.write(samples)
+        self.levels.push(timestamp, rms, norm, peak)
+        if self.features is not None:
+            f = self.features.process(samples)
+            self.feature_levels.push(timestamp, *[f[name] for name in FEATURE_FIELDS])
 
     def read_level(self, default=0.0):
-        # consume latest value if available
-        last = (0.0, default)
-        while not self.queue.empty():
-            try:
-                last = self.queue.get_nowait()
-            except Exception:
-                break
-        return last
+        # latest value written since the previous call; (0.0, default) if no new block arrived
+        new = self.levels.read_new()
+        if len(new) == 0:
+            return (0.0, default)
+        _, rms, norm, _ = new[-1]
+        return (float(rms), float(norm))
+
+    def read_blocks(self):
+        # all level rows (timestamp, rms, norm, peak) captured since the previous call
+        return self.levels.read_new()
+
+    def read_features(self):
+        # all feature rows (timestamp + FEATURE_FIELDS) captured since the previous call
+        return self.feature_levels.read_new()
+
+    def flush(self):
+        # drop everything captured so far, so the next read starts from fresh blocks
+        self.levels.reset_reader()
+        if self.feature_levels is not None:
+            self.feature_levels.reset_reader()
+
+    def recent_levels(self, count=None):
+        # snapshot of the newest level samples (rows of timestamp, rms, norm) without consuming them
+        return self.levels.snapshot(count)
 
     def stop(self):
         self.running = False
@@ -112,47 +202,100 @@ class MicrophoneReader(threading.Thread):
             pass
 
 
-def main():
+class LatencyMeter:
+    """Sound -> jump latency: from the first loud block of a sound to the frame showing the jump."""
+
+    def __init__(self, threshold, window=20):
+        self.threshold = threshold
+        self.loud = False
+        # capture time of the first block above threshold in the current sound
+        self.onset = None
+        self.pending = None
+        self.last_ms = None
+        self.samples = []
+        self.window = window
+
+    def feed(self, blocks):
+        for t, _, norm, _ in blocks:
+            if norm >= self.threshold:
+                if not self.loud:
+                    self.loud = True
+                    self.onset = t
+            else:
+                self.loud = False
+
+    def reset(self):
+        # forget a sound in progress (e.g. at the start of a run); keeps the measured history
+        self.loud = False
+        self.onset = None
+        self.pending = None
+
+    def jumped(self):
+        # called when a jump starts; measured once the frame is on screen
+        if self.onset is not None:
+            self.pending = self.onset
+            self.onset = None
+
+    def frame_shown(self, now):
+        if self.pending is None:
+            return
+        self.last_ms = (now - self.pending) * 1000.0
+        self.pending = None
+        self.samples.append(self.last_ms)
+        if len(self.samples) > self.window:
+            self.samples.pop(0)
+
+    @property
+    def average_ms(self):
+        return sum(self.samples) / len(self.samples) if self.samples else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Voice-controlled FishJump')
+    parser.add_argument('--mode', choices=('callback', 'blocking'), default='callback',
+                        help='PyAudio capture mode (default: callback)')
+    parser.add_argument('--block-size', type=int, default=BLOCK_SIZE,
+                        help='Samples per block in callback mode (default: %(default)s)')
+    parser.add_argument('--device', type=int, default=None, help='Input device index')
+    parser.add_argument('--weighting', choices=WEIGHTINGS, default=None,
+                        help="Frequency weighting for the level: 'voice' band or 'a' (A-weighting)")
+    parser.add_argument('--dirty-rects', action='store_true',
+                        help='Push only changed screen areas to the display instead of full flips')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='Seed the obstacle runs (default: a random seed per run, stored on the scoreboard)')
+    parser.add_argument('--control', choices=('level', 'pitch', 'onset'), default='level',
+                        help='What makes the fish jump: loudness tiers, voice pitch, or sound onsets')
+    parser.add_argument('--record-levels', metavar='PATH',
+                        help='Save every captured level block to a .npy trace (for parkour_benchmark.py)')
+    args = parser.parse_args(argv)
+
     pygame.init()
     screen = pygame.display.set_mode((WIDTH, HEIGHT))
     pygame.display.set_caption('Voice Parkour - Louder = Higher Jump')
     clock = pygame.time.Clock()
 
-    mic = MicrophoneReader()
+    mic = MicrophoneReader(args.device, mode=args.mode, block_size=args.block_size,
+                           weighting=args.weighting, features=args.control != 'level')
     devices = mic.list_devices()
     print('Input devices:')
     for i, name, chans in devices:
         if chans > 0:
             print(f'  {i}: {name} (in-ch={chans})')
     mic.start_stream()
+    print(f'Capture: {mic.mode} mode, {mic.block_size} samples/block '
+          f'({mic.block_size * 1000.0 / RATE:.0f} ms)')
 
-    # high score file
-    HS_PATH = os.path.join(os.path.dirname(__file__), 'highscore.txt')
-    try:
-        with open(HS_PATH, 'r', encoding='utf-8') as f:
-            high_score = int(f.read().strip() or '0')
-    except Exception:
-        high_score = 0
-
-    # Player state (a little chick)
-    player_x = 120
-    player_y = GROUND_Y
-    vel_y = 0.0
-    on_ground = True
-
-    # Game state
-    scroll_x = 0
-    base_speed = 180.0  # fish always swims forward
-    speed = base_speed
-    obstacles = []
-    score = 0
-    spawn_timer = 0.0
-    # randomized spawn interval range (seconds)
-    spawn_min = 0.7
-    spawn_max = 1.8
-    spawn_interval = random.uniform(spawn_min, spawn_max)
-
-    font = pygame.font.SysFont(None, 24)
+    # scoreboard: written by a background thread, debounced and atomic
+    scoreboard = ScoreboardWriter()
+    high_score = scoreboard.high_score
+    run_info = dict(source='pygame', device=mic.device_name(), mode=mic.mode,
+                    block_size=mic.block_size, weighting=args.weighting, control=args.control)
+
+    # all game logic lives in the simulation; this loop feeds it levels and draws it
+    sim = ParkourSim(args.seed)
+    scoreboard.start_run(run_seed=sim.run_seed, **run_info)
+
+    font = hud_font(24)
     # try to load external fish sprite
     SPRITE_PATH = r'F:\\PolyU\\Sem1\\5913Programming\\Interactive_Website\\fish.png'
     fish_sprite = None
@@ -163,226 +306,117 @@ def main():
             fish_sprite = pygame.transform.smoothscale(fish_sprite, (56, 28))
     except Exception:
         fish_sprite = None
+    # background and sprites are rendered once; each frame only blits them
+    background = WaveBackground(WIDTH, HEIGHT, GROUND_Y)
+    dirty = DirtyRects(enabled=args.dirty_rects)
+    # every level block read, for --record-levels
+    recorded = [] if args.record_levels else None
     try:
         running = True
-        last_time = time.time()
-        # smoothing for display and stability
-        smooth_level = 0.0
+        # smoothing for the dB readout
         smooth_db = -120.0
-        ema_alpha = 0.15
-        # overall sensitivity (keeps jumps sensible)
-        sensitivity = 1.2
-        # kept for legacy scaling (set to 1.0)
-        jump_multiplier = 1.0
+        latency = LatencyMeter(sim.tiers[0])
+        first_frame = True
+        pitch = 0.0
+        # playing / game over / countdown; the loop never blocks, so events and audio keep flowing
+        flow = GameFlow()
         while running:
             dt = clock.tick(60) / 1000.0
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     running = False
 
-            # read microphone level (0..1)
-            level = mic.read_level(0.0)
-
-            # level is a tuple (rms, norm)
-            rms_val, raw_level = level
-
-            # apply smoothing (EMA) to the normalized level
-            smooth_level = (1.0 - ema_alpha) * smooth_level + ema_alpha * raw_level
+            now = time.perf_counter()
+            entered = flow.update(now)
+            if entered == COUNTDOWN:
+                # new run behind the countdown
+                sim.restart()
+                scoreboard.start_run(run_seed=sim.run_seed, **run_info)
+            elif entered == PLAYING:
+                # start the run from fresh audio and a clean latency baseline
+                mic.flush()
+                latency.reset()
+
+            # read every block captured since the last frame; the loudest one drives this frame
+            blocks = mic.read_blocks()
+            latency.feed(blocks)
+            if recorded is not None and len(blocks):
+                recorded.append(blocks)
+            if len(blocks):
+                loudest = blocks[blocks[:, 2].argmax()]
+                rms_val, raw_level = float(loudest[1]), float(loudest[2])
+            else:
+                rms_val, raw_level = 0.0, 0.0
 
             # compute approximate dBFS from rms relative to int16 full-scale
-            if rms_val <= 1e-6:
-                frame_db = -120.0
-            else:
-                frame_db = 20.0 * math.log10(rms_val / 32768.0)
-            smooth_db = (1.0 - ema_alpha) * smooth_db + ema_alpha * frame_db
-
-            # Map smoothed level to jump impulse; chick always runs forward at base_speed
-            speed = base_speed
-
-            # jumping: discretize level into tiers so louder sounds give higher jumps
-            # thresholds define the lower bound for each tier
-            # include a tiny jump at 0.03 for sensitivity
-            tiers = [0.03, 0.18, 0.35, 0.55, 0.75]
-            # multipliers per tier (0: no jump, 1..n increasing heights)
-            tier_scales = [0.0, 0.35, 0.9, 1.6, 2.2, 2.8]
-            if on_ground:
-                tier = 0
-                for i, t in enumerate(tiers, start=1):
-                    if smooth_level >= t:
-                        tier = i
-                if tier > 0:
-                    scale = tier_scales[tier]
-                    # slightly increase sensitivity so small sounds register
-                    base = 650.0 * (sensitivity * 1.1) * jump_multiplier
-                    # smaller offset for the tiny jump
-                    impulse = - (0.5 + scale) * base
-                    vel_y = impulse
-                    on_ground = False
-
-            # physics
-            gravity = 1800.0
-            vel_y += gravity * dt
-            player_y += vel_y * dt
-            if player_y >= GROUND_Y:
-                player_y = GROUND_Y
-                vel_y = 0.0
-                on_ground = True
-
-            # horizontal movement: scroll world
-            scroll_x += speed * dt
-
-            # spawn obstacles (randomized interval and size)
-            spawn_timer += dt
-            if spawn_timer >= spawn_interval:
-                spawn_timer = 0.0
-                # obstacles are tuples (x, w, h, passed)
-                ox = scroll_x + WIDTH + 50
-                # randomize size a bit
-                w = random.randint(28, 48)
-                h = random.randint(28, 56)
-                obstacles.append([ox, w, h, False])
-                # next spawn interval randomized
-                spawn_interval = random.uniform(spawn_min, spawn_max)
-
-            # move obstacles left relative to scroll
-            for ob in obstacles:
-                ob[0] -= speed * dt
-
-            # award score when the player passes an obstacle (immediate)
-            for ob in obstacles:
-                if not ob[3] and (ob[0] + ob[1]) < player_x:
-                    ob[3] = True
-                    score += 1
-                    if score > high_score:
-                        high_score = score
-                        try:
-                            with open(HS_PATH, 'w', encoding='utf-8') as f:
-                                f.write(str(high_score))
-                        except Exception:
-                            pass
-
-            # remove obstacles that went off screen far to keep list small
-            obstacles = [ob for ob in obstacles if ob[0] + ob[1] > -100]
-
-            # draw
-            screen.fill((135, 206, 235))  # sky
-            # ground
-            pygame.draw.rect(screen, (80, 160, 60), (0, GROUND_Y + 40, WIDTH, HEIGHT - GROUND_Y))
-
-            # draw layered wave background (vector style)
-            for i, (wave_h, color, offset) in enumerate([(120, (100, 160, 220), 0), (80, (90, 150, 210), 30), (40, (70, 130, 200), 60)]):
-                # draw a simple sinusoidal band using ellipses/polygons approximation
-                step = 40
-                points = []
-                for x in range(-step, WIDTH + step, step):
-                    y = int(GROUND_Y - wave_h + math.sin((x + scroll_x * 0.2 + offset) * 0.02) * 12)
-                    points.append((x, y))
-                # close polygon to bottom
-                points.append((WIDTH, HEIGHT))
-                points.append((0, HEIGHT))
-                pygame.draw.polygon(screen, color, points)
-
-            # draw obstacles as angry piranhas (vector shapes)
-            fish_rect = pygame.Rect(player_x, player_y - 28, 56, 28)
-            for ob in obstacles:
-                ox, w, h, _ = ob
-                # piranha body
-                body_rect = pygame.Rect(int(ox), GROUND_Y - h, w, h)
-                body_color = (180, 40, 40)
-                pygame.draw.ellipse(screen, body_color, body_rect)
-                # eye
-                ex = int(ox + w * 0.65)
-                ey = GROUND_Y - h + int(h * 0.3)
-                pygame.draw.circle(screen, (255, 255, 255), (ex, ey), max(2, w // 8))
-                pygame.draw.circle(screen, (0, 0, 0), (ex, ey), max(1, w // 16))
-                # teeth (triangles)
-                tx = int(ox + w * 0.15)
-                ty = GROUND_Y - h + int(h * 0.35)
-                for t in range(3):
-                    p1 = (tx + t * (w // 6), ty + 2)
-                    p2 = (tx + t * (w // 6) + (w // 12), ty - 6)
-                    p3 = (tx + t * (w // 6) + (w // 6), ty + 2)
-                    pygame.draw.polygon(screen, (255, 255, 255), [p1, p2, p3])
-
-            # draw fish player: external sprite if available, otherwise vector fallback
-            fx = player_x
-            fy = player_y - 20
-            if fish_sprite is not None:
-                screen.blit(fish_sprite, (fx, fy - 8))
-                fish_rect = pygame.Rect(fx, fy - 8, 56, 28)
-            else:
-                # body
-                pygame.draw.ellipse(screen, (80, 200, 200), (fx, fy - 8, 56, 28))
-                # tail
-                pygame.draw.polygon(screen, (60, 170, 170), [(fx - 8, fy + 6), (fx - 8, fy - 6), (fx - 20, fy)])
-                # eye
-                pygame.draw.circle(screen, (255, 255, 255), (fx + 40, fy - 4), 5)
-                pygame.draw.circle(screen, (0, 0, 0), (fx + 40, fy - 4), 2)
-                # fin
-                pygame.draw.polygon(screen, (70, 180, 180), [(fx + 12, fy - 8), (fx + 24, fy - 18), (fx + 36, fy - 8)])
-                fish_rect = pygame.Rect(fx, fy - 8, 56, 28)
-
-            # collision detection
-            for ob in obstacles:
-                ox, w, h, passed = ob
-                ob_rect = pygame.Rect(int(ox), GROUND_Y - h, w, h)
-                if fish_rect.colliderect(ob_rect):
-                    # game over: show message and reset
-                    msg = font.render(f'Hit! Score: {score}. Close window to quit or wait to restart.', True, (255, 0, 0))
-                    screen.blit(msg, (WIDTH // 2 - msg.get_width() // 2, HEIGHT // 2 - 20))
-                    pygame.display.flip()
-                    time.sleep(1.2)
-                    # reset
-                    obstacles.clear()
-                    scroll_x = 0
-                    score = 0
-                    spawn_timer = 0.0
-                    break
-
-            # HUD
-            player_rect = fish_rect
-
-            # HUD: show score and high score
-            txt = font.render(f'Score: {score}  High: {high_score}', True, (0, 0, 0))
-            screen.blit(txt, (8, 8))
-            instr = font.render('Chick auto-runs. Make sound to jump higher and clear obstacles.', True, (0, 0, 0))
-            screen.blit(instr, (8, 32))
-
-            # top-right: amplified numeric level + dB and a vertical meter
-            meter_x = WIDTH - 120
-            meter_y = 8
-            meter_w = 16
-            meter_h = 64
-
-            # amplify small values for visibility (sqrt scaling)
-            vis_level = math.sqrt(smooth_level)
-            vis_level = max(0.0, min(1.0, vis_level * 1.05))
-
-            # color by level
-            if vis_level < 0.33:
-                color = (30, 160, 30)
-            elif vis_level < 0.66:
-                color = (220, 180, 20)
+            frame_db = to_db(rms_val)
+            smooth_db = (1.0 - EMA_ALPHA) * smooth_db + EMA_ALPHA * frame_db
+
+            # pitch / onset control: the features pick the jump tier directly, loudness only gates it
+            force_tier = None
+            if mic.features is not None:
+                rows = mic.read_features()
+                voiced = rows[rows[:, 1] > 0.0] if len(rows) else rows
+                if len(voiced):
+                    pitch = float(voiced[-1, 1])
+                force_tier = 0
+                if args.control == 'pitch':
+                    if len(voiced) and raw_level >= sim.tiers[0]:
+                        force_tier = sim.tier_for(pitch_to_level(pitch))
+                elif len(rows) and rows[:, 3].any():
+                    force_tier = max(1, sim.tier_for(raw_level))
+
+            if flow.playing:
+                sim.step(raw_level, dt, force_tier)
+                if sim.jump_tier:
+                    latency.jumped()
+                if sim.scored:
+                    scoreboard.record(sim.score)
+                    high_score = max(high_score, sim.score)
+                if sim.hit:
+                    flow.hit(now)
+                    scoreboard.end_run()
             else:
-                color = (200, 30, 30)
-
-            # draw meter background
-            pygame.draw.rect(screen, (200, 200, 200), (meter_x, meter_y, meter_w, meter_h))
-            fill_h = int(meter_h * vis_level)
-            pygame.draw.rect(screen, color, (meter_x, meter_y + (meter_h - fill_h), meter_w, fill_h))
-
-            # bigger text for numeric readout
-            big_font = pygame.font.SysFont(None, 28)
-            right_txt = big_font.render(f'{smooth_level:.2f}', True, color)
-            db_txt = font.render(f'{smooth_db:.1f} dB', True, (0, 0, 0))
-            screen.blit(right_txt, (meter_x + meter_w + 8, meter_y))
-            screen.blit(db_txt, (meter_x + meter_w + 8, meter_y + 26))
-
-            pygame.display.flip()
+                # paused: the world stays still, the level meter keeps moving
+                sim.observe(raw_level)
+
+            draw_world(screen, background, sim, dirty, fish_sprite)
+
+            # game over message, then a countdown to the next run
+            msg = None
+            if flow.state == GAME_OVER:
+                msg = text_cache.render(f'Hit! Score: {sim.score}. Close window to quit or wait to restart.', font, (255, 0, 0))
+            elif flow.state == COUNTDOWN:
+                msg = text_cache.render(f'Get ready... {int(flow.remaining(now)) + 1}', font)
+            if msg is not None:
+                dirty.add(screen.blit(msg, (WIDTH // 2 - msg.get_width() // 2, HEIGHT // 2 - 20)))
+
+            # HUD, with the measured sound -> jump latency and the feature extractor's cost
+            status = []
+            if latency.last_ms is not None:
+                status.append(f'Latency: {latency.last_ms:.0f} ms (avg {latency.average_ms:.0f} ms, '
+                              f'{mic.mode} {mic.block_size})')
+            if mic.features is not None:
+                cost = mic.features.stats()
+                status.append(f'{args.control}: pitch {pitch:.0f} Hz, features {cost["mean_ms"]:.2f} ms/block '
+                              f'(max {cost["max_ms"]:.2f}, {cost["load"] * 100:.0f}% of {cost["budget_ms"]:.0f} ms)')
+            draw_hud(screen, font, sim, high_score, smooth_db, dirty, status)
+
+            dirty.flush()
+            latency.frame_shown(time.perf_counter())
+            if first_frame:
+                # the website's game launcher measures startup time up to this line
+                print('FishJump ready', flush=True)
+                first_frame = False
 
     finally:
+        scoreboard.end_run()
+        scoreboard.close()
         mic.stop()
         pygame.quit()
+        if recorded:
+            np.save(args.record_levels, np.concatenate(recorded))
+            print(f'Level trace saved to {args.record_levels}')
 
 
 if __name__ == '__main__':
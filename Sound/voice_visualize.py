@@ -1,4 +1,4 @@
-"""Record or load audio and visualize waveform and spectrogram.
+"""Record or load audio and visualize waveform, RMS/peak level and spectrogram.
 
 Usage examples:
   python voice_visualize.py --record 3
@@ -15,6 +15,8 @@ import numpy as np
 import matplotlib.pyplot as plt
 import pyaudio
 
+from level_meter import LevelMeter, to_db
+
 
 def record_to_wav(seconds, out_path, rate=44100, frames_per_buffer=1024):
     p = pyaudio.PyAudio()
@@ -43,24 +45,49 @@ def record_to_wav(seconds, out_path, rate=44100, frames_per_buffer=1024):
         p.terminate()
 
 
+def level_envelope(pcm, rate, block=1024):
+    """Per-block RMS and peak in dBFS, using the same meter as the live tools."""
+    meter = LevelMeter(max_block=block, rate=rate)
+    starts = range(0, len(pcm) - block + 1, block)
+    rms_db = np.empty(len(starts))
+    peak_db = np.empty(len(starts))
+    for i, start in enumerate(starts):
+        rms, peak = meter.measure(pcm[start:start + block])
+        rms_db[i] = to_db(rms)
+        peak_db[i] = to_db(peak)
+    times = (np.arange(len(starts)) * block + block / 2) / rate
+    return times, rms_db, peak_db
+
+
 def visualize_wav(path):
     with wave.open(path, 'rb') as wf:
         rate = wf.getframerate()
         n_frames = wf.getnframes()
         data = wf.readframes(n_frames)
-        samples = np.frombuffer(data, dtype=np.int16).astype(np.float32) / 32768.0
+        pcm = np.frombuffer(data, dtype=np.int16)
+        samples = pcm.astype(np.float32) / 32768.0
 
     times = np.linspace(0, n_frames / rate, num=n_frames)
 
-    plt.figure(figsize=(12, 6))
+    plt.figure(figsize=(12, 8))
 
-    plt.subplot(2, 1, 1)
+    plt.subplot(3, 1, 1)
     plt.plot(times, samples)
     plt.title('Waveform')
     plt.xlabel('Time [s]')
     plt.ylabel('Amplitude')
 
-    plt.subplot(2, 1, 2)
+    plt.subplot(3, 1, 2)
+    level_times, rms_db, peak_db = level_envelope(pcm, rate)
+    plt.plot(level_times, peak_db, label='Peak')
+    plt.plot(level_times, rms_db, label='RMS')
+    plt.ylim(-90, 0)
+    plt.title('Level')
+    plt.xlabel('Time [s]')
+    plt.ylabel('dBFS')
+    plt.legend(loc='upper right')
+
+    plt.subplot(3, 1, 3)
     # Spectrogram
     plt.specgram(samples, NFFT=1024, Fs=rate, noverlap=512, cmap='inferno')
     plt.title('Spectrogram')
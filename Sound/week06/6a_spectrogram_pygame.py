@@ -41,6 +41,7 @@ class PygameSpectrogram:
         self.GREEN = (0, 255, 0)
         self.BLUE = (0, 100, 255)
         self.RED = (255, 100, 100)
+        self.SPEC_BG = (20, 20, 20)
         
         # Data buffers
         self.audio_buffer = np.zeros(self.ROLLING_WINDOW, dtype=np.float32)
@@ -48,6 +49,10 @@ class PygameSpectrogram:
         self.spectrogram_smoothed = np.zeros((self.freq_bin_display, self.width))
         self.audio_queue = queue.Queue()
         
+        # Spectrogram image: 256-entry colormap lookup table and a work buffer reused every frame
+        self.colormap = self.build_colormap()
+        self.spec_values = np.zeros((self.freq_bin_display, self.width))
+        
         # Smoothing parameters
         self.temporal_smoothing = 0.7  # How much to blend with previous frame (0-1)
         self.update_counter = 0
@@ -55,6 +60,13 @@ class PygameSpectrogram:
         # Initialize audio
         self.setup_audio()
         
+        # 8-bit surfaces with the colormap as palette: one pixel per (time column, frequency bin)
+        # holds the 0-255 level, and the color lookup happens when blitting to the screen
+        self.spec_surface = pygame.Surface((self.width, self.freq_bin_display), depth=8)
+        self.spec_surface.set_palette(self.colormap)
+        self.spec_scaled = pygame.Surface((self.width, self.spec_height), depth=8)
+        self.spec_scaled.set_palette(self.colormap)
+        
         # Fonts
         self.font = pygame.font.Font(None, 24)
         self.small_font = pygame.font.Font(None, 18)
@@ -239,41 +251,40 @@ class PygameSpectrogram:
         
         return (max(0, min(255, r)), max(0, min(255, g)), max(0, min(255, b)))
     
+    def build_colormap(self):
+        """Precompute value_to_color for 256 levels; values up to 0.1 stay background"""
+        colormap = []
+        for i in range(256):
+            value = i / 255.0
+            colormap.append(self.value_to_color(value) if value > 0.1 else self.SPEC_BG)
+        return colormap
+    
     def draw_spectrogram(self):
         """Draw the spectrogram"""
         spec_rect = pygame.Rect(0, 0, self.width, self.spec_height)
         
-        # Clear spectrogram area with dark background
-        pygame.draw.rect(self.screen, (20, 20, 20), spec_rect)
-        
         # Check if we have any data
         max_value = np.max(self.spectrogram_smoothed)
         if max_value < 1e-6:
+            # Clear spectrogram area with dark background (the image below covers all of it)
+            pygame.draw.rect(self.screen, self.SPEC_BG, spec_rect)
             # Draw "no signal" message
             no_signal_text = self.font.render("No audio signal detected - make some noise!", True, (100, 100, 100))
             text_rect = no_signal_text.get_rect(center=(self.width//2, self.spec_height//2))
             self.screen.blit(no_signal_text, text_rect)
             return
         
-        # Draw spectrogram pixels with improved scaling
-        pixel_size = max(1, min(2, self.width // 600))  # Smaller pixels for smoother look
-        
-        for x in range(0, self.width, pixel_size):
-            for y in range(0, min(self.freq_bin_display, self.spec_height), pixel_size):
-                if x < self.spectrogram_smoothed.shape[1] and y < self.spectrogram_smoothed.shape[0]:
-                    value = self.spectrogram_smoothed[y, x]
-                    
-                    # Skip very low values for performance
-                    if value > 0.1:
-                        color = self.value_to_color(value)
-                        
-                        # Calculate position (flip Y axis)
-                        draw_y = self.spec_height - (y * self.spec_height // self.freq_bin_display) - pixel_size
-                        draw_y = max(0, min(self.spec_height - pixel_size, draw_y))
-                        
-                        # Draw pixel
-                        pixel_rect = pygame.Rect(x, draw_y, pixel_size, pixel_size)
-                        pygame.draw.rect(self.screen, color, pixel_rect)
+        # Quantize the whole spectrogram to 0-255 palette indices at once (no per-pixel Python calls)
+        values = self.spec_values
+        np.multiply(self.spectrogram_smoothed, 255.0, out=values)
+        np.clip(values, 0, 255, out=values)
+        # surfarray is indexed [x, y]: write through the transposed view, flipped so
+        # low frequencies are at the bottom
+        pixels = pygame.surfarray.pixels2d(self.spec_surface)
+        pixels.T[::-1] = values
+        del pixels  # unlock the surface
+        pygame.transform.scale(self.spec_surface, (self.width, self.spec_height), self.spec_scaled)
+        self.screen.blit(self.spec_scaled, (0, 0))
         
         # Draw frequency labels
         label_y_positions = [0.1, 0.3, 0.5, 0.7, 0.9]
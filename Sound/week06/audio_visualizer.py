@@ -1,8 +1,15 @@
+import os
+import sys
+
 import pyaudio
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation
 
+# 共用 Sound/level_meter.py
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from level_meter import LevelMeter, to_db
+
 # 音频配置
 CHUNK = 1024
 FORMAT = pyaudio.paInt16
@@ -21,6 +28,9 @@ class AudioVisualizer:
                                      horizontalalignment='right', verticalalignment='top', fontsize=10,
                                      bbox=dict(facecolor='white', alpha=0.6, edgecolor='none'))
 
+        # 预分配缓冲区的 RMS 计算器
+        self.meter = LevelMeter(max_block=CHUNK, rate=RATE)
+
         # 初始化PyAudio
         self.p = pyaudio.PyAudio()
         self.stream = self.p.open(
@@ -33,17 +43,9 @@ class AudioVisualizer:
     
     def calculate_volume_db(self, data, min_db=-80.0):
         """计算音频数据的 RMS 并返回 dB 值及归一化 0..1 显示值"""
-        audio_data = np.frombuffer(data, dtype=np.int16).astype(np.float32)
-        if audio_data.size == 0:
-            return min_db, 0.0
-        rms = np.sqrt(np.mean(audio_data**2)) / 32768.0
-        # 防止 log(0)
-        if rms <= 1e-10:
-            db = min_db
-        else:
-            db = 20.0 * np.log10(rms)
-            if db < min_db:
-                db = min_db
+        rms, _ = self.meter.measure(data)
+        # 防止 log(0)：低于 min_db 的按 min_db 处理
+        db = to_db(rms, floor_db=min_db)
 
         # 归一化 dB -> 0..1（min_db -> 0, 0dB -> 1）并放大低音量变化
         norm = (db - min_db) / (-min_db)
@@ -1,3 +1,5 @@
+import os
+import sys
 import streamlit as st
 from streamlit_webrtc import webrtc_streamer, VideoTransformerBase, RTCConfiguration
 import cv2
@@ -5,6 +7,11 @@ import numpy as np
 import av
 from typing import Union
 
+# 复用仓库根目录下的公共模块
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from frame_metrics import FrameMetrics
+from face_detectors import create_detector
+
 # 语言文本字典
 CAMERA_LANGUAGES = {
     'zh': {
@@ -75,56 +82,47 @@ def get_camera_text(key, lang='zh'):
 if 'camera_language' not in st.session_state:
     st.session_state.camera_language = 'zh'
 
-# 初始化检测统计
-if 'face_count' not in st.session_state:
-    st.session_state.face_count = 0
-if 'processing_fps' not in st.session_state:
-    st.session_state.processing_fps = 0
-
 class FaceDetectionTransformer(VideoTransformerBase):
     def __init__(self):
-        self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+        self.detector = create_detector('haar')
         self.confidence_threshold = 0.3
         self.detection_color = (0, 255, 0)  # Green
         self.face_detection_enabled = True
-        self.frame_count = 0
-        self.last_fps_time = cv2.getTickCount()
+        # 逐帧耗时统计（recv在WebRTC线程中运行，页面线程通过metrics.snapshot()读取）
+        self.metrics = FrameMetrics()
         
     def recv(self, frame: av.VideoFrame) -> av.VideoFrame:
-        img = frame.to_ndarray(format="bgr24")
+        timer = self.metrics.start_frame()
+        face_count = 0
+        
+        with timer.stage('decode'):
+            img = frame.to_ndarray(format="bgr24")
         
         if self.face_detection_enabled:
             # 转换为灰度图进行人脸检测
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+            with timer.stage('grayscale'):
+                gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
             
-            # 检测人脸
-            faces = self.face_cascade.detectMultiScale(
-                gray,
-                scaleFactor=1.1,
-                minNeighbors=5,
-                minSize=(30, 30),
-                flags=cv2.CASCADE_SCALE_IMAGE
-            )
+            # 检测人脸（按置信度阈值过滤）
+            with timer.stage('detect'):
+                faces = self.detector.detect(img, gray, self.confidence_threshold)
             
             # 更新人脸数量统计
-            st.session_state.face_count = len(faces)
+            face_count = len(faces)
             
             # 绘制人脸框
-            for (x, y, w, h) in faces:
-                cv2.rectangle(img, (x, y), (x + w, y + h), self.detection_color, 2)
-                
-                # 添加置信度文本（简化版）
-                cv2.putText(img, 'Face', (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, self.detection_color, 1)
+            with timer.stage('draw'):
+                for (x, y, w, h, score) in faces:
+                    cv2.rectangle(img, (x, y), (x + w, y + h), self.detection_color, 2)
+                    
+                    # 添加置信度文本
+                    cv2.putText(img, f'Face {score:.2f}', (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, self.detection_color, 1)
         
-        # 计算FPS
-        self.frame_count += 1
-        if self.frame_count % 30 == 0:  # 每30帧计算一次FPS
-            current_time = cv2.getTickCount()
-            fps = 30.0 / ((current_time - self.last_fps_time) / cv2.getTickFrequency())
-            st.session_state.processing_fps = round(fps, 1)
-            self.last_fps_time = current_time
+        with timer.stage('encode'):
+            out_frame = av.VideoFrame.from_ndarray(img, format="bgr24")
         
-        return av.VideoFrame.from_ndarray(img, format="bgr24")
+        timer.finish(face_count)
+        return out_frame
     
     def update_settings(self, confidence_threshold, detection_color, face_detection_enabled):
         self.confidence_threshold = confidence_threshold
@@ -228,17 +226,24 @@ def main():
         # 检测统计
         st.subheader(get_camera_text('detection_stats', st.session_state.camera_language))
         
+        face_count, processing_fps = 0, 0
+        webrtc_ctx = st.session_state.get('webrtc_ctx')
+        if webrtc_ctx and webrtc_ctx.video_processor:
+            metrics_snapshot = webrtc_ctx.video_processor.metrics.snapshot()
+            face_count = metrics_snapshot['face_count']
+            processing_fps = metrics_snapshot['fps']
+        
         col_faces, col_fps = st.columns(2)
         with col_faces:
             st.metric(
                 get_camera_text('faces_detected', st.session_state.camera_language),
-                st.session_state.face_count
+                face_count
             )
         
         with col_fps:
             st.metric(
                 get_camera_text('processing_fps', st.session_state.camera_language),
-                f"{st.session_state.processing_fps}"
+                f"{processing_fps}"
             )
     
     # 主内容区域
@@ -0,0 +1,103 @@
+"""
+adaptive_quality.py
+
+相机页面的自适应画质控制器。
+
+根据每帧处理耗时自动调整画质等级：CPU 忙不过来时依次降低检测分辨率、检测频率
+以及请求的摄像头分辨率，让延迟保持在目标以内；有余量时再逐级恢复。
+observe() 在视频线程中调用，settings() 可以在页面线程中读取，两者之间用锁保护。
+"""
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from frame_metrics import FRAME_BUDGET_MS
+
+# 画质等级，从高到低
+#   detect_scale : 检测前把图像缩放到的比例
+#   detect_every : 每隔几帧检测一次（其余帧沿用上一次的人脸框）
+#   resolution   : 请求的摄像头分辨率 (宽, 高)
+QUALITY_LEVELS = [
+    {'detect_scale': 1.0, 'detect_every': 1, 'resolution': (1280, 720)},
+    {'detect_scale': 0.75, 'detect_every': 1, 'resolution': (1280, 720)},
+    {'detect_scale': 0.5, 'detect_every': 1, 'resolution': (960, 540)},
+    {'detect_scale': 0.5, 'detect_every': 2, 'resolution': (640, 480)},
+    {'detect_scale': 0.4, 'detect_every': 3, 'resolution': (640, 360)},
+]
+
+
+class AdaptiveQualityController:
+    """按滚动窗口内的p90帧耗时升降画质等级"""
+
+    def __init__(self, target_ms=FRAME_BUDGET_MS * 0.8, levels=QUALITY_LEVELS, window=30,
+                 headroom=0.5, cooldown=2.0, enabled=True):
+        self.target_ms = target_ms
+        self.levels = levels
+        self.window = window
+        # p90 低于 target_ms * headroom 时认为有余量，可以提高画质
+        self.headroom = headroom
+        # 两次调整之间的最短间隔（秒），避免来回抖动
+        self.cooldown = cooldown
+        self.enabled = enabled
+
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=window)
+        self._level = 0
+        self._last_change = 0.0
+        self._changes = 0
+
+    @property
+    def level(self):
+        return self._level
+
+    def settings(self):
+        """当前画质等级对应的设置（禁用时始终为最高画质）"""
+        level = self._level if self.enabled else 0
+        return dict(self.levels[level], level=level)
+
+    def observe(self, frame_ms, now=None):
+        """记录一帧的处理耗时，必要时调整等级；返回等级是否发生变化"""
+        if not self.enabled:
+            return False
+        now = time.time() if now is None else now
+        with self._lock:
+            self._samples.append(frame_ms)
+            if len(self._samples) < self.window or now - self._last_change < self.cooldown:
+                return False
+
+            p90 = float(np.percentile(self._samples, 90))
+            if p90 > self.target_ms and self._level < len(self.levels) - 1:
+                self._level += 1
+            elif p90 < self.target_ms * self.headroom and self._level > 0:
+                self._level -= 1
+            else:
+                return False
+
+            # 等级变化后重新采样，新设置下的耗时才有参考意义
+            self._samples.clear()
+            self._last_change = now
+            self._changes += 1
+            return True
+
+    def status(self):
+        """页面展示用的状态"""
+        with self._lock:
+            p90 = float(np.percentile(self._samples, 90)) if self._samples else 0.0
+            changes = self._changes
+        status = self.settings()
+        status.update(
+            enabled=self.enabled,
+            levels=len(self.levels),
+            target_ms=round(self.target_ms, 1),
+            p90_ms=round(p90, 2),
+            changes=changes,
+        )
+        return status
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._level = 0
+            self._last_change = 0.0
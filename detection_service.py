@@ -0,0 +1,252 @@
+"""
+detection_service.py
+
+多路视频流共享的人脸检测服务。
+
+每个 WebRTC 会话不再在自己的线程里直接跑检测，而是把帧提交给一个共享的工作线程池：
+- OpenCV 的检测（detectMultiScale / dnn forward）会释放 GIL，多个工作线程可以真正并行
+- 每个工作线程持有自己的检测器实例，避免共享 cv2 对象带来的锁竞争
+- 各流之间轮询调度，每个流只保留最新的一帧，过期的帧直接丢弃，保证公平且不积压
+- 支持批量推理的后端（如 ort）一次取走多个流中使用同一后端的待处理帧，合成一批推理
+- 记录每个流和整体的吞吐量、检测耗时和丢帧数
+"""
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import CancelledError, Future
+from concurrent.futures import TimeoutError as FutureTimeout
+
+import numpy as np
+
+from face_detectors import create_detector
+
+DEFAULT_WORKERS = int(os.environ.get('FACE_DETECT_WORKERS', min(4, os.cpu_count() or 1)))
+
+
+class _Request:
+    __slots__ = ('stream_id', 'detector_name', 'img', 'gray', 'score_threshold', 'future', 'submitted')
+
+    def __init__(self, stream_id, detector_name, img, gray, score_threshold):
+        self.stream_id = stream_id
+        self.detector_name = detector_name
+        self.img = img
+        self.gray = gray
+        self.score_threshold = score_threshold
+        self.future = Future()
+        self.submitted = time.perf_counter()
+
+
+class _StreamStats:
+    """单个流的统计（只在持有服务锁时访问）"""
+
+    def __init__(self, window):
+        self.frames = 0
+        self.dropped = 0
+        self.faces = 0
+        self.done_times = deque(maxlen=window)
+        self.latency_ms = deque(maxlen=window)
+        self.detect_ms = deque(maxlen=window)
+        self.last_result = []
+        self.last_seen = time.time()
+
+
+class DetectionService:
+    """共享检测工作线程池，按流轮询调度"""
+
+    def __init__(self, workers=DEFAULT_WORKERS, detector_factory=create_detector, window=120, stale_after=10.0):
+        self.workers = max(1, int(workers))
+        self.detector_factory = detector_factory
+        self.window = window
+        self.stale_after = stale_after
+
+        self._cond = threading.Condition()
+        # stream_id -> 待处理请求（每个流最多保留一帧）；顺序即轮询顺序
+        self._queues = OrderedDict()
+        self._streams = {}
+        self._running = True
+        # 批量推理统计：推理次数和处理的帧数
+        self._batches = 0
+        self._batched_frames = 0
+        self._threads = []
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker_loop, name=f'face-detect-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, stream_id, detector_name, img, gray=None, score_threshold=None):
+        """提交一帧，返回 concurrent.futures.Future，结果为 [(x, y, w, h, score), ...]"""
+        request = _Request(stream_id, detector_name, img, gray, score_threshold)
+        with self._cond:
+            if not self._running:
+                raise RuntimeError('DetectionService has been shut down')
+            stats = self._stream_stats(stream_id)
+            stats.last_seen = time.time()
+            queue = self._queues.get(stream_id)
+            if queue is None:
+                queue = self._queues[stream_id] = deque()
+            # 实时视频只需要最新一帧，还没开始处理的旧帧直接作废
+            while queue:
+                old = queue.popleft()
+                if old.future.cancel():
+                    stats.dropped += 1
+            queue.append(request)
+            self._cond.notify()
+        return request.future
+
+    def detect(self, stream_id, detector_name, img, gray=None, score_threshold=None, timeout=1.0):
+        """提交并等待结果；超时时返回该流上一次的检测结果，不阻塞视频"""
+        future = self.submit(stream_id, detector_name, img, gray, score_threshold)
+        try:
+            return future.result(timeout)
+        except (FutureTimeout, CancelledError):
+            with self._cond:
+                stats = self._stream_stats(stream_id)
+                if future.cancel():
+                    stats.dropped += 1
+                return list(stats.last_result)
+
+    def unregister(self, stream_id):
+        with self._cond:
+            queue = self._queues.pop(stream_id, None)
+            for request in queue or ():
+                request.future.cancel()
+            self._streams.pop(stream_id, None)
+
+    def stats(self):
+        """每个流以及整体的吞吐量和检测耗时"""
+        now = time.time()
+        with self._cond:
+            # 清理长时间没有提交帧的流（会话已结束）
+            for stream_id in [s for s, st in self._streams.items() if now - st.last_seen > self.stale_after]:
+                self._streams.pop(stream_id, None)
+                if not self._queues.get(stream_id):
+                    self._queues.pop(stream_id, None)
+            streams = {
+                stream_id: (st.frames, st.dropped, st.faces, list(st.done_times), list(st.latency_ms), list(st.detect_ms))
+                for stream_id, st in self._streams.items()
+            }
+            pending = sum(len(q) for q in self._queues.values())
+            batches, batched_frames = self._batches, self._batched_frames
+
+        result = {}
+        total_fps = 0.0
+        total_frames = 0
+        total_dropped = 0
+        for stream_id, (frames, dropped, faces, done_times, latency_ms, detect_ms) in streams.items():
+            fps = 0.0
+            if len(done_times) > 1 and done_times[-1] > done_times[0]:
+                fps = (len(done_times) - 1) / (done_times[-1] - done_times[0])
+            row = {'frames': frames, 'dropped': dropped, 'faces': faces, 'fps': round(fps, 1)}
+            if latency_ms:
+                p50, p95 = np.percentile(latency_ms, [50, 95])
+                row.update(latency_p50_ms=round(float(p50), 2), latency_p95_ms=round(float(p95), 2),
+                           detect_p50_ms=round(float(np.percentile(detect_ms, 50)), 2))
+            result[str(stream_id)] = row
+            total_fps += fps
+            total_frames += frames
+            total_dropped += dropped
+
+        return {
+            'workers': self.workers,
+            'pending': pending,
+            'mean_batch': round(batched_frames / batches, 2) if batches else 0.0,
+            'streams': result,
+            'aggregate': {
+                'active_streams': len(result),
+                'fps': round(total_fps, 1),
+                'frames': total_frames,
+                'dropped': total_dropped,
+            },
+        }
+
+    def shutdown(self, wait=True):
+        with self._cond:
+            self._running = False
+            for queue in self._queues.values():
+                for request in queue:
+                    request.future.cancel()
+                queue.clear()
+            self._cond.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join(timeout=2.0)
+
+    def _stream_stats(self, stream_id):
+        stats = self._streams.get(stream_id)
+        if stats is None:
+            stats = self._streams[stream_id] = _StreamStats(self.window)
+        return stats
+
+    def _next_request(self, detector_name=None):
+        # 轮询：取第一个有待处理帧的流，然后把它移到队尾（调用时已持有锁）
+        # 指定detector_name时只取使用该后端的帧（用于合批）
+        for stream_id, queue in self._queues.items():
+            if queue and (detector_name is None or queue[0].detector_name == detector_name):
+                self._queues.move_to_end(stream_id)
+                return queue.popleft()
+        return None
+
+    def _worker_loop(self):
+        # 每个工作线程自己的检测器实例
+        detectors = {}
+        while True:
+            with self._cond:
+                request = self._next_request()
+                while request is None and self._running:
+                    self._cond.wait()
+                    request = self._next_request()
+                if request is None:
+                    return
+
+            try:
+                detector = detectors.get(request.detector_name)
+                if detector is None:
+                    detector = detectors[request.detector_name] = self.detector_factory(request.detector_name)
+            except Exception as e:
+                if request.future.set_running_or_notify_cancel():
+                    request.future.set_exception(e)
+                continue
+
+            # 后端支持批量推理时，顺带取走其他流中使用同一后端的待处理帧
+            batch = [request]
+            if detector.max_batch > 1:
+                with self._cond:
+                    while len(batch) < detector.max_batch:
+                        extra = self._next_request(request.detector_name)
+                        if extra is None:
+                            break
+                        batch.append(extra)
+            batch = [r for r in batch if r.future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            t0 = time.perf_counter()
+            try:
+                if len(batch) == 1:
+                    # 队首的帧可能已被取消（detect() 超时），这时剩下的是其他流的帧
+                    r = batch[0]
+                    results = [detector.detect(r.img, r.gray, r.score_threshold)]
+                else:
+                    results = detector.detect_batch(
+                        [r.img for r in batch], [r.gray for r in batch], [r.score_threshold for r in batch]
+                    )
+            except Exception as e:
+                for r in batch:
+                    r.future.set_exception(e)
+                continue
+            done = time.perf_counter()
+
+            with self._cond:
+                self._batches += 1
+                self._batched_frames += len(batch)
+                for r, faces in zip(batch, results):
+                    stats = self._stream_stats(r.stream_id)
+                    stats.frames += 1
+                    stats.faces += len(faces)
+                    stats.done_times.append(time.time())
+                    stats.detect_ms.append((done - t0) * 1000.0)
+                    stats.latency_ms.append((done - r.submitted) * 1000.0)
+                    stats.last_result = faces
+            for r, faces in zip(batch, results):
+                r.future.set_result(faces)
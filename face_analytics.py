@@ -0,0 +1,109 @@
+"""
+face_analytics.py
+
+相机页面的人脸数量 / 检测耗时 / 帧率时间序列。
+
+每帧的样本写入固定容量的环形缓冲区（预分配的 NumPy 列），长时间运行内存也不会增长；
+页面按固定时间窗口（例如1秒）聚合后画图，也可以导出为CSV。
+写入在视频线程，读取在页面线程，两者之间用锁保护。
+"""
+import csv
+import io
+import threading
+import time
+
+import numpy as np
+
+# 每帧一个样本的列
+FIELDS = ('timestamp', 'faces', 'detect_ms', 'frame_ms')
+
+# 聚合结果的列（CSV 的表头顺序）
+AGGREGATE_FIELDS = ('time', 'frames', 'fps', 'faces_mean', 'faces_max',
+                    'detect_ms_mean', 'frame_ms_mean', 'frame_ms_max')
+
+
+class FrameHistory:
+    """逐帧样本的环形缓冲区（默认约10分钟@30fps）"""
+
+    def __init__(self, capacity=18000):
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._columns = {name: np.zeros(capacity, dtype=np.float64) for name in FIELDS}
+        # 下一个写入位置，以及已写入的样本数（不超过容量）
+        self._head = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def append(self, timestamp, faces, detect_ms, frame_ms):
+        with self._lock:
+            i = self._head
+            columns = self._columns
+            columns['timestamp'][i] = timestamp
+            columns['faces'][i] = faces
+            columns['detect_ms'][i] = detect_ms
+            columns['frame_ms'][i] = frame_ms
+            self._head = (i + 1) % self.capacity
+            self._size = min(self._size + 1, self.capacity)
+
+    def reset(self):
+        with self._lock:
+            self._head = 0
+            self._size = 0
+
+    def samples(self, since=None):
+        """按时间顺序返回各列的拷贝 {列名: ndarray}；since 为起始时间戳"""
+        with self._lock:
+            if self._size < self.capacity:
+                data = {name: col[:self._size].copy() for name, col in self._columns.items()}
+            else:
+                # 缓冲区已满：从最旧的样本（head处）开始展开
+                data = {name: np.roll(col, -self._head) for name, col in self._columns.items()}
+        if since is not None:
+            keep = data['timestamp'] >= since
+            data = {name: col[keep] for name, col in data.items()}
+        return data
+
+    def aggregate(self, window=1.0, since=None):
+        """
+        按固定时间窗口聚合，返回 {列名: ndarray}（列见 AGGREGATE_FIELDS）。
+
+        窗口按绝对时间对齐（time 为窗口起点），没有帧的窗口不会出现在结果中。
+        """
+        data = self.samples(since)
+        timestamps = data['timestamp']
+        if len(timestamps) == 0:
+            return {name: np.zeros(0) for name in AGGREGATE_FIELDS}
+
+        bins = np.floor(timestamps / window).astype(np.int64)
+        # 样本按时间顺序排列，每个窗口是一段连续区间
+        starts = np.flatnonzero(np.r_[True, bins[1:] != bins[:-1]])
+        frames = np.diff(np.r_[starts, len(bins)])
+
+        def mean(name):
+            return np.add.reduceat(data[name], starts) / frames
+
+        return {
+            'time': bins[starts] * window,
+            'frames': frames,
+            'fps': frames / window,
+            'faces_mean': mean('faces'),
+            'faces_max': np.maximum.reduceat(data['faces'], starts),
+            'detect_ms_mean': mean('detect_ms'),
+            'frame_ms_mean': mean('frame_ms'),
+            'frame_ms_max': np.maximum.reduceat(data['frame_ms'], starts),
+        }
+
+    def to_csv(self, window=1.0, since=None):
+        """聚合结果导出为CSV文本（time 为 ISO 格式的本地时间）"""
+        rows = self.aggregate(window, since)
+        out = io.StringIO()
+        writer = csv.writer(out)
+        writer.writerow(AGGREGATE_FIELDS)
+        for i in range(len(rows['time'])):
+            writer.writerow(
+                [time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(rows['time'][i])), int(rows['frames'][i])]
+                + [round(float(rows[name][i]), 3) for name in AGGREGATE_FIELDS[2:]]
+            )
+        return out.getvalue()
@@ -0,0 +1,488 @@
+"""Offline benchmarks for the camera page face pipeline.
+
+Run the exact camera-page pipeline (decode, detection, falling faces, overlay, encode)
+without WebRTC, from a local video file or a synthetic frame generator:
+
+  python face_benchmark.py pipeline --video clip.mp4
+  python face_benchmark.py pipeline --synthetic --frames 600 --width 1280 --height 720
+  python face_benchmark.py pipeline --synthetic --detector synthetic --min-fps 30   # CI gate
+  python face_benchmark.py pipeline --video clip.mp4 --streams 8 --workers 4        # classroom load
+  python face_benchmark.py pipeline --synthetic --detector synthetic --record recordings --record-raw
+
+Compare face detector backends (speed and accuracy) on a fixed local video clip:
+
+  python face_benchmark.py detectors --video clip.mp4
+  python face_benchmark.py detectors --video clip.mp4 --backends haar yunet --annotations clip_faces.json
+
+Accuracy is precision/recall/F1 at IoU >= 0.5. Ground truth comes from --annotations
+(JSON: {"frames": {"<frame index>": [[x, y, w, h], ...]}}, or the .npz metadata of a session
+recorded on the camera page / with --record); without it, the --reference backend
+(default: yunet if available, else dnn) is used as pseudo ground truth:
+
+  python face_benchmark.py detectors --video recordings/session_x.mp4 --annotations recordings/session_x.npz
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+
+import av
+import cv2
+import numpy as np
+
+from adaptive_quality import AdaptiveQualityController
+from detection_service import DEFAULT_WORKERS, DetectionService
+from face_detectors import DETECTORS, FaceDetector, available_detectors, create_detector
+from face_pipeline import DetectorCache, FacePipeline
+from frame_metrics import FrameMetrics, stage_rows
+import session_recorder
+
+
+def load_video_frames(path, max_frames=300, resize_width=None):
+    """
+    Decode up to max_frames BGR frames so every backend sees identical input.
+
+    Returns (frames, scale): scale is resize_width / source width (1.0 without
+    resizing), for mapping source-pixel annotations onto the frames.
+    """
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise IOError(f'Cannot open video: {path}')
+    frames = []
+    scale = 1.0
+    try:
+        while len(frames) < max_frames:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            if resize_width and frame.shape[1] != resize_width:
+                scale = resize_width / frame.shape[1]
+                frame = cv2.resize(frame, (resize_width, int(round(frame.shape[0] * scale))))
+            frames.append(frame)
+    finally:
+        cap.release()
+    return frames, scale
+
+
+def load_annotations(path):
+    if path.endswith('.npz'):
+        return session_recorder.load_annotations(path)
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return {int(k): [tuple(b[:4]) for b in v] for k, v in data.get('frames', {}).items()}
+
+
+def scale_boxes(truth, scale):
+    """Annotations in source-video pixels -> pixels of frames resized by scale."""
+    if scale == 1.0:
+        return truth
+    return {i: [tuple(int(round(v * scale)) for v in box[:4]) for box in boxes] for i, boxes in truth.items()}
+
+
+def iou(a, b):
+    ax, ay, aw, ah = a[:4]
+    bx, by, bw, bh = b[:4]
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = ix * iy
+    union = aw * ah + bw * bh - inter
+    return inter / union if union > 0 else 0.0
+
+
+def match_counts(pred, truth, iou_threshold=0.5):
+    """Greedy IoU matching by descending score; returns (tp, fp, fn)."""
+    pred = sorted(pred, key=lambda d: -d[4] if len(d) > 4 else 0.0)
+    unmatched = list(truth)
+    tp = 0
+    for p in pred:
+        best_i, best_iou = -1, iou_threshold
+        for i, t in enumerate(unmatched):
+            v = iou(p, t)
+            if v >= best_iou:
+                best_i, best_iou = i, v
+        if best_i >= 0:
+            unmatched.pop(best_i)
+            tp += 1
+    return tp, len(pred) - tp, len(unmatched)
+
+
+def run_detector(detector, frames):
+    timings = []
+    results = []
+    for frame in frames:
+        t0 = time.perf_counter()
+        dets = detector.detect(frame)
+        timings.append((time.perf_counter() - t0) * 1000.0)
+        results.append(dets)
+    return results, np.asarray(timings)
+
+
+def benchmark_detectors(args):
+    frames, scale = load_video_frames(args.video, args.max_frames, args.resize_width)
+    if not frames:
+        print('No frames decoded from', args.video)
+        return 1
+    h, w = frames[0].shape[:2]
+    print(f'{len(frames)} frames at {w}x{h} from {args.video}')
+
+    available = available_detectors()
+    backends = args.backends or available
+    for name in backends:
+        if name not in available:
+            print(f'Skipping {name}: model files not found')
+    backends = [b for b in backends if b in available]
+
+    truth = None
+    if args.annotations:
+        # annotations are in source-video pixels; --resize-width changed the frames' coordinates
+        truth = scale_boxes(load_annotations(args.annotations), scale)
+        truth_name = 'annotations'
+    else:
+        reference = args.reference or next((b for b in ('yunet', 'dnn') if b in available), None)
+        if reference is not None:
+            ref_detector = create_detector(reference, score_threshold=args.reference_threshold)
+            ref_results, _ = run_detector(ref_detector, frames)
+            truth = {i: [d[:4] for d in dets] for i, dets in enumerate(ref_results)}
+            truth_name = f'{reference}@{args.reference_threshold}'
+
+    report = {'video': args.video, 'frames': len(frames), 'size': [w, h],
+              'ground_truth': truth_name if truth is not None else None, 'backends': {}}
+
+    for name in backends:
+        detector = create_detector(name, score_threshold=args.threshold)
+        # warm-up (model init, first-call allocations)
+        detector.detect(frames[0])
+        results, timings = run_detector(detector, frames)
+
+        row = {
+            'ms_mean': round(float(timings.mean()), 3),
+            'ms_p50': round(float(np.percentile(timings, 50)), 3),
+            'ms_p95': round(float(np.percentile(timings, 95)), 3),
+            'fps': round(1000.0 / float(timings.mean()), 1) if timings.mean() > 0 else 0.0,
+            'faces_per_frame': round(sum(len(r) for r in results) / len(results), 3),
+        }
+        if truth is not None:
+            tp = fp = fn = 0
+            for i, dets in enumerate(results):
+                a, b, c = match_counts(dets, truth.get(i, []), args.iou)
+                tp, fp, fn = tp + a, fp + b, fn + c
+            precision = tp / (tp + fp) if tp + fp else 0.0
+            recall = tp / (tp + fn) if tp + fn else 0.0
+            f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+            row.update(precision=round(precision, 3), recall=round(recall, 3), f1=round(f1, 3))
+        report['backends'][name] = row
+
+    print_table(report)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print('Report written to', args.json)
+    return 0
+
+
+def print_table(report):
+    if report.get('ground_truth'):
+        print('Ground truth:', report['ground_truth'])
+    columns = ['ms_mean', 'ms_p50', 'ms_p95', 'fps', 'faces_per_frame', 'precision', 'recall', 'f1']
+    print(f"{'backend':<10}" + ''.join(f'{c:>16}' for c in columns))
+    for name, row in report['backends'].items():
+        print(f'{name:<10}' + ''.join(f"{row.get(c, '-'):>16}" for c in columns))
+
+
+class SyntheticSource:
+    """Frames with moving textured squares standing in for faces; boxes are known exactly."""
+
+    def __init__(self, width=640, height=480, faces=2, seed=0):
+        rng = np.random.default_rng(seed)
+        self.width = width
+        self.height = height
+        self.background = rng.integers(0, 80, (height, width, 3), dtype=np.uint8)
+        size = max(24, min(width, height) // 5)
+        self.patches = [rng.integers(0, 256, (size, size, 3), dtype=np.uint8) for _ in range(faces)]
+        self.phases = rng.uniform(0, 2 * np.pi, size=(faces, 2))
+
+    def frame(self, index):
+        """Return (bgr image, [(x, y, w, h), ...]) for frame index."""
+        img = self.background.copy()
+        boxes = []
+        for patch, (px, py) in zip(self.patches, self.phases):
+            size = patch.shape[0]
+            x = int((self.width - size) * (0.5 + 0.5 * np.sin(index * 0.03 + px)))
+            y = int((self.height - size) * (0.5 + 0.5 * np.sin(index * 0.02 + py)))
+            img[y:y + size, x:x + size] = patch
+            boxes.append((x, y, size, size))
+        return img, boxes
+
+
+class SyntheticFaceDetector(FaceDetector):
+    """Returns the generator's ground-truth boxes, isolating the rest of the pipeline."""
+
+    name = 'synthetic'
+    # follow the same luma-only path as Haar
+    uses_gray = True
+
+    def __init__(self, score_threshold=0.3):
+        super().__init__(score_threshold)
+        self.boxes = []
+
+    def _detect(self, img, gray):
+        return [(x, y, w, h, 1.0) for (x, y, w, h) in self.boxes]
+
+
+def iter_video_frames(path, max_frames):
+    """Yield (av.VideoFrame, None) decoded with PyAV, as WebRTC hands them to the callback."""
+    container = av.open(path)
+    try:
+        for i, frame in enumerate(container.decode(video=0)):
+            if i >= max_frames:
+                break
+            yield frame, None
+    finally:
+        container.close()
+
+
+def iter_synthetic_frames(source, max_frames):
+    for i in range(max_frames):
+        img, boxes = source.frame(i)
+        # WebRTC delivers yuv420p frames, so the decode stage converts from YUV as in the app
+        frame = av.VideoFrame.from_ndarray(img, format='bgr24').reformat(format='yuv420p')
+        yield frame, boxes
+
+
+def run_pipeline_stream(args, stream_index=0, service=None):
+    """Push one stream's frames through its own FacePipeline; returns per-stream results."""
+    seed = args.seed + stream_index
+    if args.video:
+        frames = iter_video_frames(args.video, args.frames)
+        source_name = args.video
+    else:
+        source = SyntheticSource(args.width, args.height, args.faces, seed)
+        frames = iter_synthetic_frames(source, args.frames)
+        source_name = f'synthetic {args.width}x{args.height}, {args.faces} faces'
+
+    if args.detector == 'synthetic':
+        synthetic_detector = SyntheticFaceDetector()
+        detector_provider = lambda name: synthetic_detector
+    else:
+        synthetic_detector = None
+        detector_provider = DetectorCache()
+
+    pipeline = FacePipeline(
+        settings={
+            'detector': args.detector,
+            'confidence': args.threshold,
+            'falling_effect': not args.no_falling,
+        },
+        detector_provider=detector_provider,
+        detection_service=service,
+        stream_id=f'stream-{stream_index}',
+        quality=AdaptiveQualityController() if args.adaptive else None
+    )
+    metrics = FrameMetrics(window=args.frames)
+    recorder = None
+    if args.record and stream_index == 0:
+        recorder = session_recorder.SessionRecorder(args.record, fps=args.fps, raw=args.record_raw)
+        recorder.start(time.strftime('bench_%Y%m%d_%H%M%S'))
+
+    processed = 0
+    busy = 0.0
+    detections = 0
+    frames_with_faces = 0
+    max_faces = 0
+    for i, (frame, boxes) in enumerate(frames):
+        if synthetic_detector is not None:
+            synthetic_detector.boxes = boxes
+        # simulated clock: falling-face lifetimes follow the nominal frame rate, not wall time
+        now = i / args.fps
+        t0 = time.perf_counter()
+        out_frame = pipeline.process_frame(frame, metrics, now)
+        busy += time.perf_counter() - t0
+        if recorder is not None:
+            recorder.submit(frame if recorder.raw else out_frame, pipeline.last_faces,
+                            [track.id for track in pipeline.last_tracks], now)
+
+        processed += 1
+        count = len(pipeline.last_faces)
+        detections += count
+        frames_with_faces += 1 if count else 0
+        max_faces = max(max_faces, count)
+
+    return {
+        'source': source_name,
+        'frames': processed,
+        'busy': busy,
+        'snapshot': metrics.snapshot(),
+        'detections': detections,
+        'frames_with_faces': frames_with_faces,
+        'max_faces': max_faces,
+        'spawned': pipeline.total_faces_spawned,
+        'tracks': pipeline.tracker.tracks_created,
+        'embeddings': pipeline.tracker.embeddings_computed,
+        'quality': pipeline.quality.status() if pipeline.quality is not None else None,
+        'recording': _finish_recording(recorder),
+    }
+
+
+def _finish_recording(recorder):
+    if recorder is None:
+        return None
+    recorder.stop()
+    stats = recorder.stats()
+    stats['meta_path'] = recorder.meta_path
+    return stats
+
+
+def benchmark_pipeline(args):
+    if not args.video and not args.synthetic:
+        print('Pass --video PATH or --synthetic')
+        return 2
+    if args.detector == 'synthetic' and not args.synthetic:
+        print('--detector synthetic requires --synthetic')
+        return 2
+    if args.detector == 'synthetic' and args.streams > 1:
+        print('--detector synthetic only supports a single stream')
+        return 2
+
+    random.seed(args.seed)
+
+    if args.streams == 1:
+        results = [run_pipeline_stream(args)]
+        wall = results[0]['busy']
+        service_stats = None
+    else:
+        # several concurrent streams sharing one detection worker pool, as on the camera page
+        service = DetectionService(workers=args.workers)
+        results = [None] * args.streams
+
+        def worker(index):
+            results[index] = run_pipeline_stream(args, index, service)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.streams)]
+        t0 = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - t0
+        service_stats = service.stats()
+        service.shutdown()
+
+    processed = sum(r['frames'] for r in results)
+    if processed == 0:
+        print('No frames processed from', results[0]['source'])
+        return 1
+
+    detections = sum(r['detections'] for r in results)
+    throughput = processed / wall if wall > 0 else 0.0
+    # per-stage figures are reported for the first stream
+    snapshot = results[0]['snapshot']
+    report = {
+        'source': results[0]['source'],
+        'detector': args.detector,
+        'streams': args.streams,
+        'frames': processed,
+        'throughput_fps': round(throughput, 1),
+        'per_stream_fps': [round(r['frames'] / r['busy'], 1) if r['busy'] > 0 else 0.0 for r in results],
+        'budget_ms': snapshot['budget_ms'],
+        'stages': snapshot['stages'],
+        'detections': {
+            'total': detections,
+            'per_frame': round(detections / processed, 3),
+            'frames_with_faces': sum(r['frames_with_faces'] for r in results),
+            'max_per_frame': max(r['max_faces'] for r in results),
+        },
+        'falling_faces_spawned': sum(r['spawned'] for r in results),
+        'tracks_created': sum(r['tracks'] for r in results),
+        'embeddings_computed': sum(r['embeddings'] for r in results),
+    }
+    if service_stats is not None:
+        report['detection_service'] = service_stats
+    if args.adaptive:
+        report['quality'] = results[0]['quality']
+    if args.record:
+        report['recording'] = results[0]['recording']
+
+    print(f"{processed} frames from {report['source']} with detector '{args.detector}'"
+          + (f" over {args.streams} streams / {args.workers} workers" if args.streams > 1 else ''))
+    print(f"Throughput: {report['throughput_fps']} fps (budget {snapshot['budget_ms']} ms/frame)")
+    if args.streams > 1:
+        print('Per-stream fps:', ', '.join(str(v) for v in report['per_stream_fps']))
+        print(f"Detection service: {service_stats['aggregate']['dropped']} dropped, "
+              f"mean batch {service_stats['mean_batch']}")
+    print(f"{'stage':<10}{'p50 (ms)':>12}{'p95 (ms)':>12}")
+    for row in stage_rows(snapshot):
+        print(f"{row['stage']:<10}{row['p50 (ms)']:>12}{row['p95 (ms)']:>12}")
+    print('Detections: {total} total, {per_frame}/frame, {frames_with_faces} frames with faces, '
+          'max {max_per_frame}'.format(**report['detections']))
+    print('Falling faces spawned:', report['falling_faces_spawned'])
+    print(f"Tracks: {report['tracks_created']} IDs created, {report['embeddings_computed']} embeddings computed")
+    if args.adaptive:
+        quality = report['quality']
+        print(f"Adaptive quality: level {quality['level'] + 1}/{quality['levels']}, detect scale "
+              f"{quality['detect_scale']}, every {quality['detect_every']} frame(s), {quality['changes']} change(s)")
+    if args.record:
+        recording = report['recording']
+        print(f"Recorded {recording['frames']} frames ({recording['dropped']} dropped, encode p50 "
+              f"{recording['encode_p50_ms']} ms) to {recording['path']} + {recording['meta_path']}")
+        if recording['error']:
+            print('Recording error:', recording['error'])
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print('Report written to', args.json)
+
+    if args.min_fps is not None and throughput < args.min_fps:
+        print(f'FAIL: throughput {throughput:.1f} fps is below --min-fps {args.min_fps}')
+        return 1
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Offline benchmarks for the face pipeline')
+    sub = parser.add_subparsers(dest='mode', required=True)
+
+    pipe = sub.add_parser('pipeline', help='Run the full camera pipeline offline')
+    source = pipe.add_mutually_exclusive_group()
+    source.add_argument('--video', help='Path to a local video file')
+    source.add_argument('--synthetic', action='store_true', help='Use the synthetic frame generator')
+    pipe.add_argument('--frames', type=int, default=300, help='Maximum number of frames to process')
+    pipe.add_argument('--width', type=int, default=640, help='Synthetic frame width')
+    pipe.add_argument('--height', type=int, default=480, help='Synthetic frame height')
+    pipe.add_argument('--faces', type=int, default=2, help='Synthetic faces per frame')
+    pipe.add_argument('--detector', default='haar', choices=list(DETECTORS) + ['synthetic'],
+                      help="Detector backend ('synthetic' returns the generator's boxes)")
+    pipe.add_argument('--threshold', type=float, default=0.3, help='Detection confidence threshold')
+    pipe.add_argument('--no-falling', action='store_true', help='Disable the falling-face effect')
+    pipe.add_argument('--fps', type=float, default=30.0, help='Nominal frame rate for the simulated clock')
+    pipe.add_argument('--seed', type=int, default=0)
+    pipe.add_argument('--adaptive', action='store_true', help='Enable the adaptive quality controller')
+    pipe.add_argument('--streams', type=int, default=1, help='Concurrent streams sharing one detection service')
+    pipe.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='Detection worker threads (with --streams > 1)')
+    pipe.add_argument('--min-fps', type=float, default=None, help='Exit with status 1 below this throughput')
+    pipe.add_argument('--record', metavar='DIR', help='Record the first stream (video + .npz box metadata) into DIR')
+    pipe.add_argument('--record-raw', action='store_true', help='Record input frames instead of the rendered output')
+    pipe.add_argument('--json', help='Write the report to this JSON file')
+    pipe.set_defaults(func=benchmark_pipeline)
+
+    det = sub.add_parser('detectors', help='Compare face detector backends on a video clip')
+    det.add_argument('--video', required=True, help='Path to a local video clip')
+    det.add_argument('--backends', nargs='+', choices=list(DETECTORS), help='Backends to compare (default: all available)')
+    det.add_argument('--threshold', type=float, default=0.5, help='Score threshold for benchmarked backends')
+    det.add_argument('--annotations', help='Ground truth JSON or recorded session .npz (see module docstring)')
+    det.add_argument('--reference', choices=list(DETECTORS), help='Backend used as pseudo ground truth')
+    det.add_argument('--reference-threshold', type=float, default=0.7)
+    det.add_argument('--iou', type=float, default=0.5, help='IoU threshold for a match')
+    det.add_argument('--max-frames', type=int, default=300)
+    det.add_argument('--resize-width', type=int, default=None, help='Resize frames to this width first')
+    det.add_argument('--json', help='Write the report to this JSON file')
+    det.set_defaults(func=benchmark_detectors)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""
+face_compositor.py
+
+掉落人脸的合成阶段：旋转、随时间渐隐的透明度混合，以及画面边缘裁剪。
+
+- 每张人脸贴图在创建时预分配一块能容纳任意旋转角度的正方形画布
+- 旋转结果按量化角度缓存，同一角度只做一次 warpAffine
+- 混合只在裁剪后的 ROI 上做向量化 alpha blend，部分出界的人脸也能正常绘制
+"""
+import math
+
+import cv2
+import numpy as np
+
+
+class FaceSprite:
+    """预分配的人脸贴图，按量化角度缓存旋转后的图像和alpha遮罩"""
+
+    def __init__(self, face_img, angle_step=15):
+        h, w = face_img.shape[:2]
+        self.width = w
+        self.height = h
+        self.angle_step = angle_step
+        self.buckets = max(1, int(round(360 / angle_step)))
+
+        # 画布边长取对角线长度，旋转后不会被裁掉
+        self.size = int(math.ceil(math.hypot(w, h)))
+        ox = (self.size - w) // 2
+        oy = (self.size - h) // 2
+
+        self.image = np.zeros((self.size, self.size, 3), dtype=np.uint8)
+        self.image[oy:oy + h, ox:ox + w] = face_img
+        # 画布中未旋转的人脸区域（视图）
+        self.face = self.image[oy:oy + h, ox:ox + w]
+        self.alpha = np.zeros((self.size, self.size), dtype=np.float32)
+        self.alpha[oy:oy + h, ox:ox + w] = 1.0
+
+        self._center = ((self.size - 1) / 2.0, (self.size - 1) / 2.0)
+        # 量化角度 -> (旋转后的图像, HxWx1 的alpha)
+        self._rotated = {0: (self.image, self.alpha[..., None])}
+
+    def rotated(self, angle):
+        """返回最接近angle的量化角度下的 (图像, alpha)，首次访问时生成并缓存"""
+        bucket = int(round(angle / self.angle_step)) % self.buckets
+        cached = self._rotated.get(bucket)
+        if cached is not None:
+            return cached
+
+        matrix = cv2.getRotationMatrix2D(self._center, bucket * self.angle_step, 1.0)
+        dsize = (self.size, self.size)
+        image = cv2.warpAffine(self.image, matrix, dsize, flags=cv2.INTER_LINEAR,
+                               borderMode=cv2.BORDER_CONSTANT, borderValue=0)
+        alpha = cv2.warpAffine(self.alpha, matrix, dsize, flags=cv2.INTER_LINEAR,
+                               borderMode=cv2.BORDER_CONSTANT, borderValue=0)
+        cached = (image, alpha[..., None])
+        self._rotated[bucket] = cached
+        return cached
+
+    def composite(self, frame, center_x, center_y, angle=0.0, opacity=1.0):
+        """以(center_x, center_y)为中心把旋转后的贴图混合到frame上，返回实际绘制区域或None"""
+        image, alpha = self.rotated(angle)
+        left = int(round(center_x)) - self.size // 2
+        top = int(round(center_y)) - self.size // 2
+        return blend_sprite(frame, image, alpha, left, top, opacity)
+
+
+def blend_sprite(frame, sprite_img, sprite_alpha, left, top, opacity=1.0):
+    """
+    把贴图按alpha混合到frame的(left, top)处（原地修改frame）。
+
+    贴图超出画面的部分会被裁掉；完全在画面外时返回None，否则返回 (x0, y0, x1, y1)。
+    sprite_alpha 为 HxWx1 的 float32，取值 0..1。
+    """
+    frame_h, frame_w = frame.shape[:2]
+    sprite_h, sprite_w = sprite_img.shape[:2]
+
+    # 裁剪到画面内
+    x0 = max(left, 0)
+    y0 = max(top, 0)
+    x1 = min(left + sprite_w, frame_w)
+    y1 = min(top + sprite_h, frame_h)
+    if x0 >= x1 or y0 >= y1 or opacity <= 0.0:
+        return None
+
+    sx0 = x0 - left
+    sy0 = y0 - top
+    sx1 = sx0 + (x1 - x0)
+    sy1 = sy0 + (y1 - y0)
+
+    roi = frame[y0:y1, x0:x1]
+    src = sprite_img[sy0:sy1, sx0:sx1]
+    alpha = sprite_alpha[sy0:sy1, sx0:sx1]
+    if opacity < 1.0:
+        alpha = alpha * opacity
+
+    # dst = roi + (src - roi) * alpha
+    blended = roi.astype(np.float32)
+    blended += (src - blended) * alpha
+    np.copyto(roi, blended, casting='unsafe')
+    return x0, y0, x1, y1
@@ -0,0 +1,296 @@
+"""
+face_detectors.py
+
+可切换的人脸检测后端。
+
+所有后端都实现同一个接口：detect(img, gray=None) 返回 [(x, y, w, h, score), ...]，
+score 为 0..1 的置信度，只保留 score >= score_threshold 的结果，
+因此页面上的“检测置信度”滑块对每个后端都真正生效。
+
+- haar  : OpenCV 自带的 Haar 级联（不需要额外文件）
+- dnn   : OpenCV DNN + res10 SSD（Caffe 模型，从本地文件加载）
+- yunet : OpenCV FaceDetectorYN + YuNet（ONNX 模型，从本地文件加载）
+- ort   : ONNX Runtime CPU + Ultra-Light-Fast-Generic-Face-Detector（需要安装 onnxruntime），
+          支持一次推理多帧（DetectionService 会把多个视频流的帧合成一批）
+
+模型文件默认放在仓库根目录的 models/ 下，也可以用环境变量 FACE_MODELS_DIR 指定。
+"""
+import importlib.util
+import math
+import os
+import threading
+
+import cv2
+import numpy as np
+
+MODELS_DIR = os.environ.get(
+    'FACE_MODELS_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models')
+)
+
+# res10 SSD（OpenCV face_detector 示例模型）
+DNN_PROTOTXT = 'deploy.prototxt'
+DNN_CAFFEMODEL = 'res10_300x300_ssd_iter_140000.caffemodel'
+# YuNet（opencv_zoo）
+YUNET_MODEL = 'face_detection_yunet_2023mar.onnx'
+# Ultra-Light-Fast-Generic-Face-Detector-1MB（320x240 输入）
+ORT_MODEL = 'version-RFB-320.onnx'
+
+# ONNX Runtime 每次推理使用的线程数（intra-op），多个工作线程同时推理时应设小一些
+ORT_THREADS = int(os.environ.get('FACE_ORT_THREADS', 2))
+
+
+class FaceDetector:
+    """人脸检测后端基类"""
+
+    name = 'base'
+    # True 表示只需要灰度图（可以跳过 BGR 输入）
+    uses_gray = False
+    # 一次推理可以处理的最大帧数（大于1时 DetectionService 会跨视频流合批）
+    max_batch = 1
+
+    def __init__(self, score_threshold=0.3):
+        self.score_threshold = score_threshold
+        # cv2.dnn.Net 等对象不保证线程安全，多个视频流共享同一个检测器时串行调用
+        self._lock = threading.Lock()
+
+    def set_threshold(self, score_threshold):
+        self.score_threshold = float(score_threshold)
+
+    def detect(self, img, gray=None, score_threshold=None):
+        """返回 [(x, y, w, h, score), ...]，按 score_threshold（默认用实例上的值）过滤"""
+        with self._lock:
+            detections = self._detect(img, gray)
+        threshold = self.score_threshold if score_threshold is None else score_threshold
+        return [d for d in detections if d[4] >= threshold]
+
+    def detect_batch(self, imgs, grays=None, score_thresholds=None):
+        """一次检测多帧，返回每帧的结果列表；score_thresholds 可以逐帧指定"""
+        grays = grays or [None] * len(imgs)
+        with self._lock:
+            batch = self._detect_batch(imgs, grays)
+        results = []
+        for i, detections in enumerate(batch):
+            threshold = score_thresholds[i] if score_thresholds else None
+            if threshold is None:
+                threshold = self.score_threshold
+            results.append([d for d in detections if d[4] >= threshold])
+        return results
+
+    def _detect(self, img, gray):
+        raise NotImplementedError
+
+    def _detect_batch(self, imgs, grays):
+        # 默认逐帧检测，支持批量推理的后端覆盖此方法
+        return [self._detect(img, gray) for img, gray in zip(imgs, grays)]
+
+
+class HaarFaceDetector(FaceDetector):
+    """Haar 级联检测器；置信度由 detectMultiScale3 的 levelWeights 经 sigmoid 映射得到（近似值）"""
+
+    name = 'haar'
+    uses_gray = True
+
+    def __init__(self, score_threshold=0.3, scale_factor=1.1, min_neighbors=5, min_size=(30, 30)):
+        super().__init__(score_threshold)
+        self.cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = min_size
+
+    def _detect(self, img, gray):
+        if gray is None:
+            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        boxes, _, weights = self.cascade.detectMultiScale3(
+            gray,
+            scaleFactor=self.scale_factor,
+            minNeighbors=self.min_neighbors,
+            minSize=self.min_size,
+            outputRejectLevels=True
+        )
+        if len(boxes) == 0:
+            return []
+        weights = np.asarray(weights, dtype=np.float64).reshape(-1)
+        return [
+            (int(x), int(y), int(w), int(h), 1.0 / (1.0 + math.exp(-weight)))
+            for (x, y, w, h), weight in zip(boxes, weights)
+        ]
+
+
+class DnnFaceDetector(FaceDetector):
+    """OpenCV DNN + res10 SSD（300x300 输入）"""
+
+    name = 'dnn'
+
+    def __init__(self, score_threshold=0.3, models_dir=MODELS_DIR, input_size=(300, 300)):
+        super().__init__(score_threshold)
+        prototxt = os.path.join(models_dir, DNN_PROTOTXT)
+        caffemodel = os.path.join(models_dir, DNN_CAFFEMODEL)
+        _require_files(prototxt, caffemodel)
+        self.net = cv2.dnn.readNetFromCaffe(prototxt, caffemodel)
+        self.input_size = input_size
+
+    def _detect(self, img, gray):
+        h, w = img.shape[:2]
+        blob = cv2.dnn.blobFromImage(img, 1.0, self.input_size, (104.0, 177.0, 123.0))
+        self.net.setInput(blob)
+        out = self.net.forward()  # (1, 1, N, 7): [_, _, score, x1, y1, x2, y2]
+
+        detections = []
+        for det in out[0, 0]:
+            score = float(det[2])
+            # 网络本身会输出很多低分框，先用一个很低的下限裁掉
+            if score < 0.05:
+                continue
+            x1 = int(max(0.0, det[3]) * w)
+            y1 = int(max(0.0, det[4]) * h)
+            x2 = int(min(1.0, det[5]) * w)
+            y2 = int(min(1.0, det[6]) * h)
+            if x2 > x1 and y2 > y1:
+                detections.append((x1, y1, x2 - x1, y2 - y1, score))
+        return detections
+
+
+class YuNetFaceDetector(FaceDetector):
+    """OpenCV FaceDetectorYN + YuNet"""
+
+    name = 'yunet'
+
+    def __init__(self, score_threshold=0.3, models_dir=MODELS_DIR, nms_threshold=0.3, top_k=50):
+        super().__init__(score_threshold)
+        model = os.path.join(models_dir, YUNET_MODEL)
+        _require_files(model)
+        # 内部阈值设得很低，统一在 detect() 中按 score_threshold 过滤
+        self.detector = cv2.FaceDetectorYN.create(model, '', (320, 320), 0.05, nms_threshold, top_k)
+        self._input_size = (320, 320)
+
+    def _detect(self, img, gray):
+        h, w = img.shape[:2]
+        if self._input_size != (w, h):
+            self.detector.setInputSize((w, h))
+            self._input_size = (w, h)
+        _, faces = self.detector.detect(img)
+        if faces is None:
+            return []
+        # 每行: x, y, w, h, 5个关键点(10个值), score
+        return [
+            (int(f[0]), int(f[1]), int(f[2]), int(f[3]), float(f[14]))
+            for f in faces
+        ]
+
+
+class OrtFaceDetector(FaceDetector):
+    """ONNX Runtime（CPU）+ Ultra-Light-Fast-Generic-Face-Detector，可批量推理"""
+
+    name = 'ort'
+
+    def __init__(self, score_threshold=0.3, models_dir=MODELS_DIR, intra_op_threads=ORT_THREADS,
+                 nms_threshold=0.3, max_batch=8):
+        super().__init__(score_threshold)
+        model = os.path.join(models_dir, ORT_MODEL)
+        _require_files(model)
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise ImportError("The 'ort' face detector needs onnxruntime: pip install onnxruntime")
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = max(1, int(intra_op_threads))
+        # 并行由 DetectionService 的工作线程负责，单次推理内部不再开 inter-op 线程
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model, sess_options=options, providers=['CPUExecutionProvider'])
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        # 输入形状 (N, 3, H, W)；N 不是固定的1时才能整批推理
+        _, _, height, width = model_input.shape
+        self.input_size = (int(width), int(height)) if isinstance(width, int) else (320, 240)
+        batch_dim = model_input.shape[0]
+        self.batched = not isinstance(batch_dim, int) or batch_dim > 1
+        self.max_batch = max_batch if self.batched else 1
+        self.nms_threshold = nms_threshold
+
+    def _detect(self, img, gray):
+        return self._detect_batch([img], [gray])[0]
+
+    def _detect_batch(self, imgs, grays):
+        # RGB, (x - 127) / 128，一次生成整批 NCHW 输入
+        blob = cv2.dnn.blobFromImages(imgs, 1.0 / 128, self.input_size, (127, 127, 127), swapRB=True)
+        if self.batched:
+            scores, boxes = self.session.run(None, {self.input_name: blob})
+        else:
+            outputs = [self.session.run(None, {self.input_name: blob[i:i + 1]}) for i in range(len(imgs))]
+            scores = np.concatenate([o[0] for o in outputs])
+            boxes = np.concatenate([o[1] for o in outputs])
+        # scores: (N, K, 2) 背景/人脸概率；boxes: (N, K, 4) 归一化的 x1, y1, x2, y2
+        return [self._decode(img, scores[i, :, 1], boxes[i]) for i, img in enumerate(imgs)]
+
+    def _decode(self, img, scores, boxes):
+        h, w = img.shape[:2]
+        # 与DNN后端一样先用很低的下限裁掉大量低分框，再做NMS
+        keep = np.flatnonzero(scores >= 0.05)
+        if keep.size == 0:
+            return []
+        scores = scores[keep]
+        boxes = np.clip(boxes[keep], 0.0, 1.0) * np.array([w, h, w, h], dtype=np.float32)
+        rects = np.column_stack((boxes[:, :2], boxes[:, 2:] - boxes[:, :2]))
+        indices = cv2.dnn.NMSBoxes(rects.tolist(), scores.tolist(), 0.05, self.nms_threshold)
+        detections = []
+        for i in np.asarray(indices).reshape(-1):
+            x, y, bw, bh = rects[i]
+            if bw > 0 and bh > 0:
+                detections.append((int(x), int(y), int(bw), int(bh), float(scores[i])))
+        return detections
+
+
+# 后端注册表：名称 -> 类
+DETECTORS = {
+    'haar': HaarFaceDetector,
+    'dnn': DnnFaceDetector,
+    'yunet': YuNetFaceDetector,
+    'ort': OrtFaceDetector,
+}
+
+# 每个后端需要的本地模型文件
+REQUIRED_FILES = {
+    'haar': (),
+    'dnn': (DNN_PROTOTXT, DNN_CAFFEMODEL),
+    'yunet': (YUNET_MODEL,),
+    'ort': (ORT_MODEL,),
+}
+
+# 每个后端需要额外安装的Python包
+REQUIRED_MODULES = {
+    'ort': ('onnxruntime',),
+}
+
+
+def available_detectors(models_dir=MODELS_DIR):
+    """返回本地模型文件齐全、依赖已安装、可以直接创建的后端名称"""
+    names = []
+    for name in DETECTORS:
+        files = REQUIRED_FILES.get(name, ())
+        modules = REQUIRED_MODULES.get(name, ())
+        if (all(os.path.exists(os.path.join(models_dir, f)) for f in files)
+                and all(importlib.util.find_spec(m) is not None for m in modules)):
+            names.append(name)
+    return names
+
+
+def create_detector(name, score_threshold=0.3, **kwargs):
+    """按名称创建检测器，未知名称抛出 ValueError，模型文件缺失抛出 FileNotFoundError"""
+    cls = DETECTORS.get(name)
+    if cls is None:
+        raise ValueError(f"Unknown face detector '{name}', choose from: {', '.join(DETECTORS)}")
+    return cls(score_threshold=score_threshold, **kwargs)
+
+
+def _require_files(*paths):
+    missing = [p for p in paths if not os.path.exists(p)]
+    if missing:
+        raise FileNotFoundError(
+            'Face model file(s) not found: ' + ', '.join(missing)
+            + ' (download them into models/ or set FACE_MODELS_DIR)'
+        )
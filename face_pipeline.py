@@ -0,0 +1,490 @@
+"""
+face_pipeline.py
+
+相机页面的人脸处理流水线：人脸检测 + 掉落人脸物理 + 画面叠加。
+
+FunnyWebsite 的 WebRTC 回调和 face_benchmark.py 的离线模式都调用同一个 FacePipeline，
+因此不开摄像头、不开浏览器也能对这条路径做性能测试和回归测试。
+时间由调用方通过 now 参数传入（默认 time.time()），离线模式可以用帧号换算的模拟时间，
+让掉落人脸的寿命与实际运行速度无关。
+检测结果经过 FaceTracker 分配稳定的ID，人脸框标签和掉落人脸的生成都按ID进行。
+"""
+import random
+import threading
+import time
+
+import av
+import cv2
+import numpy as np
+
+from face_compositor import FaceSprite
+from face_detectors import create_detector
+from face_tracking import FaceTracker
+from frame_metrics import NullTimer
+
+# 默认设置（页面上的侧边栏会覆盖这些值）
+DEFAULT_SETTINGS = {
+    'enabled': True,
+    'detector': 'haar',
+    'color': (0, 255, 0),
+    'confidence': 0.3,
+    'falling_effect': True,
+    'falling_speed': 3.0,
+    'face_embedding': True
+}
+
+# 同时掉落的人脸数量上限
+MAX_FALLING_FACES = 15
+
+# 同一张脸（同一ID）生成掉落人脸的间隔（秒）
+CAPTURE_INTERVAL = 1.0
+
+# 每个ID缓存的掉落贴图多久刷新一次（秒），期间同一个人的掉落人脸共用贴图和旋转缓存
+SPRITE_REFRESH = 5.0
+
+# 第一个平面就是全分辨率亮度（Y）的像素格式，可直接用于灰度检测
+LUMA_FORMATS = ('yuv420p', 'yuvj420p', 'nv12', 'nv21', 'yuv422p', 'yuv444p', 'gray')
+
+
+class FallingFace:
+    def __init__(self, face_img, x_start, frame_width, frame_height, now=None, sprite=None):
+        self.x = x_start + (face_img.shape[1] // 2)  # 从人脸中心开始
+        self.y = -face_img.shape[0]  # 从顶部开始
+        self.width = face_img.shape[1]
+        self.height = face_img.shape[0]
+        
+        # 物理属性
+        self.velocity_y = 0  # 垂直速度
+        self.gravity = 0.5  # 重力加速度
+        self.bounce_factor = 0.3  # 弹跳系数
+        self.friction = 0.95  # 摩擦力
+        self.is_on_ground = False
+        
+        # 随机水平速度
+        self.velocity_x = random.uniform(-1, 1)
+        
+        self.frame_width = frame_width
+        self.frame_height = frame_height
+        self.rotation = 0
+        self.rotation_speed = random.uniform(-2, 2)
+        
+        # 预分配贴图画布，旋转结果按量化角度缓存（同一ID的掉落人脸可以共用一个贴图）
+        self.sprite = sprite if sprite is not None else FaceSprite(face_img)
+        # 传入的face_img可能是复用的缓冲区，之后只引用画布中的人脸区域
+        self.face_img = self.sprite.face
+        
+        # 生存时间（10秒）
+        self.birth_time = time.time() if now is None else now
+        self.lifetime = 10.0  # 10秒后消失
+        
+    def update(self, other_faces=None, now=None):
+        current_time = time.time() if now is None else now
+        
+        # 检查是否超时
+        if current_time - self.birth_time > self.lifetime:
+            return False
+        
+        # 如果other_faces是None，设为空列表
+        if other_faces is None:
+            other_faces = []
+        
+        # 物理更新
+        if not self.is_on_ground:
+            # 应用重力
+            self.velocity_y += self.gravity
+            
+            # 更新位置
+            self.y += self.velocity_y
+            self.x += self.velocity_x
+            
+            # 检查是否触地或撞到其他人脸
+            ground_level = self.frame_height - self.height
+            collision_level = ground_level
+            
+            # 简化的垂直堆叠检测
+            if other_faces and len(other_faces) > 0:
+                for other_face in other_faces:
+                    if (other_face != self and 
+                        hasattr(other_face, 'is_on_ground') and other_face.is_on_ground and
+                        hasattr(other_face, 'x') and hasattr(other_face, 'y') and
+                        hasattr(other_face, 'width') and hasattr(other_face, 'height')):
+                        
+                        # 检查水平重叠
+                        if (abs(self.x - other_face.x) < (self.width + other_face.width) / 2):
+                            # 计算可以停留的位置
+                            possible_landing = other_face.y - self.height
+                            if possible_landing >= 0 and possible_landing < collision_level:
+                                collision_level = possible_landing
+            
+            if self.y >= collision_level:
+                self.y = collision_level
+                
+                # 弹跳效果
+                if abs(self.velocity_y) > 2:  # 只有速度够大才弹跳
+                    self.velocity_y = -self.velocity_y * self.bounce_factor
+                    self.velocity_x *= self.friction
+                else:
+                    # 速度太小，停下来
+                    self.velocity_y = 0
+                    self.velocity_x *= 0.8  # 摩擦
+                    self.is_on_ground = True
+            
+            # 检查左右边界
+            if self.x - self.width//2 <= 0:
+                self.x = self.width//2
+                self.velocity_x = -self.velocity_x * 0.7
+            elif self.x + self.width//2 >= self.frame_width:
+                self.x = self.frame_width - self.width//2
+                self.velocity_x = -self.velocity_x * 0.7
+        else:
+            # 在停止状态时的物理处理
+            # 地面上的微小摆动
+            if abs(self.velocity_x) > 0.1:
+                self.x += self.velocity_x
+                self.velocity_x *= 0.95  # 逐渐减速
+        
+        # 旋转更新（在地面上时旋转变慢）
+        if self.is_on_ground:
+            self.rotation_speed *= 0.98
+        self.rotation += self.rotation_speed
+        
+        return True
+    
+    def get_position(self):
+        return int(self.x - self.width//2), int(self.y), int(self.width), int(self.height)
+    
+    def get_age(self, now=None):
+        current_time = time.time() if now is None else now
+        return current_time - self.birth_time
+    
+    def check_horizontal_overlap(self, other_face, tolerance=5):
+        """检查两个人脸是否在水平方向上重叠"""
+        self_left = self.x - self.width // 2 - tolerance
+        self_right = self.x + self.width // 2 + tolerance
+        other_left = other_face.x - other_face.width // 2
+        other_right = other_face.x + other_face.width // 2
+        
+        return not (self_right <= other_left or self_left >= other_right)
+
+
+class DetectorCache:
+    """按名称缓存检测器实例（离线模式使用；页面使用 st.cache_resource）"""
+
+    def __init__(self):
+        self._detectors = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, name):
+        with self._lock:
+            detector = self._detectors.get(name)
+            if detector is None:
+                detector = self._detectors[name] = create_detector(name)
+            return detector
+
+
+class FacePipeline:
+    """检测 + 掉落人脸 + 叠加，一个视频流一个实例"""
+
+    def __init__(self, settings=None, detector_provider=None, detection_service=None, stream_id=None,
+                 quality=None):
+        self.settings = dict(DEFAULT_SETTINGS)
+        if settings:
+            self.settings.update(settings)
+        # 名称 -> 检测器，默认为本实例单独缓存
+        self.detector_provider = detector_provider or DetectorCache()
+        # 可选的共享检测服务（多路视频流共用一组工作线程）
+        self.detection_service = detection_service
+        self.stream_id = stream_id if stream_id is not None else id(self)
+        # 可选的自适应画质控制器（AdaptiveQualityController），按帧耗时调整检测分辨率和频率
+        self.quality = quality
+        self._detect_counter = 0
+        
+        # 跨帧跟踪，给每张脸分配稳定的ID
+        self.tracker = FaceTracker(use_embedding=self.settings['face_embedding'])
+        
+        # 掉落人脸数据
+        self.falling_faces = []
+        self.total_faces_spawned = 0
+        # 最近一帧的检测结果，以及与之一一对应的轨迹
+        self.last_faces = []
+        self.last_tracks = []
+        
+        # 复用的缓冲区：BGR帧的灰度图、按边长缓存的人脸缩略图
+        self._gray = None
+        self._thumbs = {}
+        self._scaled = {}
+
+    def reset(self):
+        self.falling_faces = []
+        self.total_faces_spawned = 0
+        self.tracker.reset()
+        self.last_faces = []
+        self.last_tracks = []
+
+    def process_frame(self, frame, metrics=None, now=None):
+        """
+        处理一帧 av.VideoFrame 并返回要显示的 av.VideoFrame（WebRTC回调的完整路径）。
+
+        对 YUV 帧且检测器只需要灰度图时，直接用 Y 平面（零拷贝）做检测；
+        如果这一帧既没有检测到人脸也没有掉落人脸，就不做 BGR 转换，原样返回输入帧。
+        """
+        t0 = time.perf_counter()
+        timer = metrics.start_frame() if metrics is not None else NullTimer()
+        current_time = time.time() if now is None else now
+        settings = self.settings
+        
+        faces = None
+        luma = None
+        if settings['enabled']:
+            detector = self._get_detector()
+            if detector is not None and detector.uses_gray and frame.format.name in LUMA_FORMATS:
+                with timer.stage('grayscale'):
+                    luma = luma_plane(frame)
+                faces = self.detect(None, timer, gray=luma, detector=detector, now=current_time)
+                
+                # 只需要检测：没有任何东西要画时直接返回原始帧，省掉解码和编码两次整帧拷贝
+                if not faces and not (settings['falling_effect'] and self.falling_faces):
+                    self._finish(timer, 0, t0)
+                    return frame
+        
+        with timer.stage('decode'):
+            img = frame.to_ndarray(format="bgr24")
+        
+        if faces is None:
+            faces = self.detect(img, timer, now=current_time) if settings['enabled'] else []
+        self.render(img, faces, timer, current_time, self._tracks_for(faces))
+        
+        with timer.stage('encode'):
+            out_frame = av.VideoFrame.from_ndarray(img, format="bgr24")
+        
+        self._finish(timer, len(faces), t0)
+        return out_frame
+
+    def _finish(self, timer, face_count, t0):
+        timer.finish(face_count)
+        if self.quality is not None:
+            self.quality.observe((time.perf_counter() - t0) * 1000.0)
+
+    def process(self, img, timer=None, now=None):
+        """在BGR图像上原地完成检测、掉落人脸更新和绘制，返回本帧检测到的人脸"""
+        if timer is None:
+            timer = NullTimer()
+        current_time = time.time() if now is None else now
+        faces = self.detect(img, timer, now=current_time) if self.settings['enabled'] else []
+        self.render(img, faces, timer, current_time, self._tracks_for(faces))
+        return faces
+
+    def detect(self, img, timer, gray=None, detector=None, now=None):
+        """检测人脸，返回 [(x, y, w, h, score), ...]；检测失败时返回空列表"""
+        settings = self.settings
+        current_time = time.time() if now is None else now
+        # 原分辨率图像，用于给新轨迹计算特征
+        source = gray if gray is not None else img
+        quality = self.quality.settings() if self.quality is not None else None
+        
+        # 降低检测频率：跳过的帧沿用上一次的人脸框
+        self._detect_counter += 1
+        if quality is not None and (self._detect_counter - 1) % quality['detect_every'] != 0:
+            return self.last_faces
+        
+        scale = quality['detect_scale'] if quality is not None else 1.0
+        faces = []
+        try:
+            if detector is None:
+                detector = self._get_detector()
+            
+            with timer.stage('detect'):
+                # 降低检测分辨率：缩小后再检测，结果再映射回原图坐标
+                if scale < 1.0:
+                    if gray is not None:
+                        gray = self._scaled_buffer('gray', gray, scale)
+                    elif img is not None:
+                        img = self._scaled_buffer('bgr', img, scale)
+            
+            # 只有Haar需要灰度图，DNN/YuNet直接使用BGR图像
+            if gray is None and detector.uses_gray:
+                with timer.stage('grayscale'):
+                    gray = self._gray_buffer(img)
+                    cv2.cvtColor(img, cv2.COLOR_BGR2GRAY, dst=gray)
+            
+            with timer.stage('detect'):
+                # 检测人脸，结果为 (x, y, w, h, score)，按置信度阈值过滤
+                if self.detection_service is not None:
+                    # 超时返回后工作线程可能还在读这帧，而复用的缓冲区/原帧马上会被下一帧覆盖或被绘制，
+                    # 所以交给共享服务的是独立的拷贝
+                    faces = self.detection_service.detect(
+                        self.stream_id, settings['detector'],
+                        img.copy() if img is not None else None,
+                        gray.copy() if gray is not None else None,
+                        settings['confidence']
+                    )
+                else:
+                    faces = detector.detect(img, gray, settings['confidence'])
+                
+                if scale < 1.0:
+                    faces = [
+                        (int(x / scale), int(y / scale), int(w / scale), int(h / scale), score)
+                        for (x, y, w, h, score) in faces
+                    ]
+        
+        except Exception as e:
+            # 如果检测失败，至少返回原图像
+            pass
+        
+        # 只在真正检测过的帧上更新轨迹（跳过的帧沿用上一次的ID）
+        with timer.stage('detect'):
+            self.last_tracks = self.tracker.update(faces, source, current_time)
+        self.last_faces = faces
+        return faces
+
+    def render(self, img, faces, timer, current_time, tracks=None):
+        """绘制人脸框、按ID捕获新的掉落人脸，并更新和绘制所有掉落人脸"""
+        settings = self.settings
+        if tracks is None:
+            tracks = self.tracker.update(faces, img, current_time)
+        
+        # 绘制人脸框并捕获人脸（同一ID每秒一次）
+        if len(faces) > 0:
+            try:
+                with timer.stage('draw'):
+                    spawned = False
+                    for (x, y, w, h, score), track in zip(faces, tracks):
+                        # 绘制检测框，标签使用稳定的ID，不会随检测顺序变化而跳动
+                        cv2.rectangle(img, (x, y), (x + w, y + h), settings['color'], 2)
+                        cv2.putText(img, f'Face #{track.id} {score:.2f}', (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, settings['color'], 1)
+                        
+                        # 每张脸各自按间隔捕获，用于掉落效果
+                        if (settings['falling_effect'] and
+                                current_time - track.last_capture_time > CAPTURE_INTERVAL):
+                            if self._spawn_falling_face(img, track, current_time):
+                                spawned = True
+                
+                # 限制同时掉落的人脸数量
+                if spawned and len(self.falling_faces) > MAX_FALLING_FACES:
+                    self.falling_faces = self.falling_faces[-MAX_FALLING_FACES:]
+            
+            except Exception as e:
+                pass
+        
+        # 更新和绘制掉落的人脸
+        if settings['falling_effect']:
+            try:
+                # 更新掉落人脸位置（传入其他人脸用于碰撞检测）
+                with timer.stage('physics'):
+                    active_faces = []
+                    for falling_face in self.falling_faces:
+                        # 传入其他人脸进行堆叠检测
+                        other_faces = [f for f in self.falling_faces if f != falling_face]
+                        if falling_face.update(other_faces, current_time):  # 如果还活着
+                            active_faces.append(falling_face)
+                
+                # 在图像上绘制掉落的人脸（旋转 + 随时间渐隐，超出画面的部分自动裁剪）
+                with timer.stage('draw'):
+                    for falling_face in active_faces:
+                        self._draw_falling_face(img, falling_face, current_time)
+                
+                self.falling_faces = active_faces
+                
+            except Exception as e:
+                # 如果掉落效果出错，清空掉落列表
+                self.falling_faces = []
+
+    def _get_detector(self):
+        try:
+            return self.detector_provider(self.settings['detector'])
+        except Exception:
+            return None
+
+    def _gray_buffer(self, img):
+        h, w = img.shape[:2]
+        if self._gray is None or self._gray.shape != (h, w):
+            self._gray = np.empty((h, w), dtype=np.uint8)
+        return self._gray
+
+    def _scaled_buffer(self, key, src, scale):
+        """把src缩放到复用的缓冲区中（按key区分灰度/BGR）"""
+        h, w = src.shape[:2]
+        size = (max(1, int(w * scale)), max(1, int(h * scale)))
+        shape = (size[1], size[0]) + src.shape[2:]
+        buf = self._scaled.get(key)
+        if buf is None or buf.shape != shape:
+            buf = self._scaled[key] = np.empty(shape, dtype=src.dtype)
+        cv2.resize(src, size, dst=buf, interpolation=cv2.INTER_AREA)
+        return buf
+
+    def _tracks_for(self, faces):
+        """与faces对应的轨迹（faces来自detect时直接复用，否则交给render现场匹配）"""
+        return self.last_tracks if faces is self.last_faces else None
+
+    def _track_sprite(self, img, track, current_time):
+        """返回该ID缓存的掉落贴图，过期或不存在时从当前帧重新截取"""
+        if track.sprite is not None and current_time - track.sprite_time < SPRITE_REFRESH:
+            return track.sprite
+        
+        x, y, w, h = track.box
+        frame_height, frame_width = img.shape[:2]
+        x0, y0 = max(0, x), max(0, y)
+        x1, y1 = min(frame_width, x + w), min(frame_height, y + h)
+        
+        # 调整人脸大小（变小一点用于掉落）
+        face_size = min(x1 - x0, y1 - y0, 60)  # 最大60像素
+        if face_size <= 20:  # 最小20像素
+            return None
+        
+        # 直接从人脸区域视图缩放到复用的缩略图缓冲区（FaceSprite会把它拷进自己的画布）
+        thumb = self._thumbs.get(face_size)
+        if thumb is None:
+            thumb = self._thumbs[face_size] = np.empty((face_size, face_size, 3), dtype=np.uint8)
+        cv2.resize(img[y0:y1, x0:x1], (face_size, face_size), dst=thumb)
+        
+        track.sprite = FaceSprite(thumb)
+        track.sprite_time = current_time
+        return track.sprite
+
+    def _spawn_falling_face(self, img, track, current_time):
+        sprite = self._track_sprite(img, track, current_time)
+        if sprite is None:
+            return False
+        
+        frame_height, frame_width = img.shape[:2]
+        track.last_capture_time = current_time
+        self.falling_faces.append(FallingFace(
+            sprite.face,
+            track.box[0],
+            frame_width,
+            frame_height,
+            current_time,
+            sprite=sprite
+        ))
+        self.total_faces_spawned += 1
+        return True
+
+    def _draw_falling_face(self, img, falling_face, current_time):
+        try:
+            age = falling_face.get_age(current_time)
+            alpha = max(0.3, 1.0 - age / falling_face.lifetime)  # 随时间变透明
+            drawn = falling_face.sprite.composite(
+                img,
+                falling_face.x,
+                falling_face.y + falling_face.height / 2,
+                falling_face.rotation,
+                alpha
+            )
+            
+            # 显示剩余时间
+            remaining_time = int(falling_face.lifetime - age)
+            if drawn is not None and remaining_time > 0:
+                fx, fy, _, _ = falling_face.get_position()
+                text_color = (int(255 * alpha), int(255 * alpha), int(255 * alpha))
+                cv2.putText(img, f'{remaining_time}s', (fx, fy-5), 
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.3, text_color, 1)
+        except:
+            pass  # 如果绘制失败，跳过这个人脸
+
+
+def luma_plane(frame):
+    """返回 YUV 帧 Y 平面的二维 uint8 视图（不拷贝，按 line_size 跨行）"""
+    plane = frame.planes[0]
+    data = np.frombuffer(plane, dtype=np.uint8)
+    rows = data[:plane.line_size * frame.height].reshape(frame.height, plane.line_size)
+    return rows[:, :frame.width]
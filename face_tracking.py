@@ -0,0 +1,160 @@
+"""
+face_tracking.py
+
+跨帧的人脸跟踪：给每张脸分配稳定的ID。
+
+- 相邻帧之间按 IoU 贪心匹配检测框和已有轨迹
+- 可选的小型人脸特征（32x32 灰度、零均值、单位长度）在每条轨迹建立时只计算一次并缓存，
+  用于在人脸短暂丢失后重新认回原来的ID
+- 每条轨迹可以挂载只需计算一次的数据（例如掉落效果用的人脸贴图），避免每帧重复计算
+"""
+import itertools
+
+import cv2
+import numpy as np
+
+EMBEDDING_SIZE = 32
+
+
+def face_embedding(image, box):
+    """计算人脸区域的小型特征向量（image可以是灰度图或BGR图）"""
+    x, y, w, h = box[:4]
+    ih, iw = image.shape[:2]
+    x0, y0 = max(0, x), max(0, y)
+    x1, y1 = min(iw, x + w), min(ih, y + h)
+    if x1 <= x0 or y1 <= y0:
+        return None
+    roi = image[y0:y1, x0:x1]
+    if roi.ndim == 3:
+        roi = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(roi, (EMBEDDING_SIZE, EMBEDDING_SIZE), interpolation=cv2.INTER_AREA)
+    vec = small.astype(np.float32).ravel()
+    vec -= vec.mean()
+    norm = float(np.linalg.norm(vec))
+    if norm < 1e-6:
+        return None
+    return vec / norm
+
+
+def box_iou(a, b):
+    ax, ay, aw, ah = a[:4]
+    bx, by, bw, bh = b[:4]
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = ix * iy
+    union = aw * ah + bw * bh - inter
+    return inter / union if union > 0 else 0.0
+
+
+class Track:
+    """一张被跟踪的人脸"""
+
+    def __init__(self, track_id, face, now):
+        self.id = track_id
+        self.box = tuple(face[:4])
+        self.score = face[4] if len(face) > 4 else 1.0
+        self.hits = 1
+        self.misses = 0
+        self.first_seen = now
+        self.last_seen = now
+        # 建立轨迹时计算一次的特征
+        self.embedding = None
+        # 掉落效果：上一次从这张脸生成掉落人脸的时间，以及缓存的贴图
+        self.last_capture_time = 0
+        self.sprite = None
+        self.sprite_time = 0
+
+    def update(self, face, now):
+        self.box = tuple(face[:4])
+        self.score = face[4] if len(face) > 4 else 1.0
+        self.hits += 1
+        self.misses = 0
+        self.last_seen = now
+
+    @property
+    def age(self):
+        return self.last_seen - self.first_seen
+
+
+class FaceTracker:
+    """IoU 匹配 + 可选特征重识别"""
+
+    def __init__(self, iou_threshold=0.3, max_misses=15, use_embedding=True, embedding_threshold=0.7):
+        self.iou_threshold = iou_threshold
+        # 连续多少次检测没有匹配到就删除轨迹
+        self.max_misses = max_misses
+        self.use_embedding = use_embedding
+        # 余弦相似度高于此值才认为是同一个人
+        self.embedding_threshold = embedding_threshold
+
+        self.tracks = []
+        self._ids = itertools.count(1)
+        self.tracks_created = 0
+        self.embeddings_computed = 0
+
+    def reset(self):
+        self.tracks = []
+        self._ids = itertools.count(1)
+
+    def update(self, faces, image=None, now=0.0):
+        """
+        用本帧的检测结果更新轨迹，返回与 faces 一一对应的 Track 列表。
+
+        image 用于计算新轨迹的特征（灰度或BGR，坐标与faces一致），为None时只做IoU匹配。
+        """
+        assigned = [None] * len(faces)
+        unmatched_tracks = set(range(len(self.tracks)))
+
+        # IoU 贪心匹配：先匹配重叠最大的一对
+        pairs = []
+        for ti, track in enumerate(self.tracks):
+            for fi, face in enumerate(faces):
+                overlap = box_iou(track.box, face)
+                if overlap >= self.iou_threshold:
+                    pairs.append((overlap, ti, fi))
+        pairs.sort(reverse=True)
+        for _, ti, fi in pairs:
+            if ti in unmatched_tracks and assigned[fi] is None:
+                self.tracks[ti].update(faces[fi], now)
+                assigned[fi] = self.tracks[ti]
+                unmatched_tracks.discard(ti)
+
+        # 没有匹配上的检测：先尝试用特征认回暂时丢失的轨迹，否则新建轨迹
+        for fi, face in enumerate(faces):
+            if assigned[fi] is not None:
+                continue
+            embedding = None
+            if self.use_embedding and image is not None:
+                embedding = face_embedding(image, face)
+                self.embeddings_computed += 1
+
+            track = self._reidentify(embedding, unmatched_tracks)
+            if track is not None:
+                track.update(face, now)
+                unmatched_tracks.discard(self.tracks.index(track))
+            else:
+                track = Track(next(self._ids), face, now)
+                track.embedding = embedding
+                self.tracks_created += 1
+                self.tracks.append(track)
+            assigned[fi] = track
+
+        # 丢失的轨迹计数，超过上限后删除
+        for ti in unmatched_tracks:
+            self.tracks[ti].misses += 1
+        self.tracks = [t for t in self.tracks if t.misses <= self.max_misses]
+
+        return assigned
+
+    def _reidentify(self, embedding, candidates):
+        if embedding is None or not candidates:
+            return None
+        best, best_sim = None, self.embedding_threshold
+        for ti in candidates:
+            track = self.tracks[ti]
+            if track.embedding is None:
+                continue
+            sim = float(np.dot(track.embedding, embedding))
+            if sim >= best_sim:
+                best, best_sim = track, sim
+        return best
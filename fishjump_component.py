@@ -0,0 +1,80 @@
+"""
+fishjump_component.py
+
+浏览器版 FishJump（Streamlit 自定义组件，前端在 fishjump_web/index.html）。
+
+pygame 版只能在运行网站的机器上开窗口，远程用户玩不了。这个组件在用户自己的浏览器里运行：
+Web Audio 的 AnalyserNode 取麦克风音量，canvas 绘制，逐帧的计算全部在浏览器端，
+服务器只在每局结束时收到一次分数并写入排行榜。
+跳跃档位、重力、速度等参数直接取自 Sound/parkour_sim.py，两个版本的手感一致。
+"""
+import os
+import sys
+
+import streamlit as st
+import streamlit.components.v1 as components
+
+SOUND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Sound')
+if SOUND_DIR not in sys.path:
+    sys.path.insert(0, SOUND_DIR)
+
+import parkour_sim
+from scoreboard import SCOREBOARD_PATH, submit_score
+
+_component = components.declare_component(
+    'fishjump', path=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fishjump_web'))
+
+# 浏览器端用到的游戏参数（只取玩法参数；parkour_sim 不依赖 pygame，网站端不需要安装 pygame）
+GAME_CONFIG = {
+    'width': parkour_sim.WIDTH,
+    'height': parkour_sim.HEIGHT,
+    'ground_y': parkour_sim.GROUND_Y,
+    'player_x': parkour_sim.PLAYER_X,
+    'fish_w': parkour_sim.FISH_W,
+    'fish_h': parkour_sim.FISH_H,
+    'base_speed': parkour_sim.BASE_SPEED,
+    'gravity': parkour_sim.GRAVITY,
+    'spawn_min': parkour_sim.SPAWN_MIN,
+    'spawn_max': parkour_sim.SPAWN_MAX,
+    'spawn_x': parkour_sim.SPAWN_X,
+    # 难度曲线（与 DifficultyCurve 相同：速度按分数、障碍间距按赛道距离达到最难）
+    'max_speed': parkour_sim.MAX_SPEED,
+    'spawn_min_hard': parkour_sim.SPAWN_MIN_HARD,
+    'spawn_max_hard': parkour_sim.SPAWN_MAX_HARD,
+    'ramp_score': parkour_sim.RAMP_SCORE,
+    'ramp_distance': parkour_sim.RAMP_DISTANCE,
+    'ema_alpha': parkour_sim.EMA_ALPHA,
+    'sensitivity': parkour_sim.SENSITIVITY,
+    'tiers': list(parkour_sim.TIERS),
+    'tier_scales': list(parkour_sim.TIER_SCALES),
+    'norm_divider': parkour_sim.NORM_DIVIDER,
+}
+
+# 客户端上报的分数不可信，超过这个值直接丢弃
+MAX_SCORE = 10000
+
+
+def fishjump_game(high_score=0, language='zh', key='fishjump_web'):
+    """显示浏览器版游戏；返回最近一局的结果（dict）或 None"""
+    return _component(config=GAME_CONFIG, high_score=int(high_score), language=language,
+                      key=key, default=None)
+
+
+def save_browser_score(result, path=SCOREBOARD_PATH):
+    """把组件返回的一局结果写入排行榜；同一局只写一次（按 run 去重），返回是否写入"""
+    if not isinstance(result, dict):
+        return False
+    run = result.get('run')
+    try:
+        score = int(result.get('score', 0))
+    except (TypeError, ValueError):
+        return False
+    if not run or not 0 < score <= MAX_SCORE:
+        return False
+    saved = st.session_state.setdefault('fishjump_saved_runs', set())
+    if run in saved:
+        return False
+    saved.add(run)
+    submit_score(score, path, source='browser', device=str(result.get('device') or '')[:120],
+                 user_agent=str(result.get('user_agent') or '')[:120], fps=result.get('fps'))
+    return True
@@ -0,0 +1,179 @@
+"""
+frame_metrics.py
+
+线程安全的逐帧耗时统计。
+
+WebRTC 回调线程用 FrameTimer 记录每帧各阶段（解码、灰度、检测、物理、绘制、编码）的耗时，
+帧结束时一次性提交给 FrameMetrics；Streamlit 页面线程只读取滚动窗口内的 p50/p95 快照，
+不再从视频线程直接写 st.session_state。
+可选的 history（face_analytics.FrameHistory）会同时保存每帧的人脸数和耗时，用于画长时间的趋势图。
+"""
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+# 相机页面的处理阶段（按帧内执行顺序）
+STAGES = ('decode', 'grayscale', 'detect', 'physics', 'draw', 'encode')
+
+# 30fps 下每帧的时间预算（毫秒）
+FRAME_BUDGET_MS = 1000.0 / 30
+
+
+class FrameTimer:
+    """单帧计时器，只在回调线程内使用，结束时一次性提交给FrameMetrics"""
+
+    def __init__(self, metrics):
+        self._metrics = metrics
+        self._start = time.perf_counter()
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        """计时一个阶段；同名阶段在一帧内多次出现时累加"""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, (time.perf_counter() - t0) * 1000.0)
+
+    def add(self, name, ms):
+        self.stages[name] = self.stages.get(name, 0.0) + ms
+
+    def finish(self, face_count=None):
+        total_ms = (time.perf_counter() - self._start) * 1000.0
+        self._metrics.record(self.stages, total_ms, face_count)
+        return total_ms
+
+
+class FrameMetrics:
+    """滚动窗口内的逐帧耗时统计，可在多个线程间共享"""
+
+    def __init__(self, window=300, stages=STAGES, log_path=None, log_interval=5.0, history=None):
+        self.window = window
+        self.stages = tuple(stages)
+        self.log_path = log_path
+        self.log_interval = log_interval
+        self.history = history
+
+        self._lock = threading.Lock()
+        self._samples = {name: deque(maxlen=window) for name in self.stages + ('total',)}
+        self._frame_times = deque(maxlen=window)
+        self._frame_count = 0
+        self._face_count = 0
+        self._last_log = time.time()
+
+    def start_frame(self):
+        return FrameTimer(self)
+
+    def record(self, stage_ms, total_ms, face_count=None):
+        """提交一帧的各阶段耗时（毫秒）"""
+        now = time.time()
+        with self._lock:
+            for name, ms in stage_ms.items():
+                samples = self._samples.get(name)
+                if samples is None:
+                    samples = self._samples[name] = deque(maxlen=self.window)
+                samples.append(ms)
+            self._samples['total'].append(total_ms)
+            self._frame_times.append(now)
+            self._frame_count += 1
+            if face_count is not None:
+                self._face_count = face_count
+
+            should_log = bool(self.log_path) and now - self._last_log >= self.log_interval
+            if should_log:
+                self._last_log = now
+
+        if self.history is not None:
+            self.history.append(now, face_count or 0, stage_ms.get('detect', 0.0), total_ms)
+
+        if should_log:
+            self._write_log()
+
+    def reset(self):
+        with self._lock:
+            for samples in self._samples.values():
+                samples.clear()
+            self._frame_times.clear()
+            self._frame_count = 0
+            self._face_count = 0
+        if self.history is not None:
+            self.history.reset()
+
+    def snapshot(self):
+        """返回当前窗口的统计（可直接转JSON）"""
+        with self._lock:
+            samples = {name: list(values) for name, values in self._samples.items()}
+            frame_times = list(self._frame_times)
+            frame_count = self._frame_count
+            face_count = self._face_count
+
+        fps = 0.0
+        if len(frame_times) > 1 and frame_times[-1] > frame_times[0]:
+            fps = (len(frame_times) - 1) / (frame_times[-1] - frame_times[0])
+
+        stages = {}
+        for name, values in samples.items():
+            if not values:
+                continue
+            p50, p95 = np.percentile(values, [50, 95])
+            stages[name] = {
+                'p50_ms': round(float(p50), 3),
+                'p95_ms': round(float(p95), 3),
+                'last_ms': round(float(values[-1]), 3),
+            }
+
+        return {
+            'timestamp': time.time(),
+            'frames': frame_count,
+            'window': len(frame_times),
+            'fps': round(fps, 1),
+            'face_count': face_count,
+            'budget_ms': round(FRAME_BUDGET_MS, 2),
+            'stages': stages,
+        }
+
+    def to_json(self, indent=None):
+        return json.dumps(self.snapshot(), indent=indent)
+
+    def _write_log(self):
+        # 以 JSON Lines 追加写入，失败时不影响视频处理
+        try:
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(self.to_json() + '\n')
+        except Exception:
+            pass
+
+
+def stage_rows(snapshot, stages=STAGES):
+    """把快照整理成表格行（按阶段顺序，total放最后），供页面展示"""
+    rows = []
+    for name in tuple(stages) + ('total',):
+        stat = snapshot['stages'].get(name)
+        if stat is None:
+            continue
+        rows.append({
+            'stage': name,
+            'p50 (ms)': stat['p50_ms'],
+            'p95 (ms)': stat['p95_ms'],
+            'last (ms)': stat['last_ms'],
+        })
+    return rows
+
+
+class NullTimer:
+    """不做任何记录的计时器，供不需要统计时使用"""
+
+    @contextmanager
+    def stage(self, name):
+        yield
+
+    def add(self, name, ms):
+        pass
+
+    def finish(self, face_count=None):
+        return 0.0
@@ -0,0 +1,203 @@
+"""
+game_launcher.py
+
+FishJump 游戏进程管理。
+
+原来页面每点一次按钮就用写死的 Windows 路径 Popen 一个新的 Python + pygame + PyAudio 进程，
+没有任何跟踪，多点几次进程就越积越多。这里改成由服务端统一管理：
+- 游戏脚本路径按仓库位置解析（Sound/voice_parkour.py），不依赖工作目录
+- 每个用户（浏览器会话）最多一个游戏进程：重复点击会复用正在运行的进程，可以单独停止
+- 读取游戏的标准输出，游戏打印 READY_LINE（第一帧显示）后记录启动耗时；最后几行输出用于显示错误
+- 每个进程记录所属的 Streamlit 会话；会话已经不存在（浏览器标签页关闭）的进程算作孤儿进程，
+  启动新游戏时自动回收。Streamlit 不会重跑空闲的页面，所以不能按页面刷新时间判断，
+  否则在游戏窗口里玩得久一点就会被误杀
+- 终止进程（最多要等几秒）在锁外进行，不会卡住其他会话的 launch/status/stats
+- 服务退出时终止所有游戏进程
+
+pygame 需要占用主线程和一个窗口，不能放进 Streamlit 进程里运行，所以用受管理的子进程。
+游戏窗口出现在运行网站的那台机器上。
+"""
+import atexit
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+
+GAME_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Sound', 'voice_parkour.py')
+# voice_parkour.py 在第一帧显示后打印这一行
+READY_LINE = 'FishJump ready'
+MAX_GAMES = int(os.environ.get('FISHJUMP_MAX_GAMES', 4))
+
+
+class GameProcess:
+    """一个用户的游戏进程"""
+
+    def __init__(self, user_id, proc, session_id=None):
+        self.user_id = user_id
+        self.session_id = session_id
+        self.proc = proc
+        self.started = time.time()
+        self.last_seen = self.started
+        self.startup_ms = None
+        self.output = deque(maxlen=20)
+        self._start = time.perf_counter()
+        self._reader = threading.Thread(target=self._read_output, daemon=True)
+        self._reader.start()
+
+    def _read_output(self):
+        for line in self.proc.stdout:
+            line = line.rstrip()
+            if self.startup_ms is None and line.startswith(READY_LINE):
+                self.startup_ms = (time.perf_counter() - self._start) * 1000.0
+            self.output.append(line)
+
+    @property
+    def running(self):
+        return self.proc.poll() is None
+
+    def state(self):
+        if not self.running:
+            return 'exited'
+        return 'running' if self.startup_ms is not None else 'starting'
+
+    def info(self):
+        return {
+            'state': self.state(),
+            'pid': self.proc.pid,
+            'uptime': time.time() - self.started,
+            'startup_ms': self.startup_ms,
+            'returncode': self.proc.poll(),
+            'output': list(self.output),
+        }
+
+    def terminate(self, timeout=3.0):
+        if self.running:
+            self.proc.terminate()
+            try:
+                self.proc.wait(timeout)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+                self.proc.wait(timeout)
+
+
+class GameLauncher:
+    """
+    按用户管理游戏进程（整个服务共享一个实例）
+
+    session_alive(session_id) 判断所属会话是否还在；没有提供（或进程没有会话ID）时，
+    退回到按最后访问时间判断，超过 orphan_after 秒算孤儿进程。
+    """
+
+    def __init__(self, script=GAME_SCRIPT, max_games=MAX_GAMES, orphan_after=600.0, session_alive=None):
+        self.script = script
+        self.max_games = max_games
+        self.orphan_after = orphan_after
+        self.session_alive = session_alive
+        self._lock = threading.Lock()
+        self._games = {}
+        self.launched = 0
+        self.reused = 0
+        self.reaped = 0
+        atexit.register(self.shutdown)
+
+    def launch(self, user_id, args=(), session_id=None):
+        """启动该用户的游戏；已经在运行时直接复用。返回 (状态字典, 是否复用)"""
+        orphans = []
+        try:
+            with self._lock:
+                orphans = self._reap_locked()
+                return self._launch_locked(user_id, args, session_id)
+        finally:
+            # 回收的孤儿进程在锁外终止
+            for game in orphans:
+                game.terminate()
+
+    def _launch_locked(self, user_id, args, session_id):
+        game = self._games.get(user_id)
+        if game is not None and game.running:
+            game.last_seen = time.time()
+            if session_id is not None:
+                game.session_id = session_id
+            self.reused += 1
+            return game.info(), True
+        if not os.path.exists(self.script):
+            raise FileNotFoundError(self.script)
+        if sum(1 for g in self._games.values() if g.running) >= self.max_games:
+            raise RuntimeError(f'Too many games running (max {self.max_games})')
+        proc = subprocess.Popen(
+            [sys.executable, '-u', self.script] + list(args),
+            cwd=os.path.dirname(self.script),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            stdin=subprocess.DEVNULL,
+            text=True,
+            creationflags=subprocess.CREATE_NEW_PROCESS_GROUP if sys.platform == 'win32' else 0,
+        )
+        game = GameProcess(user_id, proc, session_id)
+        self._games[user_id] = game
+        self.launched += 1
+        return game.info(), False
+
+    def stop(self, user_id, timeout=3.0):
+        with self._lock:
+            game = self._games.pop(user_id, None)
+        if game is None:
+            return False
+        game.terminate(timeout)
+        return True
+
+    def status(self, user_id):
+        """该用户的游戏状态（没有则为 None），同时刷新最后访问时间"""
+        with self._lock:
+            game = self._games.get(user_id)
+            if game is None:
+                return None
+            game.last_seen = time.time()
+            return game.info()
+
+    def _gone(self, game, now):
+        # 所属会话已经不存在；无法判断会话时按最后访问时间
+        if self.session_alive is not None and game.session_id is not None:
+            try:
+                return not self.session_alive(game.session_id)
+            except Exception:
+                return False
+        return now - game.last_seen > self.orphan_after
+
+    def _orphans_locked(self, now):
+        return [uid for uid, g in self._games.items() if g.running and self._gone(g, now)]
+
+    def _reap_locked(self):
+        # 从表中摘掉孤儿进程（由调用方在锁外终止），并清掉已退出且会话已结束的记录
+        now = time.time()
+        orphans = [self._games.pop(uid) for uid in self._orphans_locked(now)]
+        self.reaped += len(orphans)
+        for uid in [uid for uid, g in self._games.items()
+                    if not g.running and self._gone(g, now)]:
+            del self._games[uid]
+        return orphans
+
+    def stats(self):
+        with self._lock:
+            now = time.time()
+            startups = [g.startup_ms for g in self._games.values() if g.startup_ms is not None]
+            return {
+                'running': sum(1 for g in self._games.values() if g.running),
+                'orphans': len(self._orphans_locked(now)),
+                'launched': self.launched,
+                'reused': self.reused,
+                'reaped': self.reaped,
+                'mean_startup_ms': sum(startups) / len(startups) if startups else None,
+            }
+
+    def shutdown(self):
+        with self._lock:
+            games = list(self._games.values())
+            self._games.clear()
+        for game in games:
+            try:
+                game.terminate(1.0)
+            except Exception:
+                pass
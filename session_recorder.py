@@ -0,0 +1,379 @@
+"""
+session_recorder.py
+
+相机会话的录制与回放。
+
+- SessionRecorder：WebRTC 回调只把帧和人脸框放进有界队列（放不下就丢帧并计数，绝不阻塞回调），
+  后台写入线程用 PyAV 编码成 mp4，同时把人脸框按列存成 .npz 元数据
+- 元数据是列式的：每帧一个时间戳和偏移量，所有人脸框的 x/y/w/h/score/ID 各存一列
+- SessionReader：不开摄像头回放录制的会话，按帧取出图像和对应的人脸框；
+  录制原始画面时，元数据也可以直接作为 face_benchmark.py 的标注数据
+- 写入线程是守护线程，进程退出时还在录制的会话由 atexit 钩子统一结束，
+  保证 mp4 正常收尾、元数据写出
+"""
+import atexit
+import glob
+import json
+import os
+import queue
+import threading
+import time
+import weakref
+from array import array
+from collections import deque
+from fractions import Fraction
+
+import av
+import cv2
+import numpy as np
+
+RECORDINGS_DIR = os.environ.get(
+    'FACE_RECORDINGS_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'recordings')
+)
+
+# 优先使用浏览器可以直接播放的H.264，不可用时退回MPEG-4
+VIDEO_CODECS = ('libx264', 'h264', 'mpeg4')
+
+# 视频时间戳使用毫秒，按实际到达时间记录（摄像头帧率不固定）
+TIME_BASE = Fraction(1, 1000)
+
+
+# 正在录制的录制器（弱引用，不影响会话结束后回收）
+_active_recorders = weakref.WeakSet()
+
+
+def _stop_active_recorders():
+    for recorder in list(_active_recorders):
+        try:
+            recorder.stop()
+        except Exception:
+            pass
+
+
+atexit.register(_stop_active_recorders)
+
+
+def _pick_codec():
+    for name in VIDEO_CODECS:
+        try:
+            av.codec.Codec(name, 'w')
+            return name
+        except Exception:
+            continue
+    raise RuntimeError('No usable video encoder found in PyAV')
+
+
+class SessionRecorder:
+    """后台线程编码的会话录制器，一个视频流一个实例"""
+
+    def __init__(self, directory=RECORDINGS_DIR, fps=30, queue_size=60, raw=False):
+        self.directory = directory
+        self.fps = fps
+        self.queue_size = queue_size
+        # True：录制原始画面（可用作检测器测试数据）；False：录制叠加后的画面
+        self.raw = raw
+
+        self._lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self.video_path = None
+        self.meta_path = None
+        self._reset_stats()
+
+    @property
+    def active(self):
+        return self._queue is not None
+
+    def start(self, name=None):
+        """开始新的录制，返回视频文件路径（已在录制时直接返回当前路径）"""
+        with self._lock:
+            if self._queue is not None:
+                return self.video_path
+            os.makedirs(self.directory, exist_ok=True)
+            name = name or time.strftime('session_%Y%m%d_%H%M%S')
+            self.video_path = os.path.join(self.directory, name + '.mp4')
+            self.meta_path = os.path.join(self.directory, name + '.npz')
+            self._reset_stats()
+            self._queue = queue.Queue(maxsize=self.queue_size)
+            self._thread = threading.Thread(
+                target=self._writer_loop, args=(self._queue, self.video_path, self.meta_path),
+                name='session-writer', daemon=True
+            )
+            self._thread.start()
+            _active_recorders.add(self)
+            return self.video_path
+
+    def stop(self, wait=True):
+        """结束录制：写完队列里剩下的帧并保存元数据"""
+        with self._lock:
+            q, thread = self._queue, self._thread
+            self._queue = None
+            self._thread = None
+        _active_recorders.discard(self)
+        if q is None:
+            return None
+        # 结束标记必须送达，这里允许阻塞（在页面线程调用）
+        q.put(None)
+        if wait:
+            thread.join()
+        return self.video_path
+
+    def submit(self, frame, faces=(), track_ids=None, timestamp=None):
+        """
+        在回调线程中调用：把一帧 av.VideoFrame 和它的人脸框交给写入线程。
+
+        队列满时直接丢弃这一帧，返回False。
+        """
+        q = self._queue
+        if q is None:
+            return False
+        timestamp = time.time() if timestamp is None else timestamp
+        try:
+            q.put_nowait((frame, list(faces), list(track_ids) if track_ids is not None else None, timestamp))
+        except queue.Full:
+            with self._lock:
+                self._dropped += 1
+            return False
+        return True
+
+    def stats(self):
+        q = self._queue
+        with self._lock:
+            encode_ms = list(self._encode_ms)
+            stats = {
+                'recording': q is not None,
+                'path': self.video_path,
+                'frames': self._written,
+                'dropped': self._dropped,
+                'faces': self._faces,
+                'queue': q.qsize() if q is not None else 0,
+                'queue_size': self.queue_size,
+                'bytes': self._bytes,
+                'error': self._error,
+            }
+        stats['encode_p50_ms'] = round(float(np.percentile(encode_ms, 50)), 2) if encode_ms else 0.0
+        return stats
+
+    def _reset_stats(self):
+        self._written = 0
+        self._dropped = 0
+        self._faces = 0
+        self._bytes = 0
+        self._error = None
+        self._encode_ms = deque(maxlen=120)
+
+    def _writer_loop(self, q, video_path, meta_path):
+        container = None
+        stream = None
+        start_time = None
+        last_pts = -1
+        columns = _MetadataColumns()
+        try:
+            while True:
+                item = q.get()
+                if item is None:
+                    break
+                frame, faces, track_ids, timestamp = item
+
+                t0 = time.perf_counter()
+                if container is None:
+                    # 第一帧确定视频尺寸
+                    container, stream = _open_writer(video_path, frame.width, frame.height, self.fps)
+                    start_time = timestamp
+                pts = max(int(round((timestamp - start_time) * 1000)), last_pts + 1)
+                last_pts = pts
+
+                # 分辨率中途变化时统一缩放到第一帧的尺寸
+                out = frame.reformat(stream.width, stream.height, 'yuv420p')
+                out.pts = pts
+                out.time_base = TIME_BASE
+                for packet in stream.encode(out):
+                    container.mux(packet)
+                    self._add_bytes(packet.size)
+
+                columns.append(timestamp, faces, track_ids)
+                with self._lock:
+                    self._written += 1
+                    self._faces += len(faces)
+                    self._encode_ms.append((time.perf_counter() - t0) * 1000.0)
+        except Exception as e:
+            with self._lock:
+                self._error = str(e)
+            # 出错后继续取走队列中的帧，避免回调端一直判断为队列已满
+            while q.get() is not None:
+                pass
+        finally:
+            if container is not None:
+                try:
+                    for packet in stream.encode():
+                        container.mux(packet)
+                        self._add_bytes(packet.size)
+                except Exception as e:
+                    with self._lock:
+                        self._error = self._error or str(e)
+                finally:
+                    container.close()
+                columns.save(meta_path, {
+                    'video': os.path.basename(video_path),
+                    'width': stream.width,
+                    'height': stream.height,
+                    'raw': self.raw,
+                    'start_time': start_time,
+                })
+
+    def _add_bytes(self, size):
+        with self._lock:
+            self._bytes += size
+
+
+def _open_writer(path, width, height, fps):
+    container = av.open(path, mode='w')
+    codec = _pick_codec()
+    options = {'preset': 'veryfast'} if codec == 'libx264' else {}
+    stream = container.add_stream(codec, rate=Fraction(fps).limit_denominator(1000), options=options)
+    # yuv420p 要求宽高为偶数
+    stream.width = width - width % 2
+    stream.height = height - height % 2
+    stream.pix_fmt = 'yuv420p'
+    stream.time_base = TIME_BASE
+    stream.codec_context.time_base = TIME_BASE
+    return container, stream
+
+
+class _MetadataColumns:
+    """按列累积的人脸框元数据（只在写入线程中使用）"""
+
+    def __init__(self):
+        self.timestamp = array('d')
+        self.offsets = array('q', [0])
+        self.x = array('i')
+        self.y = array('i')
+        self.w = array('i')
+        self.h = array('i')
+        self.score = array('f')
+        self.track_id = array('i')
+
+    def append(self, timestamp, faces, track_ids):
+        self.timestamp.append(timestamp)
+        for i, face in enumerate(faces):
+            x, y, w, h = face[:4]
+            self.x.append(int(x))
+            self.y.append(int(y))
+            self.w.append(int(w))
+            self.h.append(int(h))
+            self.score.append(float(face[4]) if len(face) > 4 else 1.0)
+            self.track_id.append(int(track_ids[i]) if track_ids else -1)
+        self.offsets.append(len(self.x))
+
+    def save(self, path, info):
+        np.savez_compressed(
+            path,
+            info=np.array(json.dumps(info)),
+            timestamp=np.frombuffer(self.timestamp, dtype=np.float64),
+            offsets=np.frombuffer(self.offsets, dtype=np.int64),
+            x=np.frombuffer(self.x, dtype=np.int32),
+            y=np.frombuffer(self.y, dtype=np.int32),
+            w=np.frombuffer(self.w, dtype=np.int32),
+            h=np.frombuffer(self.h, dtype=np.int32),
+            score=np.frombuffer(self.score, dtype=np.float32),
+            track_id=np.frombuffer(self.track_id, dtype=np.int32),
+        )
+
+
+def list_sessions(directory=RECORDINGS_DIR):
+    """录制目录中元数据和视频都存在的会话名称（新的在前）"""
+    names = []
+    for meta_path in sorted(glob.glob(os.path.join(directory, '*.npz')), reverse=True):
+        name = os.path.splitext(os.path.basename(meta_path))[0]
+        if os.path.exists(os.path.join(directory, name + '.mp4')):
+            names.append(name)
+    return names
+
+
+def load_metadata(path):
+    """读取 .npz 元数据，返回 dict（info 已解析为 dict）"""
+    with np.load(path) as data:
+        meta = {key: data[key] for key in data.files}
+    meta['info'] = json.loads(str(meta['info']))
+    return meta
+
+
+def frame_boxes(meta, index):
+    """第index帧的人脸框 [(x, y, w, h, score, track_id), ...]"""
+    start, end = meta['offsets'][index], meta['offsets'][index + 1]
+    return [
+        (int(meta['x'][i]), int(meta['y'][i]), int(meta['w'][i]), int(meta['h'][i]),
+         float(meta['score'][i]), int(meta['track_id'][i]))
+        for i in range(start, end)
+    ]
+
+
+def load_annotations(path):
+    """把元数据转换成 face_benchmark.py 使用的标注格式 {帧号: [(x, y, w, h), ...]}"""
+    meta = load_metadata(path)
+    counts = np.diff(meta['offsets'])
+    return {
+        index: [box[:4] for box in frame_boxes(meta, index)]
+        for index in range(len(counts))
+    }
+
+
+class SessionReader:
+    """不开摄像头回放录制的会话"""
+
+    def __init__(self, name, directory=RECORDINGS_DIR):
+        self.name = name
+        self.video_path = os.path.join(directory, name + '.mp4')
+        self.meta_path = os.path.join(directory, name + '.npz')
+        self.meta = load_metadata(self.meta_path)
+        self.info = self.meta['info']
+        self.frame_count = len(self.meta['timestamp'])
+
+    @property
+    def duration(self):
+        timestamps = self.meta['timestamp']
+        return float(timestamps[-1] - timestamps[0]) if len(timestamps) > 1 else 0.0
+
+    def face_counts(self):
+        return np.diff(self.meta['offsets'])
+
+    def boxes(self, index):
+        return frame_boxes(self.meta, index)
+
+    def frame(self, index, draw=True, color=(0, 255, 0)):
+        """读取第index帧（BGR）；draw=True时按元数据画出人脸框和ID"""
+        cap = cv2.VideoCapture(self.video_path)
+        try:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+            ok, img = cap.read()
+        finally:
+            cap.release()
+        if not ok:
+            return None
+        if draw:
+            draw_boxes(img, self.boxes(index), color)
+        return img
+
+    def frames(self, draw=True, color=(0, 255, 0)):
+        """按顺序产生 (帧号, BGR图像, 人脸框)"""
+        cap = cv2.VideoCapture(self.video_path)
+        try:
+            index = 0
+            while index < self.frame_count:
+                ok, img = cap.read()
+                if not ok:
+                    break
+                boxes = self.boxes(index)
+                if draw:
+                    draw_boxes(img, boxes, color)
+                yield index, img, boxes
+                index += 1
+        finally:
+            cap.release()
+
+
+def draw_boxes(img, boxes, color=(0, 255, 0)):
+    for x, y, w, h, score, track_id in boxes:
+        cv2.rectangle(img, (x, y), (x + w, y + h), color, 2)
+        label = f'Face #{track_id} {score:.2f}' if track_id >= 0 else f'{score:.2f}'
+        cv2.putText(img, label, (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
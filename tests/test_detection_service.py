@@ -0,0 +1,45 @@
+import threading
+
+import numpy as np
+
+from detection_service import DetectionService
+
+
+class _EchoDetector:
+    """Returns one box whose x is the frame's marker pixel, so results can be traced to their frame."""
+    max_batch = 4
+
+    def detect(self, img, gray=None, score_threshold=None):
+        return [(int(img[0, 0]), 0, 1, 1, 1.0)]
+
+    def detect_batch(self, imgs, grays=None, score_thresholds=None):
+        return [self.detect(img) for img in imgs]
+
+
+def _frame(marker):
+    img = np.zeros((4, 4), dtype=np.uint8)
+    img[0, 0] = marker
+    return img
+
+
+def test_cancelled_head_request_does_not_steal_next_streams_result():
+    picked = threading.Event()
+    release = threading.Event()
+
+    def slow_factory(name):
+        # first-use detector creation: the worker already holds stream a's request
+        picked.set()
+        release.wait(5)
+        return _EchoDetector()
+
+    service = DetectionService(workers=1, detector_factory=slow_factory)
+    try:
+        head = service.submit('a', 'echo', _frame(1))
+        assert picked.wait(5)
+        # stream b queues a frame while a's request is cancelled (as by a detect() timeout)
+        extra = service.submit('b', 'echo', _frame(2))
+        assert head.cancel()
+        release.set()
+        assert extra.result(5) == [(2, 0, 1, 1, 1.0)]
+    finally:
+        service.shutdown()
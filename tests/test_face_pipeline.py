@@ -0,0 +1,40 @@
+import time
+
+import numpy as np
+
+from detection_service import DetectionService
+from face_pipeline import FacePipeline
+from frame_metrics import NullTimer
+
+
+class _SlowGrayDetector:
+    """Reads the gray frame only after a delay, like a worker still busy after detect() timed out."""
+    uses_gray = True
+    max_batch = 1
+
+    def __init__(self, delay):
+        self.delay = delay
+
+    def detect(self, img, gray=None, score_threshold=None):
+        time.sleep(self.delay)
+        return [(int(gray[0, 0]), 0, 1, 1, 1.0)]
+
+
+def _frame(value):
+    return np.full((8, 8, 3), value, dtype=np.uint8)
+
+
+def test_late_result_is_computed_on_the_submitted_frame():
+    detector = _SlowGrayDetector(delay=1.5)
+    service = DetectionService(workers=1, detector_factory=lambda name: detector)
+    pipeline = FacePipeline(settings={'detector': 'slow', 'face_embedding': False, 'falling_effect': False},
+                            detector_provider=lambda name: detector, detection_service=service, stream_id='s')
+    try:
+        # the first frame times out (1 s) while the worker is still sleeping on it
+        assert pipeline.detect(_frame(10), NullTimer()) == []
+        # the next frame is converted into the pipeline's reused gray buffer right away;
+        # by the time it times out too, the first frame's late result is the stream's last result
+        faces = pipeline.detect(_frame(200), NullTimer())
+        assert [f[0] for f in faces] == [10]
+    finally:
+        service.shutdown(wait=False)